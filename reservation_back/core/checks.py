@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# کش‌هایی که بین پروسه‌ها/سرورها مشترک نیستند
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    نسخه کاتالوگ، زمان تغییر کاربران (احراز هویت) و نسخه برگه روزانه در کش default نگه داشته می‌شوند؛
+    با کش درون‌پروسه‌ای هر worker تغییرات بقیه را نمی‌بیند. در manage.py check --deploy بررسی می‌شود.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PROCESS_LOCAL_CACHES and getattr(settings, 'SHARED_CACHE_REQUIRED', True):
+        return [Error(
+            f"CACHES['default'] uses {backend.rsplit('.', 1)[-1]}, which is not shared between workers.",
+            hint="Use Redis or Memcached, or set SHARED_CACHE_REQUIRED = False for a single-process deployment.",
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,130 @@
+"""
+مسیر سریع سریالایز لیست‌های فقط‌خواندنی غذا و رستوران.
+
+به‌جای ساختن نمونه مدل و فیلدهای DRF برای هر ردیف، ستون‌ها با values() خوانده می‌شوند،
+discounted_price در خود SQL حساب می‌شود و خروجی dictهای ساده با همان کلیدها و ترتیب
+FoodSerializer / RestaurantSerializer است. با FAST_SERIALIZERS=True فعال می‌شود (پیش‌فرض خاموش).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+
+from core.models import Restaurant, Food
+
+CENT = Decimal('0.01')
+
+FOOD_FIELDS = ('id', 'name', 'description', 'price', 'discount_percent', 'discounted_price', 'restaurant')
+RESTAURANT_FIELDS = ('id', 'name', 'description', 'image', 'foods')
+
+# همان Food.discounted_price؛ price دو رقم اعشار دارد و درصد صحیح است، پس چهار رقم اعشار دقیق است
+DISCOUNTED_PRICE = ExpressionWrapper(
+    F('price') * (100 - F('discount_percent')) * Value(CENT),
+    output_field=DecimalField(max_digits=14, decimal_places=4),
+)
+
+
+def enabled():
+    return getattr(settings, 'FAST_SERIALIZERS', False)
+
+
+def _wanted(all_fields, fields):
+    if not fields:
+        return all_fields
+    return tuple(name for name in all_fields if name in fields)
+
+
+def _image_url(request):
+    storage = Restaurant._meta.get_field('image').storage
+
+    def url(name):
+        if not name:
+            return None
+        # مثل ImageField در DRF: با request مطلق، بدون آن نسبی
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return url
+
+
+def _price(value):
+    # مثل DecimalField در DRF: رشته با دو رقم اعشار
+    return f'{value.quantize(CENT):f}'
+
+
+def _food(row, restaurant):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'description': row['description'],
+        'price': _price(row['price']),
+        'discount_percent': row['discount_percent'],
+        'discounted_price': row.get('discounted_price'),
+        'restaurant': restaurant,
+    }
+
+
+def food_values(queryset, fields=None):
+    """queryset غذا به صورت values()؛ صفحه‌بندی cursor روی همین queryset کار می‌کند."""
+    wanted = _wanted(FOOD_FIELDS, fields)
+    columns = ['id', 'name', 'description', 'price', 'discount_percent']
+    if 'restaurant' in wanted:
+        columns += ['restaurant__id', 'restaurant__name', 'restaurant__description', 'restaurant__image']
+    if 'discounted_price' in wanted:
+        return queryset.values(*columns, discounted_price=DISCOUNTED_PRICE)
+    return queryset.values(*columns)
+
+
+def foods_data(rows, request=None, fields=None):
+    """معادل FoodSerializer(many=True).data برای ردیف‌های food_values."""
+    wanted = _wanted(FOOD_FIELDS, fields)
+    image_url = _image_url(request)
+    restaurants = {}
+    result = []
+    for row in rows:
+        restaurant = None
+        if 'restaurant' in wanted:
+            restaurant = restaurants.get(row['restaurant__id'])
+            if restaurant is None:
+                restaurant = restaurants[row['restaurant__id']] = {
+                    'id': row['restaurant__id'],
+                    'name': row['restaurant__name'],
+                    'description': row['restaurant__description'],
+                    'image': image_url(row['restaurant__image']),
+                }
+        food = _food(row, restaurant)
+        result.append(food if len(wanted) == len(FOOD_FIELDS) else {name: food[name] for name in wanted})
+    return result
+
+
+def restaurant_values(queryset, fields=None):
+    return queryset.values('id', 'name', 'description', 'image')
+
+
+def restaurants_data(rows, request=None, fields=None):
+    """
+    معادل RestaurantSerializer(many=True).data؛ غذاهای همه رستوران‌ها با یک کوئری خوانده می‌شوند
+    و فیلد restaurant هر غذا همان dict پایه رستوران والد است.
+    """
+    wanted = _wanted(RESTAURANT_FIELDS, fields)
+    image_url = _image_url(request)
+    restaurants = [
+        {'id': row['id'], 'name': row['name'], 'description': row['description'], 'image': image_url(row['image'])}
+        for row in rows
+    ]
+
+    if 'foods' in wanted:
+        foods = {restaurant['id']: [] for restaurant in restaurants}
+        basics = {restaurant['id']: dict(restaurant) for restaurant in restaurants}
+        food_rows = Food.objects.filter(restaurant_id__in=list(foods)).order_by('id').values(
+            'id', 'name', 'description', 'price', 'discount_percent', 'restaurant_id',
+            discounted_price=DISCOUNTED_PRICE,
+        )
+        for row in food_rows:
+            foods[row['restaurant_id']].append(_food(row, basics[row['restaurant_id']]))
+        for restaurant in restaurants:
+            restaurant['foods'] = foods[restaurant['id']]
+
+    if len(wanted) == len(RESTAURANT_FIELDS):
+        return restaurants
+    return [{name: restaurant[name] for name in wanted} for restaurant in restaurants]
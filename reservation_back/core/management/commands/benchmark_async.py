@@ -0,0 +1,201 @@
+import asyncio
+import datetime
+import json
+import logging
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.models import Restaurant, Food, Cart, CartItem, Order, OrderItem
+from payments.models import Payment
+from payments.services import gateway
+from reservation.models import Reservation
+from reservation_back.auth import tokens_for_user
+
+CARD = {'card_number': '6037990000001234', 'cvv2': '123', 'otp': '123456'}
+# نام endpoint ← (مسیر همگام، مسیر async، متد)
+ENDPOINTS = {
+    'catalog': ('/api/restaurants-public/', '/api/async/restaurants-public/', 'GET'),
+    'cart': ('/api/cart/', '/api/async/cart/', 'GET'),
+    'orders': ('/api/orders/', '/api/async/orders/', 'GET'),
+    'reservations': ('/api/reservations/', '/api/async/reservations/', 'POST'),
+    'payments': ('/api/payments/verify-fake/', '/api/async/payments/verify-fake/', 'POST'),
+}
+
+
+async def _asgi_request(app, method, path, body, headers):
+    """یک درخواست HTTP مستقیم به اپلیکیشن ASGI (بدون شبکه و سرور)."""
+    path, _, query = path.partition('?')
+    headers = [*headers, (b'content-length', str(len(body)).encode())]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'root_path': '', 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+    }
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    result = {}
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        # تا پایان پاسخ قطع اتصالی نیست؛ جنگو این انتظار را خودش لغو می‌کند
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+
+    await app(scope, receive, send)
+    return result.get('status')
+
+
+class Command(BaseCommand):
+    help = (
+        'endpointهای همگام و async را زیر ASGI (درون همین پروسه) با درخواست‌های همزمان مقایسه می‌کند: '
+        'درخواست در ثانیه، p50/p99 و بیشترین تعداد نخ‌های زنده. روی SQLite نوشتن‌های همزمان '
+        '(رزرو و پرداخت) به قفل پایگاه داده می‌خورند و 400/500 می‌گیرند؛ آن‌ها را روی PostgreSQL بسنجید.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=[*ENDPOINTS, 'all'], default='all')
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--concurrency', type=int, default=100, help='درخواست‌های همزمان در پرواز')
+        parser.add_argument('--gateway-latency-ms', type=float, default=200,
+                            help='تأخیر ثابت درگاه شبیه‌سازی‌شده برای endpoint پرداخت')
+        parser.add_argument('--gateway-concurrency', type=int, default=256, help='سقف درخواست همزمان به درگاه')
+        parser.add_argument('--keep', action='store_true', help='داده‌های آزمایشی پاک نشوند')
+
+    def handle(self, *args, **options):
+        # اپلیکیشن ASGI قبل از تنظیم لاگ ساخته می‌شود چون django.setup لاگ‌ها را از نو پیکربندی می‌کند
+        app = get_asgi_application()
+        # پاسخ‌های 4xx/5xx (مثلاً قفل SQLite زیر بار نوشتن) فقط شمرده می‌شوند
+        for logger in ('django.request', 'reservation.views'):
+            logging.getLogger(logger).setLevel(logging.CRITICAL)
+        names = list(ENDPOINTS) if options['endpoint'] == 'all' else [options['endpoint']]
+        fixtures = self._fixtures(options['requests'] * 2 + 2)
+        gateway.reset_client(gateway.GatewayClient(
+            gateway.SimulatedGateway(approve_rate=1.0, latency='fixed', latency_ms=options['gateway_latency_ms']),
+            max_concurrency=options['gateway_concurrency'],
+        ))
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '') and not h.startswith('.')), 'localhost')
+        try:
+            with override_settings(RATELIMIT_ENABLE=False, OUTBOX_DISPATCH_IN_PROCESS=False,
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, host]):
+                for name in names:
+                    for mode in ('sync', 'async'):
+                        stats = asyncio.run(self._run(app, name, mode, fixtures, host, options))
+                        self._report(name, mode, stats)
+        finally:
+            gateway.reset_client()
+            if not options['keep']:
+                self._cleanup(fixtures)
+
+    def _fixtures(self, payment_count):
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:8]
+        vendor = User.objects.create_user(f'bench-vendor-{suffix}', role='vendor')
+        customer = User.objects.create_user(f'bench-customer-{suffix}', role='customer')
+        restaurant = Restaurant.objects.create(name=f'bench-{suffix}', owner=vendor)
+        foods = Food.objects.bulk_create(
+            Food(restaurant=restaurant, name=f'غذا {i}', price=Decimal(100000 + i * 1000)) for i in range(10)
+        )
+        cart = Cart.objects.create(user=customer)
+        CartItem.objects.bulk_create(CartItem(cart=cart, food=food, quantity=2) for food in foods[:4])
+        # یک صفحه کامل سفارش برای لیست، و یک سفارش pending برای هر درخواست پرداخت
+        orders = Order.objects.bulk_create(
+            Order(restaurant=restaurant, user=customer, total_price=Decimal(200000)) for _ in range(payment_count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, food=food, quantity=1, unit_price=food.price)
+            for order in orders[:20] for food in foods[:2]
+        )
+        payments = Payment.objects.bulk_create(
+            Payment(order=order, amount=order.total_price, ref_code=uuid.uuid4().hex[:20]) for order in orders
+        )
+        return {
+            'suffix': suffix,
+            'vendor': vendor,
+            'customer': customer,
+            'token': str(tokens_for_user(customer).access_token),
+            'ref_codes': [payment.ref_code for payment in payments],
+        }
+
+    def _cleanup(self, fixtures):
+        Reservation.objects.filter(name=f"bench-{fixtures['suffix']}").delete()
+        # پاک کردن کاربرها رستوران، غذاها، سبد، سفارش‌ها و پرداخت‌ها را هم حذف می‌کند
+        fixtures['customer'].delete()
+        fixtures['vendor'].delete()
+
+    def _body(self, name, mode, index, fixtures):
+        if name == 'reservations':
+            # هر درخواست یک روز جدا تا ظرفیت اسلات‌ها نتیجه را عوض نکند
+            day = datetime.date(2040, 1, 1) + datetime.timedelta(days=index + (0 if mode == 'sync' else 5000))
+            payload = {'date': str(day), 'time': '19:30', 'guests': 2,
+                       'name': f"bench-{fixtures['suffix']}", 'phone': '09120000000'}
+        elif name == 'payments':
+            # نیمی از پرداخت‌ها برای هر حالت
+            offset = 0 if mode == 'sync' else len(fixtures['ref_codes']) // 2
+            payload = dict(CARD, ref_code=fixtures['ref_codes'][offset + index])
+        else:
+            return b''
+        return json.dumps(payload).encode()
+
+    async def _run(self, app, name, mode, fixtures, host, options):
+        sync_path, async_path, method = ENDPOINTS[name]
+        path = sync_path if mode == 'sync' else async_path
+        headers = [
+            (b'host', host.encode()),
+            (b'content-type', b'application/json'),
+            (b'cookie', f"access_token={fixtures['token']}".encode()),
+        ]
+        total = options['requests']
+        if name in ('reservations', 'payments'):
+            # یک درخواست گرم‌کردن هم از همین داده‌ها مصرف می‌شود
+            total = min(total, len(fixtures['ref_codes']) // 2 - 1)
+        await _asgi_request(app, method, path, self._body(name, mode, total, fixtures), headers)
+
+        slots = asyncio.Semaphore(options['concurrency'])
+        latencies, statuses = [], {}
+        peak = {'threads': threading.active_count()}
+        done = asyncio.Event()
+
+        async def sample_threads():
+            while not done.is_set():
+                peak['threads'] = max(peak['threads'], threading.active_count())
+                await asyncio.sleep(0.002)
+
+        async def one(index):
+            async with slots:
+                started = time.perf_counter()
+                code = await _asgi_request(app, method, path, self._body(name, mode, index, fixtures), headers)
+                latencies.append(time.perf_counter() - started)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(total)))
+        wall = time.perf_counter() - started
+        done.set()
+        await sampler
+        return {'wall': wall, 'latencies': sorted(latencies), 'statuses': statuses, 'threads': peak['threads']}
+
+    def _report(self, name, mode, stats):
+        latencies = stats['latencies']
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f"{name:<13}{mode:<6} {len(latencies) / stats['wall']:8.1f} درخواست/ثانیه  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f}ms  p99 {percentile(0.99):7.1f}ms  "
+            f"نخ‌ها {stats['threads']:4d}  وضعیت‌ها {dict(sorted(stats['statuses'].items()))}"
+        )
@@ -0,0 +1,83 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from core.services import endpoint_benchmark
+from core.services.catalog_service import invalidate_catalog
+from core.services.synthetic_data import generate
+from core.services.user_cache import profile_cache
+from payments.services import gateway
+
+
+class Command(BaseCommand):
+    help = (
+        'زمان پاسخ (p50، بیشینه و با دست‌کم ۱۰۰ تکرار p99) و تعداد کوئری endpointهای پرترافیک را روی داده '
+        'قطعی اندازه می‌گیرد و با core/benchmark_budgets.json مقایسه می‌کند. زمان با میانه سنجیده می‌شود و '
+        'بیشینه فقط سقفی گشاد دارد تا یک اجرای کند تصادفی نتیجه را رد نکند. داده در یک تراکنش ساخته و در '
+        'پایان rollback می‌شود.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=[*endpoint_benchmark.EndpointBenchmark.SCENARIOS, 'all'],
+                            default='all')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--tolerance', type=float, default=2.0,
+                            help='ضریب مجاز p50 نسبت به baseline؛ 0 یعنی بدون بررسی زمان')
+        parser.add_argument('--max-tolerance', type=float, default=10.0,
+                            help='ضریب مجاز بیشینه نسبت به بیشینه baseline؛ 0 یعنی بدون بررسی')
+        parser.add_argument('--record', action='store_true', help='نتایج به عنوان budget جدید نوشته شوند')
+
+    def handle(self, *args, **options):
+        scenarios = endpoint_benchmark.EndpointBenchmark.SCENARIOS
+        names = list(scenarios) if options['endpoint'] == 'all' else [options['endpoint']]
+        overrides = dict(endpoint_benchmark.SETTINGS, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+        results, failures = {}, []
+        with override_settings(**overrides):
+            gateway.reset_client()
+            try:
+                with transaction.atomic():
+                    data = generate(prefix=f'bench-{uuid.uuid4().hex[:8]}', **endpoint_benchmark.DATA_OPTIONS)
+                    for name in names:
+                        cache.clear()
+                        profile_cache.clear()
+                        benchmark = endpoint_benchmark.EndpointBenchmark(data)
+                        responses, queries, durations = benchmark.measure(name, options['iterations'])
+                        bad = [r.status_code for r in responses if r.status_code != scenarios[name][1]]
+                        if bad:
+                            raise CommandError(f'{name}: unexpected status {bad[0]}')
+                        results[name] = benchmark.summary(queries, durations)
+                        failures.extend(self._report(name, results[name], options))
+                    transaction.set_rollback(True)
+            finally:
+                gateway.reset_client()
+                invalidate_catalog()
+
+        if options['record']:
+            endpoint_benchmark.save_budgets(results)
+            self.stdout.write(self.style.SUCCESS(f'budgets written to {endpoint_benchmark.BUDGETS_PATH}'))
+        elif failures:
+            raise CommandError('; '.join(failures))
+
+    def _report(self, name, result, options):
+        line = f"{name:<22} {result['queries']:3d} queries  p50 {result['p50_ms']:7.2f}ms  max {result['max_ms']:7.2f}ms"
+        if 'p99_ms' in result:
+            line += f"  p99 {result['p99_ms']:7.2f}ms"
+        self.stdout.write(line)
+        budget = endpoint_benchmark.load_budgets().get(name)
+        if options['record'] or budget is None:
+            return []
+        failures = []
+        if result['queries'] > budget['queries']:
+            failures.append(f"{name}: {result['queries']} queries, budget is {budget['queries']}")
+        tolerance = options['tolerance']
+        if tolerance and result['p50_ms'] > budget['p50_ms'] * tolerance:
+            failures.append(f"{name}: p50 {result['p50_ms']}ms, baseline {budget['p50_ms']}ms × {tolerance}")
+        max_tolerance = options['max_tolerance']
+        if max_tolerance and result['max_ms'] > budget['max_ms'] * max_tolerance:
+            failures.append(f"{name}: max {result['max_ms']}ms, baseline {budget['max_ms']}ms × {max_tolerance}")
+        return failures
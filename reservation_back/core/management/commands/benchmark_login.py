@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+PASSWORD = 'benchmark-Passw0rd!'
+
+
+def _verify_loop(hasher_path, encoded, duration):
+    # در پروسه جدا اجرا می‌شود؛ hasher دوباره از مسیرش ساخته می‌شود
+    from django.utils.module_loading import import_string
+
+    hasher = import_string(hasher_path)()
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        hasher.verify(PASSWORD, encoded)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        'سرعت بررسی رمز عبور (ورود در ثانیه به ازای هر هسته) را برای هر hasher '
+        'تعریف‌شده در PASSWORD_HASHERS اندازه می‌گیرد.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=3.0, help='مدت اندازه‌گیری هر hasher (ثانیه)')
+        parser.add_argument('--processes', type=int, default=1, help='تعداد پروسه‌های هم‌زمان')
+
+    def handle(self, *args, **options):
+        duration = options['duration']
+        processes = max(1, options['processes'])
+
+        for index, hasher in enumerate(get_hashers()):
+            hasher_path = f"{type(hasher).__module__}.{type(hasher).__qualname__}"
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as e:
+                # مثلاً bcrypt/argon2 نصب نیست
+                self.stdout.write(self.style.WARNING(f"{hasher.algorithm}: {e}"))
+                continue
+
+            if processes == 1:
+                per_second = _verify_loop(hasher_path, encoded, duration)
+            else:
+                with ProcessPoolExecutor(max_workers=processes) as pool:
+                    futures = [pool.submit(_verify_loop, hasher_path, encoded, duration) for _ in range(processes)]
+                    per_second = sum(future.result() for future in futures)
+
+            label = ' (پیش‌فرض)' if index == 0 else ''
+            self.stdout.write(
+                f"{hasher.algorithm}{label}: {per_second:.1f} ورود/ثانیه کل، "
+                f"{per_second / processes:.1f} ورود/ثانیه/هسته، "
+                f"{1000 / (per_second / processes):.1f} میلی‌ثانیه هر بررسی"
+            )
@@ -0,0 +1,69 @@
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core.services.synthetic_data import generate
+from reservation_back.auth import tokens_for_user
+
+PATHS = ('/api/foods/', '/api/restaurants/')
+
+
+class Command(BaseCommand):
+    help = (
+        'لیست غذا و رستوران را یک بار با سریالایزر DRF و یک بار با مسیر سریع FastListMixin '
+        '(FAST_SERIALIZERS) روی همان queryset و همان صفحه درخواست می‌دهد و زمان هر دو را چاپ می‌کند. '
+        'داده در یک تراکنش ساخته و در پایان rollback می‌شود. فقط گزارش است و چیزی را رد نمی‌کند.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--foods-per-restaurant', type=int, default=50)
+
+    def handle(self, *args, **options):
+        overrides = {'RATELIMIT_ENABLE': False, 'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        with override_settings(**overrides), transaction.atomic():
+            generate(seed=1234, restaurants=options['restaurants'],
+                     foods_per_restaurant=options['foods_per_restaurant'], customers=1, orders_per_customer=0,
+                     reservations=0, prefix=f'serializers-{uuid.uuid4().hex[:8]}')
+            admin = get_user_model().objects.create_user(f'serializers-admin-{uuid.uuid4().hex[:8]}', role='admin')
+            client = Client()
+            client.cookies['access_token'] = str(tokens_for_user(admin).access_token)
+
+            for path in PATHS:
+                url = f"{path}?page_size={options['page_size']}"
+                drf, drf_body = self._measure(client, url, False, options['iterations'])
+                fast, fast_body = self._measure(client, url, True, options['iterations'])
+                if drf_body != fast_body:
+                    raise CommandError(f'{path}: fast path output differs from DRF')
+                self._report(path, drf, fast)
+            transaction.set_rollback(True)
+
+    def _measure(self, client, url, fast, iterations):
+        with override_settings(FAST_SERIALIZERS=fast):
+            response = client.get(url)  # گرم کردن
+            if response.status_code != 200:
+                raise CommandError(f'{url}: unexpected status {response.status_code}')
+            durations = []
+            with CaptureQueriesContext(connection) as captured:
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    client.get(url)
+                    durations.append((time.perf_counter() - started) * 1000)
+        return {'durations': durations, 'queries': len(captured) // iterations}, response.content
+
+    def _report(self, path, drf, fast):
+        drf_ms, fast_ms = statistics.median(drf['durations']), statistics.median(fast['durations'])
+        self.stdout.write(
+            f"{path:<18} DRF p50 {drf_ms:7.2f}ms min {min(drf['durations']):7.2f}ms ({drf['queries']} queries)  "
+            f"fast p50 {fast_ms:7.2f}ms min {min(fast['durations']):7.2f}ms ({fast['queries']} queries)  "
+            f"×{drf_ms / fast_ms:.1f}"
+        )
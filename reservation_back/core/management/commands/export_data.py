@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.export_service import DATASETS, FORMATS, parse_range, export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = 'خروجی CSV/NDJSON از رزروها، سفارش‌ها یا اقلام سفارش (استریم، با حافظه ثابت).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--from', dest='start', help='از این تاریخ (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', help='تا این تاریخ (YYYY-MM-DD)، شامل خود روز')
+        parser.add_argument('--restaurant', type=int, help='فقط سفارش‌های این رستوران')
+        parser.add_argument('--output', '-o', help='مسیر فایل خروجی؛ پیش‌فرض stdout')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_range(options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['restaurant'] is not None and options['dataset'] == 'reservations':
+            raise CommandError('رزروها به رستوران وابسته نیستند.')
+
+        columns, queryset = export_queryset(options['dataset'], start, end, options['restaurant'])
+        chunks = stream_export(columns, queryset, options['fmt'])
+
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                size = sum(output.write(chunk) for chunk in chunks)
+            self.stderr.write(self.style.SUCCESS(f"{size} بایت در {options['output']} نوشته شد."))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.flush()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.services.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'کلیدهای Idempotency منقضی‌شده را حذف می‌کند.'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} کلید منقضی حذف شد."))
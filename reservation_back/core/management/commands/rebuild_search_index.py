@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.search_service import food_index, invalidate_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'نسخه مشترک ایندکس جستجوی غذا را عوض می‌کند تا همه پروسه‌های سرور در جستجوی بعدی ایندکس را در '
+        'پس‌زمینه از دیتابیس بازسازی کنند (مثلاً بعد از import). سپس برای بررسی، ایندکسی در همین پروسه '
+        'می‌سازد و زمان ساخت را گزارش می‌کند؛ این ایندکس محلی به سرورها منتقل نمی‌شود.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', help='پس از ساخت، این عبارت را جستجو کن.')
+
+    def handle(self, *args, **options):
+        invalidate_search_index()
+        self.stdout.write('نسخه ایندکس عوض شد؛ پروسه‌های سرور در جستجوی بعدی بازسازی می‌کنند.')
+
+        started = time.perf_counter()
+        food_index.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(food_index)} غذا در {elapsed * 1000:.1f} میلی‌ثانیه ایندکس شد."
+        ))
+
+        if options['query']:
+            started = time.perf_counter()
+            results = food_index.search(options['query'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{len(results)} نتیجه در {elapsed * 1000:.2f} میلی‌ثانیه:")
+            for result in results:
+                self.stdout.write(f"  [{result['score']}] {result['id']} {result['name']}")
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.bulk_seed import DEFAULT_STATUS_WEIGHTS, seed
+from core.services.synthetic_data import PASSWORD
+
+
+def _status_weights(value):
+    """مثل delivered=70,pending=10؛ وضعیت‌های نیامده وزن صفر دارند."""
+    weights = {}
+    for part in value.split(','):
+        status, _, weight = part.partition('=')
+        if status.strip() not in DEFAULT_STATUS_WEIGHTS or not weight.strip().isdigit():
+            raise CommandError(f"وزن نامعتبر: {part!r}")
+        weights[status.strip()] = int(weight)
+    if not any(weights.values()):
+        raise CommandError('دست‌کم یک وضعیت باید وزن مثبت داشته باشد.')
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        'داده آزمایشی در مقیاس بالا (کاربر، رستوران، غذا، سفارش، اقلام، پرداخت، رزرو) با bulk_create '
+        'دسته‌ای، رمز عبور از پیش هش‌شده و ساخت ایندکس‌ها پس از بارگذاری. فقط برای محیط توسعه.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=100, help='تعداد فروشنده‌ها (= تعداد رستوران‌ها)')
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--foods-per-restaurant', type=int, default=30, help='میانگین اندازه منو')
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--max-items', type=int, default=5, help='بیشترین تعداد قلم در یک سفارش')
+        parser.add_argument('--reservations', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=180, help='سفارش‌ها در این تعداد روز گذشته پخش می‌شوند')
+        parser.add_argument('--restaurant-skew', type=float, default=1.0,
+                            help='توان zipf محبوبیت رستوران‌ها؛ 0 یعنی یکنواخت')
+        parser.add_argument('--customer-skew', type=float, default=0.8, help='توان zipf فعالیت مشتری‌ها')
+        parser.add_argument('--status-weights', type=_status_weights, default=None,
+                            help='وزن وضعیت سفارش‌ها، مثل delivered=70,pending=10,canceled=20')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='پیشوند نام کاربری و ref_code پرداخت‌ها')
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='ایندکس‌ها هنگام بارگذاری حذف نشوند (برای جدول‌هایی که از قبل داده زیادی دارند)')
+
+    def handle(self, *args, **options):
+        if options['vendors'] < 1 or options['customers'] < 1 or options['foods_per_restaurant'] < 1:
+            raise CommandError('دست‌کم یک فروشنده، یک مشتری و یک غذا لازم است.')
+        if options['max_items'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--max-items و --batch-size باید مثبت باشند.')
+
+        def progress(name, rows, seconds):
+            if name == 'indexes':
+                self.stdout.write(f"  ساخت ایندکس‌ها: {seconds:.2f} ثانیه")
+            else:
+                rate = rows / seconds if seconds else 0
+                self.stdout.write(f"  {name}: {rows} سطر در {seconds:.2f} ثانیه ({rate:,.0f} سطر/ثانیه)")
+
+        started = time.perf_counter()
+        stats = seed(
+            vendors=options['vendors'],
+            customers=options['customers'],
+            foods_per_restaurant=options['foods_per_restaurant'],
+            orders=options['orders'],
+            max_items=options['max_items'],
+            reservations=options['reservations'],
+            defer_indexes=not options['keep_indexes'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            days=options['days'],
+            restaurant_skew=options['restaurant_skew'],
+            customer_skew=options['customer_skew'],
+            status_weights=options['status_weights'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(stats.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} سطر در {elapsed:.1f} ثانیه ({total / elapsed:,.0f} سطر/ثانیه): "
+            + '، '.join(f"{name} {rows}" for name, rows in stats.items())
+        ))
+        self.stdout.write(f"رمز عبور همه کاربران ساختگی: {PASSWORD}")
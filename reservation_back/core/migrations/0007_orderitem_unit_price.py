@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:07
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def backfill_prices(apps, schema_editor):
+    """
+    قیمت واحد ردیف‌های قدیمی؛ total_price سفارش‌ها دست نمی‌خورد چون همان مبلغ زمان ثبت است.
+    سفارش تک‌ردیفی با جمع ثبت‌شده قیمت واحدش دقیق به دست می‌آید؛ بقیه با قیمت فعلی غذا (بهترین حدس).
+    """
+    OrderItem = apps.get_model('core', 'OrderItem')
+    cent = Decimal('0.01')
+
+    single_line = {
+        row['order']: row['order__total_price']
+        for row in OrderItem.objects.values('order', 'order__total_price')
+        .annotate(lines=models.Count('id'))
+        .filter(lines=1, order__total_price__gt=0)
+    }
+
+    batch = []
+    for item in OrderItem.objects.select_related('food').iterator(chunk_size=1000):
+        stored_total = single_line.get(item.order_id)
+        if stored_total is not None and item.quantity:
+            price = stored_total / item.quantity
+        else:
+            food = item.food
+            price = food.price * (Decimal('1') - Decimal(food.discount_percent) / Decimal('100'))
+        item.unit_price = price.quantize(cent, rounding=ROUND_HALF_UP)
+        batch.append(item)
+        if len(batch) >= 1000:
+            OrderItem.objects.bulk_update(batch, ['unit_price'])
+            batch = []
+    if batch:
+        OrderItem.objects.bulk_update(batch, ['unit_price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_cart_version_unique_cart_food'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+import core.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_order_pending_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', core.models.CustomUserManager()),
+            ],
+        ),
+    ]
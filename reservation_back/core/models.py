@@ -1,10 +1,25 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser, User
+from django.db import models, transaction
+from django.contrib.auth.models import AbstractUser, User, UserManager
 from django.conf import settings
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 import uuid
 # مدل کاربرها
 
+class CustomUserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # update() سیگنال post_save نمی‌فرستد؛ کش احراز هویت کاربرانش باید جدا باطل شود
+        from core.services.user_cache import invalidate_user
+
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        transaction.on_commit(lambda: [invalidate_user(user_id) for user_id in user_ids])
+        return rows
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
+
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -13,6 +28,8 @@ class CustomUser(AbstractUser):
     ]
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='customer')
 
+    objects = CustomUserManager()
+
     def __str__(self):
         return f"{self.username} ({self.role})"
 
@@ -44,6 +61,8 @@ class Food(models.Model):
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
+    # با هر تغییر سبد یکی زیاد می‌شود (برای همگام‌سازی خوش‌بینانه)
+    version = models.PositiveIntegerField(default=0)
 
     def total_price(self):
         return sum(item.total_price() for item in self.items.all())
@@ -56,8 +75,17 @@ class CartItem(models.Model):
     food = models.ForeignKey(Food, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'food'], name='unique_cart_food'),
+        ]
+
     def total_price(self):
-        price = self.food.discounted_price or self.food.price
+        # اگر از cart_read_queryset آمده باشد، جمع ردیف قبلاً در دیتابیس حساب شده
+        if hasattr(self, 'line_total'):
+            return self.line_total
+        # همان قیمت واحدی که checkout در سفارش ثبت می‌کند
+        price = self.food.discounted_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
         return self.quantity * price
 
     def __str__(self):
@@ -83,7 +111,25 @@ class Order(models.Model):
     phone = models.CharField(max_length=15, blank=True)
     note = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # سفارش‌هایی که از یک سبد چندرستورانی ساخته شده‌اند شناسه گروه مشترک دارند
+    checkout_group = models.UUIDField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # داشبورد فروشنده: سفارش‌های یک رستوران بر اساس وضعیت، به ترتیب صفحه‌بندی cursor (-id)
+            models.Index(fields=['restaurant', 'status', '-id'], name='order_rest_status_id_idx'),
+            # تاریخچه سفارش‌های مشتری
+            models.Index(fields=['user', '-id'], name='order_user_id_idx'),
+            # فید تغییرات (orders/feed/)
+            models.Index(fields=['restaurant', 'updated_at', 'id'], name='order_rest_updated_idx'),
+            # سفارش‌های در انتظار پرداخت برای expire_pending؛ ایندکس جزئی فقط سطرهای باز را دارد
+            models.Index(
+                fields=['created_at', 'id'], name='order_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} ({self.user.username})"
@@ -92,6 +138,30 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     food = models.ForeignKey(Food, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # قیمت واحد در لحظه ثبت سفارش؛ تغییر قیمت غذا روی سفارش‌های قبلی اثر ندارد
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def total_price(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.food.name}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    پاسخ ذخیره‌شده یک درخواست نوشتنی با هدر Idempotency-Key.
+    کلید با scope و کاربر هش می‌شود تا جستجو فقط روی یک ستون یکتا باشد.
+    status_code خالی یعنی درخواست اصلی هنوز در حال اجراست.
+    """
+    key_hash = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    # خالی برای پاسخ‌های DRF (body داده JSON است و دوباره رندر می‌شود)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     def __str__(self):
-        return f"{self.quantity} x {self.food.name}"
\ No newline at end of file
+        return f"{self.key_hash[:12]} ({self.status_code or 'in progress'})"
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    # صفحه‌بندی keyset روی کلید اصلی؛ هزینه هر صفحه به عمق اسکرول بستگی ندارد
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,34 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    همان بایت‌های JSONRenderer (فشرده، UTF-8، Decimal به صورت عدد) ولی با orjson.
+    انواعی که orjson نمی‌شناسد (Decimal، datetime، lazy string و ...) به encoder خود DRF سپرده می‌شوند.
+    بدون پکیج orjson، یا وقتی خروجی دندانه‌دار/ASCII خواسته شده، خود JSONRenderer رندر می‌کند.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data,
+            default=self._encoder.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+        )
+        # JSONRenderer این دو نویسه را escape می‌کند (در جاوااسکریپت پایان خط حساب می‌شوند)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
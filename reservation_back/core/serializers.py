@@ -2,15 +2,29 @@ from .models import CustomUser, Restaurant, Food, Order, OrderItem, CartItem, Ca
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
-from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from .services.auth_service import authenticate_credentials, InvalidCredentials
+from reservation_back.auth import tokens_for_user
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .services.order_service import create_order
+
+
+class SparseFieldsMixin:
+    """فیلدهای خروجی را به لیست context['fields'] (از ?fields=) محدود می‌کند."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
 
 class RestaurantBasicSerializer(serializers.ModelSerializer):
     class Meta:
         model = Restaurant
         fields = ['id', 'name', 'description', 'image']
 
-class FoodSerializer(serializers.ModelSerializer):
+class FoodSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     discounted_price = serializers.SerializerMethodField(read_only=True)
     restaurant = RestaurantBasicSerializer(read_only=True)
 
@@ -29,7 +43,7 @@ class FoodSerializer(serializers.ModelSerializer):
         return obj.discounted_price
 
 
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField(read_only=True)
     foods = FoodSerializer(many=True, read_only=True)
 
@@ -69,45 +83,69 @@ class CartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Cart
-        fields = ['id', 'user', 'items', 'total_price']
-        read_only_fields = ['user']
+        fields = ['id', 'user', 'version', 'items', 'total_price']
+        read_only_fields = ['user', 'version']
 
     def get_total_price(self, obj):
         return obj.total_price()
 
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'decrement', 'set', 'remove'])
+    food_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+
+class CartLineSerializer(serializers.Serializer):
+    food_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class CartSyncSerializer(serializers.Serializer):
+    version = serializers.IntegerField(min_value=0)
+    operations = CartOperationSerializer(many=True, required=False)
+    items = CartLineSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        if ('operations' in attrs) == ('items' in attrs):
+            raise serializers.ValidationError('دقیقاً یکی از operations یا items را ارسال کنید.')
+        return attrs
+
 class OrderItemSerializer(serializers.ModelSerializer):
     food = FoodSerializer(read_only=True)
-    food_id = serializers.PrimaryKeyRelatedField(queryset=Food.objects.all(), write_only=True)
+    # غذاها در order_service.create_order با یک کوئری in_bulk خوانده و بررسی می‌شوند، نه یکی‌یکی اینجا
+    food_id = serializers.IntegerField(write_only=True, min_value=1)
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'food', 'food_id', 'quantity']
+        fields = ['id', 'food', 'food_id', 'quantity', 'unit_price']
+        read_only_fields = ['unit_price']
 
     def create(self, validated_data):
-        food = validated_data.pop('food_id')
-        return OrderItem.objects.create(food=food, **validated_data)
+        return OrderItem.objects.create(**validated_data)
 
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     total_price = serializers.SerializerMethodField(read_only=True)
     user = serializers.StringRelatedField(read_only=True)
 
     class Meta:
         model = Order
-        fields = ['id', 'uuid', 'user', 'restaurant', 'status', 'created_at', 'items', 'total_price']
+        fields = ['id', 'uuid', 'user', 'restaurant', 'status', 'checkout_group', 'created_at', 'items', 'total_price']
+        read_only_fields = ['checkout_group']
 
     def get_total_price(self, obj):
-        return sum(item.food.discounted_price * item.quantity for item in obj.items.all())
+        return obj.total_price
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            food = item_data.pop('food_id')
-            OrderItem.objects.create(order=order, food=food, **item_data)
-        return order
+        items = [(item_data['food_id'], item_data['quantity']) for item_data in items_data]
+        try:
+            return create_order(items=items, **validated_data)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
 
 
 User = get_user_model()
@@ -141,13 +179,13 @@ class UserLoginSerializer(serializers.Serializer):
     refresh = serializers.CharField(read_only=True)
 
     def validate(self, data):
-        user = authenticate(username=data.get('username'), password=data.get('password'))
-        if not user:
+        # UserNotFound عمداً بالا می‌رود تا view پاسخ ۴۰۴ بدهد
+        try:
+            user = authenticate_credentials(self.context.get('request'), data.get('username'), data.get('password'))
+        except InvalidCredentials:
             raise serializers.ValidationError('نام کاربری یا رمز عبور اشتباه است.')
-        if not user.is_active:
-            raise serializers.ValidationError('کاربر غیرفعال است.')
 
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         return {
             'user': user,
             'refresh': str(refresh),
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model, user_login_failed
+
+
+class UserNotFound(Exception):
+    pass
+
+
+class InvalidCredentials(Exception):
+    pass
+
+
+def authenticate_credentials(request, username, password):
+    """
+    یک بار کاربر را می‌خواند و یک بار رمز را بررسی می‌کند.
+    اگر الگوریتم یا تعداد تکرار hasher تغییر کرده باشد، check_password رمز را دوباره hash و ذخیره می‌کند.
+    """
+    User = get_user_model()
+    user = User._default_manager.filter(**{User.USERNAME_FIELD: username}).first()
+    if user is None:
+        user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+        raise UserNotFound()
+
+    if not user.check_password(password) or not user.is_active:
+        user_login_failed.send(sender=__name__, credentials={'username': username}, request=request)
+        raise InvalidCredentials()
+
+    user.backend = 'django.contrib.auth.backends.ModelBackend'
+    return user
@@ -0,0 +1,390 @@
+"""
+ساخت داده آزمایشی در مقیاس production (میلیون‌ها سطر) برای دستور seed_data.
+
+برخلاف synthetic_data.generate که همه اشیا را در حافظه برمی‌گرداند، اینجا سطرها دسته‌دسته به صورت tuple
+ساخته و با INSERT چندسطری (Table) نوشته می‌شوند. شناسه‌ها از قبل تعیین می‌شوند تا برای ارجاع‌ها (سفارش ← اقلام ← پرداخت)
+نیازی به خواندن دوباره از دیتابیس نباشد؛ در حافظه فقط شناسه کاربران و قیمت غذاها می‌ماند.
+"""
+import datetime
+import itertools
+import random
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import Restaurant, Food, Order, OrderItem
+from core.services.catalog_service import invalidate_catalog
+from core.services.order_service import unit_price
+from core.services.search_service import invalidate_search_index
+from core.services.synthetic_data import PASSWORD, DISHES, STYLES, NAMES
+from payments.models import Payment
+from reservation.models import Reservation
+from reservation.services.availability_service import rebuild_occupancy
+from reservation.services.daysheet_service import bump_version
+
+DEFAULT_STATUS_WEIGHTS = {
+    'delivered': 70,
+    'preparing': 5,
+    'on_the_way': 5,
+    'pending': 8,
+    'canceled': 12,
+}
+# سهم سفارش‌ها در هر ساعت شبانه‌روز (اوج ناهار و شام)
+HOUR_WEIGHTS = [1, 1, 0, 0, 0, 0, 1, 2, 3, 3, 4, 6, 10, 12, 9, 5, 4, 5, 7, 11, 12, 9, 5, 2]
+QUANTITY_WEIGHTS = {1: 70, 2: 20, 3: 7, 4: 3}
+GUEST_WEIGHTS = {1: 5, 2: 35, 3: 12, 4: 25, 5: 8, 6: 9, 7: 3, 8: 3}
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _zipf(count, skew):
+    """وزن‌های تجمعی توزیع zipf؛ skew=0 یعنی یکنواخت."""
+    return _cumulative(1 / (rank ** skew) for rank in range(1, count + 1))
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+# مقادیری که درایور مستقیم نمی‌پذیرد (UUID در SQLite، تاریخ aware، JSON) با تبدیل خود فیلد آماده می‌شوند
+_ADAPTED_TYPES = {'DateTimeField', 'DateField', 'TimeField', 'UUIDField', 'JSONField'}
+
+
+class Table:
+    """
+    INSERT چندسطری با executemany روی tupleها.
+    ستون‌هایی که داده نمی‌شوند یک بار با مقدار پیش‌فرض فیلد پر می‌شوند؛ save، pre_save و سیگنال‌ها اجرا نمی‌شوند
+    (همان محدودیت‌های bulk_create) و ساختن نمونه مدل برای هر سطر، که بیشتر زمان bulk_create را می‌گیرد، حذف می‌شود.
+    """
+
+    def __init__(self, model, columns):
+        # خود اتصال (نه proxy ماژول django.db) تا دسترسی در حلقه داغ ارزان باشد
+        self.connection = connections[DEFAULT_DB_ALIAS]
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        self.adapters = [
+            (position, fields[name].get_db_prep_save)
+            for position, name in enumerate(columns)
+            if fields[name].get_internal_type() in _ADAPTED_TYPES
+        ]
+        # کلید اصلی داده‌نشده را دیتابیس می‌سازد
+        defaults = [field for name, field in fields.items() if name not in columns and not field.primary_key]
+        self.constants = tuple(field.get_db_prep_save(field.get_default(), connection) for field in defaults)
+
+        quote = connection.ops.quote_name
+        names = [fields[name].column for name in columns] + [field.column for field in defaults]
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(name) for name in names),
+            ', '.join(['%s'] * len(names)),
+        )
+
+    def insert(self, rows):
+        if self.adapters:
+            prepared = []
+            for row in rows:
+                row = list(row)
+                for position, adapt in self.adapters:
+                    row[position] = adapt(row[position], self.connection)
+                prepared.append(tuple(row) + self.constants)
+        else:
+            prepared = [row + self.constants for row in rows]
+        with connection.cursor() as cursor:
+            cursor.executemany(self.sql, prepared)
+        return len(prepared)
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """
+    ایندکس‌های غیر یکتای این مدل‌ها (Meta.indexes و ایندکس ستون‌های db_index/ForeignKey) قبل از بارگذاری
+    حذف و بعد از آن یک‌جا ساخته می‌شوند؛ ساخت ایندکس روی جدول پر خیلی ارزان‌تر از به‌روزرسانی آن
+    با هر INSERT است. کلیدهای اصلی و قیدهای یکتا دست نمی‌خورند.
+    """
+    meta_indexes = [(model, index) for model in models for index in model._meta.indexes]
+    field_indexes = [
+        (model, field) for model in models for field in model._meta.local_fields
+        if field.db_index and not field.unique
+    ]
+    meta_names = {index.name for _, index in meta_indexes}
+
+    with connection.schema_editor() as editor:
+        for model, index in meta_indexes:
+            editor.remove_index(model, index)
+        for model, field in field_indexes:
+            names = editor._constraint_names(model, [field.column], index=True, unique=False, primary_key=False)
+            for name in names:
+                if name not in meta_names:
+                    editor.execute(editor._delete_index_sql(model, name))
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, field in field_indexes:
+                editor.execute(editor._create_index_sql(model, fields=[field]))
+            for model, index in meta_indexes:
+                editor.add_index(model, index)
+
+
+@contextmanager
+def fast_writes():
+    """تنظیمات نشست برای بارگذاری انبوه؛ دوام هر commit فدای سرعت می‌شود (فقط برای داده آزمایشی)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA synchronous = OFF')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SET synchronous_commit TO OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('PRAGMA synchronous = FULL')
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SET synchronous_commit TO DEFAULT')
+
+
+class Seeder:
+    """
+    هر متد یک جدول را پر می‌کند و تعداد سطرهای نوشته‌شده را برمی‌گرداند.
+    progress(name, rows, seconds) بعد از هر مرحله با تعداد کل سطرهای آن مرحله صدا زده می‌شود.
+    """
+
+    def __init__(self, seed=0, prefix='seed', batch_size=5000, days=180,
+                 restaurant_skew=1.0, customer_skew=0.8, status_weights=None, progress=None):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.days = days
+        self.restaurant_skew = restaurant_skew
+        self.customer_skew = customer_skew
+        self.status_weights = status_weights or DEFAULT_STATUS_WEIGHTS
+        self.progress = progress
+        self.now = timezone.now()
+        self.password = make_password(PASSWORD)
+        self.stats = {}
+        self._hours = _cumulative(HOUR_WEIGHTS)
+
+        self.vendor_ids = []
+        self.customer_ids = []
+        self.restaurant_ids = []
+        self.menus = {}
+        self.reservation_dates = set()
+
+    def _write(self, table, rows):
+        """سطرهای یک generator را دسته‌دسته و هر دسته در یک تراکنش می‌نویسد."""
+        written = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return written
+            with transaction.atomic():
+                written += table.insert(batch)
+
+    def _run(self, name, step, *args):
+        before = sum(self.stats.values())
+        started = time.perf_counter()
+        self.stats[name] = self.stats.get(name, 0) + step(*args)
+        elapsed = time.perf_counter() - started
+        if self.progress:
+            # برای سفارش‌ها، اقلام و پرداخت‌ها هم حساب می‌شوند
+            self.progress(name, sum(self.stats.values()) - before, elapsed)
+
+    def _timestamp(self):
+        day = self.now - datetime.timedelta(days=self.rng.randrange(self.days))
+        hour = self.rng.choices(range(24), cum_weights=self._hours)[0]
+        stamp = day.replace(hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60), microsecond=0)
+        return min(stamp, self.now)
+
+    # ---- جدول‌ها ----
+
+    def users(self, vendors, customers):
+        User = get_user_model()
+        table = Table(User, ['id', 'username', 'email', 'first_name', 'password', 'role'])
+        first_id = _next_id(User)
+        self.vendor_ids = list(range(first_id, first_id + vendors))
+        self.customer_ids = list(range(first_id + vendors, first_id + vendors + customers))
+
+        def rows():
+            for user_id in self.vendor_ids:
+                yield (user_id, f'{self.prefix}-{user_id}', f'{self.prefix}-{user_id}@example.com',
+                       self.rng.choice(NAMES), self.password, 'vendor')
+            for user_id in self.customer_ids:
+                yield (user_id, f'{self.prefix}-{user_id}', f'{self.prefix}-{user_id}@example.com',
+                       self.rng.choice(NAMES), self.password, 'customer')
+
+        return self._write(table, rows())
+
+    def restaurants(self):
+        table = Table(Restaurant, ['id', 'owner_id', 'name', 'description'])
+        first_id = _next_id(Restaurant)
+        self.restaurant_ids = [first_id + offset for offset in range(len(self.vendor_ids))]
+        return self._write(table, (
+            (restaurant_id, owner_id, f'رستوران {restaurant_id}', self.rng.choice(STYLES))
+            for restaurant_id, owner_id in zip(self.restaurant_ids, self.vendor_ids)
+        ))
+
+    def foods(self, per_restaurant):
+        table = Table(Food, ['id', 'restaurant_id', 'name', 'description', 'price', 'discount_percent'])
+        next_id = itertools.count(_next_id(Food))
+
+        def rows():
+            for restaurant_id in self.restaurant_ids:
+                menu = self.menus[restaurant_id] = []
+                # اندازه منو حول میانگین پخش است
+                for _ in range(self.rng.randint(max(1, per_restaurant // 2), max(1, per_restaurant * 3 // 2))):
+                    food = Food(
+                        id=next(next_id), restaurant_id=restaurant_id,
+                        name=f'{self.rng.choice(DISHES)} {self.rng.choice(STYLES)}',
+                        description=' '.join(self.rng.sample(DISHES, 3)),
+                        price=Decimal(self.rng.randrange(50, 500) * 1000),
+                        discount_percent=self.rng.choices([0, 5, 10, 20], weights=[70, 10, 12, 8])[0],
+                    )
+                    menu.append((food.id, unit_price(food)))
+                    yield (food.id, restaurant_id, food.name, food.description, food.price, food.discount_percent)
+
+        return self._write(table, rows())
+
+    def orders(self, count, max_items):
+        """سفارش‌ها همراه با اقلام و پرداختشان دسته‌دسته و هر دسته در یک تراکنش نوشته می‌شوند."""
+        orders_table = Table(Order, [
+            'id', 'uuid', 'restaurant_id', 'user_id', 'total_price', 'phone', 'status', 'created_at', 'updated_at',
+        ])
+        items_table = Table(OrderItem, ['id', 'order_id', 'food_id', 'quantity', 'unit_price'])
+        payments_table = Table(Payment, ['id', 'order_id', 'amount', 'status', 'ref_code', 'created_at', 'paid_at'])
+
+        rng = self.rng
+        restaurant_weights = _zipf(len(self.restaurant_ids), self.restaurant_skew)
+        customer_weights = _zipf(len(self.customer_ids), self.customer_skew)
+        statuses, status_weights = zip(*self.status_weights.items())
+        status_weights = _cumulative(status_weights)
+        line_counts = range(1, max_items + 1)
+        line_weights = _cumulative(range(max_items, 0, -1))
+        quantities, quantity_weights = zip(*QUANTITY_WEIGHTS.items())
+        quantity_weights = _cumulative(quantity_weights)
+
+        order_id = _next_id(Order)
+        item_id = _next_id(OrderItem)
+        payment_id = _next_id(Payment)
+        items_written = payments_written = 0
+
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            restaurants = rng.choices(self.restaurant_ids, cum_weights=restaurant_weights, k=size)
+            customers = rng.choices(self.customer_ids, cum_weights=customer_weights, k=size)
+            orders, items, payments = [], [], []
+            for restaurant_id, customer_id in zip(restaurants, customers):
+                menu = self.menus[restaurant_id]
+                lines = rng.sample(menu, min(len(menu), rng.choices(line_counts, cum_weights=line_weights)[0]))
+                total = Decimal(0)
+                for food_id, price in lines:
+                    quantity = rng.choices(quantities, cum_weights=quantity_weights)[0]
+                    total += price * quantity
+                    items.append((item_id, order_id, food_id, quantity, price))
+                    item_id += 1
+
+                status = rng.choices(statuses, cum_weights=status_weights)[0]
+                created_at = self._timestamp()
+                updated_at = created_at if status == 'pending' else created_at + datetime.timedelta(
+                    minutes=rng.randrange(5, 90))
+                orders.append((
+                    order_id, uuid.UUID(int=rng.getrandbits(128), version=4), restaurant_id, customer_id,
+                    total, f'0912{rng.randrange(10 ** 7):07d}', status, created_at, updated_at,
+                ))
+                payment_status = self._payment_status(status)
+                if payment_status:
+                    paid_at = updated_at if payment_status == Payment.STATUS_SUCCESS else None
+                    payments.append((
+                        payment_id, order_id, total, payment_status, f'{self.prefix}-{order_id}', created_at, paid_at,
+                    ))
+                    payment_id += 1
+                order_id += 1
+
+            with transaction.atomic():
+                orders_table.insert(orders)
+                items_written += items_table.insert(items)
+                payments_written += payments_table.insert(payments)
+
+        self.stats['order_items'] = self.stats.get('order_items', 0) + items_written
+        self.stats['payments'] = self.stats.get('payments', 0) + payments_written
+        return count
+
+    def _payment_status(self, order_status):
+        if order_status in ('preparing', 'on_the_way', 'delivered'):
+            return Payment.STATUS_SUCCESS
+        if order_status == 'pending':
+            return Payment.STATUS_PENDING if self.rng.random() < 0.5 else None
+        # سفارش لغوشده: یا پرداخت ناموفق داشته یا اصلاً به درگاه نرسیده
+        return self.rng.choice([Payment.STATUS_FAILED, Payment.STATUS_EXPIRED, None])
+
+    def reservations(self, count):
+        table = Table(Reservation, ['date', 'time', 'guests', 'name', 'phone', 'created_at'])
+        guests, guest_weights = zip(*GUEST_WEIGHTS.items())
+        guest_weights = _cumulative(guest_weights)
+        today = timezone.localdate()
+
+        def rows():
+            for _ in range(count):
+                date = today + datetime.timedelta(days=self.rng.randrange(-self.days, 30))
+                self.reservation_dates.add(date)
+                yield (
+                    date,
+                    datetime.time(self.rng.randrange(12, 23), self.rng.choice([0, 15, 30, 45])),
+                    self.rng.choices(guests, cum_weights=guest_weights)[0],
+                    self.rng.choice(NAMES),
+                    f'0912{self.rng.randrange(10 ** 7):07d}',
+                    self._timestamp(),
+                )
+
+        return self._write(table, rows())
+
+
+SEEDED_MODELS = (Restaurant, Food, Order, OrderItem, Payment, Reservation)
+
+
+def seed(vendors=100, customers=10000, foods_per_restaurant=30, orders=100000, max_items=5,
+         reservations=20000, defer_indexes=True, **options):
+    """
+    داده را می‌سازد و تعداد سطرهای هر جدول را برمی‌گرداند.
+    هر رستوران یک فروشنده دارد، پس تعداد رستوران‌ها برابر vendors است.
+    """
+    seeder = Seeder(**options)
+    models = (get_user_model(),) + SEEDED_MODELS
+
+    with fast_writes():
+        with deferred_indexes(*models) if defer_indexes else nullcontext():
+            seeder._run('users', seeder.users, vendors, customers)
+            seeder._run('restaurants', seeder.restaurants)
+            seeder._run('foods', seeder.foods, foods_per_restaurant)
+            seeder._run('orders', seeder.orders, orders, max_items)
+            seeder._run('reservations', seeder.reservations, reservations)
+            index_started = time.perf_counter()
+        if defer_indexes and seeder.progress:
+            seeder.progress('indexes', 0, time.perf_counter() - index_started)
+
+    with connection.cursor() as cursor:
+        # شناسه‌ها دستی تعیین شدند؛ sequenceها (در Postgres) باید از بزرگ‌ترین شناسه ادامه دهند
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+        cursor.execute('ANALYZE')
+
+    # رزروها بدون سیگنال نوشته شدند؛ اشغال اسلات‌ها (و پنجره هر رزرو) از امروز به بعد از نو ساخته می‌شود
+    seeder._run('slot_occupancy', rebuild_occupancy, timezone.localdate())
+
+    # کش‌هایی که به این جدول‌ها وابسته‌اند؛ نسخه‌ها جلو می‌روند تا ETagهای قدیمی معتبر نمانند
+    # و ایندکس جستجوی همه پروسه‌ها غذاهای تازه را ببیند
+    invalidate_catalog()
+    invalidate_search_index()
+    for date in seeder.reservation_dates:
+        bump_version(date)
+    return seeder.stats
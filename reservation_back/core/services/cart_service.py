@@ -1,9 +1,64 @@
 from django.db import transaction
+from decimal import Decimal
+
+from django.db.models import BigIntegerField, DecimalField, ExpressionWrapper, F, Prefetch, Value
+from django.db.models.functions import Cast, Round
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
 from core.models import Cart, CartItem, Food
 
 
+class CartVersionConflict(Exception):
+    pass
+
+
+# قیمت هر ردیف در خود دیتابیس محاسبه می‌شود، با همان گرد کردن order_service.unit_price که
+# هنگام checkout ثبت می‌شود. محاسبه با عدد صحیح سنت انجام می‌شود تا روی SQLite (که قیمت گرد را
+# integer ذخیره می‌کند) نه تقسیم صحیح رخ دهد و نه خطای float. BigIntegerField لازم است: روی Postgres
+# سنت قیمت ضربدر (100 - درصد) از بازه int4 بیرون می‌زند (قیمت بالای 214,748.37).
+PRICE_CENTS = Cast(Round(F('food__price') * 100), BigIntegerField())
+UNIT_CENTS = (PRICE_CENTS * (100 - F('food__discount_percent')) + 50) / 100
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * UNIT_CENTS * Value(Decimal('0.01')),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+def cart_read_queryset():
+    items = (
+        CartItem.objects
+        .select_related('food__restaurant')
+        .annotate(line_total=LINE_TOTAL)
+        .order_by('id')
+    )
+    return Cart.objects.prefetch_related(Prefetch('items', queryset=items))
+
+
+def get_cart(user):
+    """سبد خرید با آیتم‌ها، غذاها و رستوران‌ها در تعداد ثابتی کوئری."""
+    cart = cart_read_queryset().filter(user=user).first()
+    if cart is None:
+        Cart.objects.get_or_create(user=user)
+        cart = cart_read_queryset().get(user=user)
+    return cart
+
+
+async def aget_cart(user):
+    """نسخه async get_cart برای viewهای async."""
+    cart = await cart_read_queryset().filter(user=user).afirst()
+    if cart is None:
+        await Cart.objects.aget_or_create(user=user)
+        cart = await cart_read_queryset().aget(user=user)
+    return cart
+
+
+def _bump_version(cart_id, expected=None):
+    queryset = Cart.objects.filter(id=cart_id)
+    if expected is not None:
+        queryset = queryset.filter(version=expected)
+    return queryset.update(version=F('version') + 1)
+
+
 @transaction.atomic
 def add_to_cart(user, food_id, quantity=1):
     if quantity <= 0:
@@ -18,8 +73,9 @@ def add_to_cart(user, food_id, quantity=1):
 
     item.quantity = item.quantity + quantity if not created else quantity
     item.save()
+    _bump_version(cart.id)
 
-    return cart  
+    return get_cart(user)
 
 
 @transaction.atomic
@@ -29,7 +85,8 @@ def remove_from_cart(user, food_id):
         raise ValidationError("سبد خرید یافت نشد.")
 
     CartItem.objects.filter(cart=cart, food_id=food_id).delete()
-    return cart
+    _bump_version(cart.id)
+    return get_cart(user)
 
 
 @transaction.atomic
@@ -45,5 +102,69 @@ def decrement_item(user, food_id):
         item.save()
     else:
         item.delete()
+    _bump_version(cart.id)
 
-    return cart
+    return get_cart(user)
+
+
+def _apply_operations(quantities, operations):
+    for operation in operations:
+        food_id = operation['food_id']
+        quantity = operation.get('quantity', 1)
+        op = operation['op']
+
+        if op == 'add':
+            quantities[food_id] = quantities.get(food_id, 0) + quantity
+        elif op == 'decrement':
+            quantities[food_id] = quantities.get(food_id, 0) - quantity
+        elif op == 'set':
+            quantities[food_id] = quantity
+        elif op == 'remove':
+            quantities.pop(food_id, None)
+    return quantities
+
+
+@transaction.atomic
+def sync_cart(user, version, operations=None, items=None):
+    """
+    چند عملیات (یا وضعیت نهایی سبد) را در یک تراکنش اعمال می‌کند.
+    اگر version با نسخه فعلی سبد یکی نباشد CartVersionConflict می‌دهد.
+    """
+    cart, _ = Cart.objects.get_or_create(user=user)
+
+    # UPDATE شرطی به‌جای select_for_update؛ فقط یکی از درخواست‌های هم‌نسخه برنده می‌شود
+    if not _bump_version(cart.id, expected=version):
+        raise CartVersionConflict("نسخه سبد خرید قدیمی است.")
+
+    current = dict(CartItem.objects.filter(cart=cart).values_list('food_id', 'quantity'))
+
+    if items is not None:
+        desired = {item['food_id']: item['quantity'] for item in items}
+    else:
+        desired = _apply_operations(dict(current), operations or [])
+    desired = {food_id: quantity for food_id, quantity in desired.items() if quantity > 0}
+
+    new_food_ids = set(desired) - set(current)
+    if new_food_ids:
+        found = set(Food.objects.filter(id__in=new_food_ids).values_list('id', flat=True))
+        if found != new_food_ids:
+            raise ValidationError("برخی از غذاها یافت نشدند.")
+
+    removed = set(current) - set(desired)
+    if removed:
+        CartItem.objects.filter(cart=cart, food_id__in=removed).delete()
+
+    changed = [
+        CartItem(cart=cart, food_id=food_id, quantity=quantity)
+        for food_id, quantity in desired.items()
+        if current.get(food_id) != quantity
+    ]
+    if changed:
+        CartItem.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['cart', 'food'],
+            update_fields=['quantity'],
+        )
+
+    return get_cart(user)
@@ -0,0 +1,121 @@
+"""
+snapshot کاتالوگ عمومی (رستوران‌ها با غذاها) در کش.
+
+نسخه کاتالوگ یک شمارنده جدا در کش است و snapshot زیر کلید همان نسخه ذخیره می‌شود. هر تغییر
+رستوران/غذا فقط شمارنده را با incr اتمی بالا می‌برد؛ اولین درخواست بعدی snapshot نسخه جدید را
+کامل از دیتابیس می‌سازد. پس هیچ نوشتنی بین دو به‌روزرسانی همزمان گم نمی‌شود.
+
+کش باید بین همه پروسه‌ها مشترک باشد (Redis/Memcached). با LocMemCache پیش‌فرض هر worker
+شمارنده خودش را دارد و تغییری که در یک worker رخ داده در بقیه تا CATALOG_CACHE_TIMEOUT دیده نمی‌شود.
+bulk_create/bulk_update و update() سیگنال نمی‌فرستند؛ بعد از آن‌ها invalidate_catalog() را صدا بزنید.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from core import fast_serializers
+from core.models import Restaurant, Food
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def _cache_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _initial_version():
+    # اگر شمارنده از کش پاک شود از زمان فعلی شروع می‌شود تا ETagهای قدیمی دوباره معتبر نشوند
+    return time.time_ns() // 1000
+
+
+def _snapshot_key(version):
+    return f'catalog:snapshot:{version}'
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    """بعد از commit تغییر رستوران/غذا: نسخه جدید؛ snapshot آن در اولین درخواست ساخته می‌شود."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), None)
+
+
+def _restaurants_queryset():
+    return Restaurant.objects.order_by('id')
+
+
+def _serialize(restaurants):
+    from core.serializers import RestaurantSerializer
+
+    # بدون request سریالایز می‌شود تا آدرس تصاویر نسبی بماند و snapshot به host وابسته نباشد
+    if fast_serializers.enabled():
+        return fast_serializers.restaurants_data(fast_serializers.restaurant_values(restaurants))
+    restaurants = restaurants.prefetch_related(Prefetch('foods', queryset=Food.objects.order_by('id')))
+    return RestaurantSerializer(restaurants, many=True, context={'request': None}).data
+
+
+def rebuild_catalog(version=None):
+    """
+    snapshot نسخه فعلی را از دیتابیس می‌سازد. نسخه قبل از خواندن دیتابیس گرفته می‌شود؛ اگر وسط ساخت
+    تغییری commit شود نسخه جلو رفته و این snapshot دیگر خوانده نمی‌شود.
+    """
+    if version is None:
+        version = catalog_version()
+    snapshot = {
+        'version': version,
+        'restaurants': list(_serialize(_restaurants_queryset())),
+    }
+    cache.set(_snapshot_key(version), snapshot, _cache_timeout())
+    return snapshot
+
+
+def get_catalog_snapshot():
+    version = catalog_version()
+    snapshot = cache.get(_snapshot_key(version))
+    if snapshot is None:
+        snapshot = rebuild_catalog(version)
+    return snapshot
+
+
+async def aget_catalog_snapshot():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    snapshot = await cache.aget(_snapshot_key(version)) if version is not None else None
+    if snapshot is None:
+        # ساخت snapshot (سریالایزر و کوئری‌ها) همگام است و در نخ جدا اجرا می‌شود
+        snapshot = await sync_to_async(get_catalog_snapshot)()
+    return snapshot
+
+
+def catalog_etag(snapshot):
+    return f'"catalog-{snapshot["version"]}"'
+
+
+def absolutize_catalog(restaurants, request):
+    """آدرس نسبی تصاویر را برای پاسخ فعلی مطلق می‌کند (بدون تغییر snapshot کش‌شده)."""
+    if request is None:
+        return restaurants
+
+    def absolute(url):
+        return request.build_absolute_uri(url) if url else url
+
+    result = []
+    for restaurant in restaurants:
+        restaurant = dict(restaurant, image=absolute(restaurant['image']))
+        foods = []
+        for food in restaurant['foods']:
+            nested = food['restaurant']
+            foods.append(dict(food, restaurant=dict(nested, image=absolute(nested['image']))))
+        restaurant['foods'] = foods
+        result.append(restaurant)
+    return result
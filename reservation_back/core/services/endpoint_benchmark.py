@@ -0,0 +1,153 @@
+"""
+سناریوهای بنچمارک endpointهای پرترافیک روی داده synthetic_data.
+
+هم تست‌ها (فقط تعداد کوئری، core/tests.py) و هم دستور benchmark_endpoints (زمان پاسخ) از این
+سناریوها استفاده می‌کنند. هر سناریو داده لازمش را خودش می‌سازد و یک تابع call(i) برمی‌گرداند.
+"""
+import datetime
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Order
+from payments.models import Payment
+from reservation.models import CapacityRule
+from reservation_back.auth import tokens_for_user
+
+BUDGETS_PATH = Path(__file__).resolve().parent.parent / 'benchmark_budgets.json'
+CARD = {'card_number': '6037990000001234', 'cvv2': '123', 'otp': '123456'}
+# تنظیمات لازم برای اجرای سناریوها (برای override_settings)
+SETTINGS = {
+    'RATELIMIT_ENABLE': False,
+    'OUTBOX_DISPATCH_IN_PROCESS': False,
+    'PAYMENT_GATEWAY': {'OPTIONS': {'approve_rate': 1.0, 'seed': 1234}},
+}
+DATA_OPTIONS = {'seed': 1234, 'restaurants': 10, 'foods_per_restaurant': 30, 'customers': 5}
+# با نمونه کمتر، p99 همان بیشینه است و گزارش نمی‌شود
+P99_MIN_SAMPLES = 100
+
+
+def load_budgets():
+    return json.loads(BUDGETS_PATH.read_text()) if BUDGETS_PATH.exists() else {}
+
+
+def save_budgets(results):
+    budgets = load_budgets()
+    budgets.update(results)
+    BUDGETS_PATH.write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class EndpointBenchmark:
+    """سناریوها روی داده generate(**DATA_OPTIONS)؛ مشتری اول با کوکی JWT واقعی درخواست می‌دهد."""
+
+    # نام ← (متد سازنده، وضعیت مورد انتظار)
+    SCENARIOS = {
+        'restaurants-public': ('restaurants_public', 200),
+        'cart-add': ('cart_add', 200),
+        'orders-create': ('order_create', 201),
+        'orders-checkout': ('order_checkout', 200),
+        'payments-verify': ('payment_verify', 200),
+        'reservations-create': ('reservation_create', 200),
+    }
+
+    def __init__(self, data):
+        self.customer = data['customers'][0]
+        self.restaurant = data['restaurants'][0]
+        self.foods = [food for food in data['foods'] if food.restaurant_id == self.restaurant.id]
+        self.client = Client()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.customer).access_token)
+
+    def prepare(self, name, iterations):
+        """تابع call(i) سناریو؛ i از -1 (گرم کردن) تا iterations - 1."""
+        method, _ = self.SCENARIOS[name]
+        return getattr(self, method)(iterations)
+
+    def measure(self, name, iterations):
+        """
+        سناریو را گرم می‌کند و iterations بار اجرا می‌کند.
+        خروجی: (پاسخ‌ها، تعداد کوئری هر اجرا، زمان هر اجرا به میلی‌ثانیه)
+        """
+        call = self.prepare(name, iterations)
+        call(-1)  # گرم کردن کش‌ها؛ در نتایج حساب نمی‌شود
+        responses, queries, durations = [], [], []
+        for i in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                responses.append(call(i))
+                durations.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        return responses, queries, durations
+
+    @staticmethod
+    def summary(queries, durations):
+        result = {
+            'queries': max(queries),
+            'p50_ms': round(statistics.median(durations), 2),
+            'max_ms': round(max(durations), 2),
+        }
+        if len(durations) >= P99_MIN_SAMPLES:
+            result['p99_ms'] = round(percentile(durations, 0.99), 2)
+        return result
+
+    def _post(self, path, payload):
+        return self.client.post(path, json.dumps(payload), content_type='application/json')
+
+    def restaurants_public(self, iterations):
+        anonymous = Client()
+        return lambda i: anonymous.get('/api/restaurants-public/')
+
+    def cart_add(self, iterations):
+        return lambda i: self._post(
+            '/api/cart/add/', {'food_id': self.foods[i % len(self.foods)].id, 'quantity': 1}
+        )
+
+    def order_create(self, iterations):
+        items = [{'food_id': food.id, 'quantity': 2} for food in self.foods[:3]]
+        return lambda i: self._post('/api/orders/', {'restaurant': self.restaurant.id, 'items': items})
+
+    def order_checkout(self, iterations):
+        orders = self._pending_orders(iterations + 1)
+        return lambda i: self._post(
+            f'/api/orders/{orders[i + 1].uuid}/checkout/', {'address': 'تهران', 'phone': '09120000000'}
+        )
+
+    def payment_verify(self, iterations):
+        orders = self._pending_orders(iterations + 1)
+        payments = Payment.objects.bulk_create(
+            Payment(order=order, amount=order.total_price, ref_code=f'bench{order.id:015d}') for order in orders
+        )
+        return lambda i: self._post('/api/payments/verify-fake/', dict(CARD, ref_code=payments[i + 1].ref_code))
+
+    def reservation_create(self, iterations):
+        # مسیر واقعی با ظرفیت؛ بدون قانون ظرفیت رزرو کوئری‌های اسلات را ندارد
+        CapacityRule.objects.get_or_create(
+            weekday=None, defaults={'opens_at': datetime.time(12), 'closes_at': datetime.time(23), 'seats': 40},
+        )
+        start = datetime.date(2031, 1, 1)
+        return lambda i: self._post('/api/reservations/', {
+            'date': str(start + datetime.timedelta(days=i + 1)),
+            'time': '19:30',
+            'guests': 4,
+            'name': 'بنچمارک',
+            'phone': '09120000000',
+        })
+
+    def _pending_orders(self, count):
+        items = [{'food_id': food.id, 'quantity': 1} for food in self.foods[:2]]
+        uuids = []
+        for _ in range(count):
+            response = self._post('/api/orders/', {'restaurant': self.restaurant.id, 'items': items})
+            if response.status_code != 201:
+                raise AssertionError(f'order setup failed: {response.status_code} {response.content[:500]!r}')
+            uuids.append(response.json()['uuid'])
+        return list(Order.objects.filter(uuid__in=uuids).order_by('id'))
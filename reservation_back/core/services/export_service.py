@@ -0,0 +1,141 @@
+import csv
+import datetime
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# هر دیتاست: فیلد تاریخ برای فیلتر بازه و ستون‌هایی که با values_list خوانده می‌شوند
+DATASETS = {
+    'reservations': {
+        'model': 'reservation.Reservation',
+        'date_field': 'date',
+        'columns': ('id', 'date', 'time', 'guests', 'name', 'phone', 'message', 'created_at'),
+    },
+    'orders': {
+        'model': 'core.Order',
+        'date_field': 'created_at',
+        'restaurant_field': 'restaurant_id',
+        'columns': (
+            'id', 'uuid', 'restaurant_id', 'restaurant__name', 'user_id', 'user__username',
+            'status', 'total_price', 'address', 'phone', 'note', 'checkout_group',
+            'created_at', 'updated_at',
+        ),
+    },
+    'order-items': {
+        'model': 'core.OrderItem',
+        'date_field': 'order__created_at',
+        'restaurant_field': 'order__restaurant_id',
+        'columns': (
+            'id', 'order_id', 'order__uuid', 'order__restaurant_id', 'food_id', 'food__name',
+            'quantity', 'unit_price', 'order__created_at',
+        ),
+    },
+}
+
+
+# سلول متنی که با این نویسه‌ها شروع شود در Excel/LibreOffice فرمول حساب می‌شود (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def parse_range(start=None, end=None):
+    """بازه تاریخ (هر دو سر شامل)؛ ValueError برای تاریخ نامعتبر."""
+    parsed = []
+    for value in (start, end):
+        if not value:
+            parsed.append(None)
+            continue
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"تاریخ نامعتبر: {value}")
+        parsed.append(date)
+    if parsed[0] and parsed[1] and parsed[0] > parsed[1]:
+        raise ValueError("ابتدای بازه بعد از انتهای آن است.")
+    return parsed
+
+
+def _date_filter(field, start, end):
+    if field == 'date':
+        lookups = {}
+        if start:
+            lookups['date__gte'] = start
+        if end:
+            lookups['date__lte'] = end
+        return lookups
+
+    # فیلد datetime: به جای __date با مرزهای زمانی فیلتر می‌شود تا ایندکس قابل استفاده بماند
+    lookups = {}
+    tz = timezone.get_current_timezone()
+    if start:
+        lookups[f'{field}__gte'] = datetime.datetime.combine(start, datetime.time.min, tz)
+    if end:
+        lookups[f'{field}__lt'] = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tz)
+    return lookups
+
+
+def export_queryset(dataset, start=None, end=None, restaurant_id=None):
+    spec = DATASETS[dataset]
+    model = apps.get_model(spec['model'])
+    queryset = model.objects.filter(**_date_filter(spec['date_field'], start, end))
+    if restaurant_id is not None:
+        queryset = queryset.filter(**{spec['restaurant_field']: restaurant_id})
+    return spec['columns'], queryset.order_by('id').values_list(*spec['columns'])
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class _Buffer:
+    """جایگزین فایل برای csv.writer؛ خروجی هر ردیف مستقیم برگردانده می‌شود."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    # متن واردشده توسط کاربر (نام، پیام، یادداشت) با ' شروع می‌شود تا صفحه‌گسترده آن را فرمول نخواند
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _encode_rows(columns, rows, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(_Buffer())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_csv_cell(value) for value in row])
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + '\n'
+
+
+def stream_export(columns, queryset, fmt, batch_bytes=64 * 1024):
+    """
+    بایت‌های خروجی را تکه‌تکه تولید می‌کند. ردیف‌ها با iterator از دیتابیس خوانده می‌شوند
+    (بدون کش queryset) و چند ردیف در یک تکه جمع می‌شوند تا تعداد writeها کم بماند.
+    """
+    rows = queryset.iterator(chunk_size=_chunk_size())
+    buffer, size = [], 0
+    for line in _encode_rows(columns, rows, fmt):
+        buffer.append(line)
+        size += len(line)
+        if size >= batch_bytes:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_TTL', 24 * 60 * 60))
+
+
+def _lock_timeout():
+    # اگر درخواست اصلی در این مدت پاسخی ثبت نکرد (مثلاً پروسه از کار افتاد) کلید آزاد می‌شود
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60))
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode())
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def _request_of(args):
+    # هم برای تابع view (request, ...) و هم متد کلاس (self, request, ...)
+    return args[0] if hasattr(args[0], 'META') else args[1]
+
+
+def _claim(key_hash, request_hash):
+    """
+    کلید را برای اجرای این درخواست رزرو می‌کند.
+    خروجی: (None, None) اگر باید اجرا شود، وگرنه (رکورد قبلی، پاسخ خطا یا None برای replay).
+    """
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+
+    if record is not None and record.expires_at <= now:
+        IdempotencyKey.objects.filter(id=record.id, expires_at=record.expires_at).delete()
+        record = None
+
+    if record is not None:
+        if record.request_hash != request_hash:
+            return record, JsonResponse(
+                {'error': 'این Idempotency-Key قبلاً برای درخواست دیگری استفاده شده است.'}, status=422
+            )
+        if record.status_code is not None:
+            return record, None
+        if record.created_at > now - _lock_timeout():
+            return record, JsonResponse({'error': 'درخواست با همین کلید در حال پردازش است.'}, status=409)
+        # درخواست اصلی رها شده؛ فقط یکی از درخواست‌های همزمان کلید را پس می‌گیرد
+        taken = IdempotencyKey.objects.filter(
+            id=record.id, status_code__isnull=True, created_at=record.created_at
+        ).update(created_at=now)
+        if not taken:
+            return record, JsonResponse({'error': 'درخواست با همین کلید در حال پردازش است.'}, status=409)
+        return None, None
+
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                key_hash=key_hash, request_hash=request_hash, created_at=now, expires_at=now + _ttl()
+            )
+    except IntegrityError:
+        return None, JsonResponse({'error': 'درخواست با همین کلید در حال پردازش است.'}, status=409)
+    return None, None
+
+
+def _replay(record):
+    if record.content_type:
+        response = HttpResponse(record.body, status=record.status_code, content_type=record.content_type)
+    else:
+        response = Response(json.loads(record.body), status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(key_hash, response):
+    if isinstance(response, Response):
+        content_type, body = '', json.dumps(response.data, cls=JSONEncoder)
+    else:
+        content_type, body = response['Content-Type'], response.content.decode()
+    IdempotencyKey.objects.filter(key_hash=key_hash).update(
+        status_code=response.status_code, content_type=content_type, body=body
+    )
+
+
+def _release(key_hash):
+    IdempotencyKey.objects.filter(key_hash=key_hash, status_code__isnull=True).delete()
+
+
+def idempotent(scope):
+    """
+    دکوراتور view نوشتنی. با هدر Idempotency-Key، تکرار همان درخواست پاسخ اول را
+    با یک جستجو برمی‌گرداند و view دوباره اجرا نمی‌شود. پاسخ‌های 5xx و 429 ذخیره نمی‌شوند
+    تا کلاینت بتواند دوباره تلاش کند.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return _async_wrapper(scope, view)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = _request_of(args)
+            key = request.META.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'error': 'Idempotency-Key بیش از حد طولانی است.'}, status=400)
+
+            key_hash, request_hash = _hashes(scope, request, key, getattr(request, 'user', None))
+            record, error = _claim(key_hash, request_hash)
+            if error is not None:
+                return error
+            if record is not None:
+                return _replay(record)
+
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                _release(key_hash)
+                raise
+
+            _finish(key_hash, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_wrapper(scope, view):
+    """همان منطق برای viewهای async؛ کار دیتابیسی کلید در نخ جدا انجام می‌شود."""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        request = _request_of(args)
+        key = request.META.get(HEADER)
+        if not key:
+            return await view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'error': 'Idempotency-Key بیش از حد طولانی است.'}, status=400)
+
+        # request.user در حالت async تنبل است و خواندن مستقیمش کوئری همگام می‌زند
+        user = await request.auser() if hasattr(request, 'auser') else None
+        key_hash, request_hash = _hashes(scope, request, key, user)
+        record, error = await sync_to_async(_claim)(key_hash, request_hash)
+        if error is not None:
+            return error
+        if record is not None:
+            return _replay(record)
+
+        try:
+            response = await view(*args, **kwargs)
+        except BaseException:
+            await sync_to_async(_release)(key_hash)
+            raise
+
+        await sync_to_async(_finish)(key_hash, response)
+        return response
+    return wrapper
+
+
+def _owner(raw, user):
+    if user is not None and user.is_authenticated:
+        return user.pk
+    # کاربر مهمان: کلید یکسان دو کلاینت نباید پاسخ هم را بگیرد؛ مثل ratelimit (user_or_ip) از
+    # REMOTE_ADDR استفاده می‌شود، و اگر session دارد از کلید session
+    session = getattr(raw, 'session', None)
+    session_key = session.session_key if session is not None else None
+    if session_key:
+        return f'anon:session:{session_key}'
+    return f"anon:ip:{raw.META.get('REMOTE_ADDR', '')}"
+
+
+def _hashes(scope, request, key, user):
+    raw = getattr(request, '_request', request)
+    return _digest(scope, _owner(raw, user), key), _digest(request.method, request.path, raw.body)
+
+
+def _finish(key_hash, response):
+    if response.status_code >= 500 or response.status_code == 429:
+        _release(key_hash)
+    else:
+        _store(key_hash, response)
+
+
+def purge_expired(batch_size=5000):
+    """کلیدهای منقضی را دسته‌دسته حذف می‌کند؛ تعداد حذف‌شده را برمی‌گرداند."""
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,206 @@
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from core.models import Cart, CartItem, Food, Order, OrderItem
+from reservation_back.realtime import publish
+
+CENT = Decimal('0.01')
+
+
+def unit_price(food):
+    return food.discounted_price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _load_foods(food_ids):
+    food_ids = set(food_ids)
+    foods = Food.objects.in_bulk(food_ids)
+    if len(foods) != len(food_ids):
+        raise ValidationError("برخی از غذاها یافت نشدند.")
+    return foods
+
+
+def _build_order(user, restaurant_id, items, foods, **details):
+    lines = [
+        OrderItem(food=foods[food_id], quantity=quantity, unit_price=unit_price(foods[food_id]))
+        for food_id, quantity in items
+    ]
+    order = Order.objects.create(
+        user=user,
+        restaurant_id=restaurant_id,
+        total_price=sum((line.total_price() for line in lines), Decimal('0')),
+        **details
+    )
+    for line in lines:
+        line.order = order
+    OrderItem.objects.bulk_create(lines)
+    return order
+
+
+@transaction.atomic
+def create_order(user, restaurant, items, **details):
+    """
+    items لیستی از (food_id, quantity) است.
+    قیمت واحد هر غذا همین‌جا ثبت و جمع سفارش ذخیره می‌شود.
+    """
+    if not items:
+        raise ValidationError("سفارش بدون آیتم قابل ثبت نیست.")
+
+    foods = _load_foods(food_id for food_id, _ in items)
+    if any(food.restaurant_id != restaurant.id for food in foods.values()):
+        raise ValidationError("همه غذاهای سفارش باید از همان رستوران باشند.")
+    return _build_order(user, restaurant.id, items, foods, **details)
+
+
+@transaction.atomic
+def checkout_cart(user, **details):
+    """
+    سبد را بر اساس رستوران گروه‌بندی می‌کند و برای هر رستوران یک سفارش می‌سازد.
+    همه سفارش‌ها با یک bulk_create و همه آیتم‌ها با یک bulk_create نوشته می‌شوند.
+    """
+    cart = Cart.objects.filter(user=user).first()
+    items = list(CartItem.objects.filter(cart=cart).values_list('food_id', 'quantity')) if cart else []
+    if not items:
+        raise ValidationError("سبد خرید خالی است.")
+
+    foods = _load_foods(food_id for food_id, _ in items)
+
+    lines_by_restaurant = {}
+    for food_id, quantity in items:
+        food = foods[food_id]
+        lines_by_restaurant.setdefault(food.restaurant_id, []).append(
+            OrderItem(food=food, quantity=quantity, unit_price=unit_price(food))
+        )
+
+    checkout_group = uuid.uuid4()
+    orders = [
+        Order(
+            user=user,
+            restaurant_id=restaurant_id,
+            total_price=sum((line.total_price() for line in lines), Decimal('0')),
+            checkout_group=checkout_group,
+            **details
+        )
+        for restaurant_id, lines in lines_by_restaurant.items()
+    ]
+    Order.objects.bulk_create(orders)
+
+    all_lines = []
+    for order, lines in zip(orders, lines_by_restaurant.values()):
+        for line in lines:
+            line.order = order
+        all_lines.extend(lines)
+    OrderItem.objects.bulk_create(all_lines)
+
+    CartItem.objects.filter(cart=cart).delete()
+    Cart.objects.filter(id=cart.id).update(version=F('version') + 1)
+    return checkout_group, orders
+
+
+def visible_orders(user, restaurant_id=None):
+    """
+    سفارش‌هایی که کاربر می‌بیند. restaurant_id فروشنده را فراخواننده می‌دهد (از توکن یا کوئری
+    جدا) تا این تابع خودش کوئری نزند و در viewهای async هم قابل استفاده باشد.
+    """
+    if user.role == 'customer':
+        return Order.objects.filter(user=user)
+    if user.role == 'vendor':
+        # فیلتر مستقیم روی restaurant_id تا ایندکس‌های ترکیبی سفارش استفاده شوند
+        return Order.objects.filter(restaurant_id=restaurant_id)
+    if user.role == 'admin':
+        return Order.objects.all()
+    return Order.objects.none()
+
+
+def group_orders(user, checkout_group):
+    return Order.objects.filter(user=user, checkout_group=checkout_group)
+
+
+ACTIVE_ORDER_STATUSES = ('pending', 'preparing', 'on_the_way')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_feed_cursor(order):
+    micros = (order.updated_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{order.id}"
+
+
+def decode_feed_cursor(cursor):
+    try:
+        micros, order_id = (int(part) for part in cursor.split('-', 1))
+    except (AttributeError, ValueError):
+        raise ValidationError("cursor نامعتبر است.")
+    updated_at = EPOCH + timedelta(microseconds=micros)
+    return updated_at, order_id
+
+
+def _feed_overlap():
+    # باید از طولانی‌ترین تراکنشی که سفارش را تغییر می‌دهد بیشتر باشد
+    return timedelta(seconds=getattr(settings, 'ORDERS_FEED_OVERLAP_SECONDS', 5))
+
+
+def orders_feed(queryset, cursor=None, limit=50):
+    """
+    فقط سفارش‌هایی که بعد از cursor ساخته یا تغییر کرده‌اند را برمی‌گرداند.
+    بدون cursor، سفارش‌های فعال (کار در جریان داشبورد) برگردانده می‌شوند.
+    خروجی: (orders, next_cursor, has_more)
+
+    updated_at با ساعت برنامه و پیش از commit ثبت می‌شود؛ تراکنشی که updated_at قدیمی‌تری دارد ولی
+    بعد از خواندن cursor جلوتر commit می‌شود وگرنه برای همیشه جا می‌ماند. برای همین سفارش‌های
+    ORDERS_FEED_OVERLAP_SECONDS ثانیه پیش از cursor هم دوباره برگردانده می‌شوند (جزو limit نیستند و
+    cursor را جلو نمی‌برند)؛ کلاینت باید نتایج را با id یکی کند.
+    """
+    overlap = []
+    if cursor:
+        updated_at, order_id = decode_feed_cursor(cursor)
+        after = Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=order_id)
+        overlap = list(
+            queryset.exclude(after).filter(updated_at__gte=updated_at - _feed_overlap())
+            .order_by('updated_at', 'id')[:limit]
+        )
+        queryset = queryset.filter(after)
+    else:
+        queryset = queryset.filter(status__in=ACTIVE_ORDER_STATUSES)
+
+    orders = list(queryset.order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_feed_cursor(orders[-1]) if orders else cursor
+    return overlap + orders, next_cursor, has_more
+
+
+def publish_order_status(order):
+    """وضعیت سفارش بعد از commit روی کانال‌های سفارش و رستوران push می‌شود."""
+    payload = {
+        'uuid': str(order.uuid),
+        'status': order.status,
+        'restaurant': order.restaurant_id,
+        'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+    }
+
+    def send():
+        publish(f"order-{payload['uuid']}", 'order-status', payload)
+        publish(f"restaurant-{payload['restaurant']}", 'order-status', payload)
+
+    transaction.on_commit(send)
+
+
+def transition_order(order, to_status, from_statuses=('pending',)):
+    """
+    تغییر وضعیت به صورت compare-and-set: UPDATE ... WHERE status IN from_statuses.
+    فقط درخواستی که سطر را تغییر داده برنده است؛ بدون select_for_update.
+    """
+    now = timezone.now()
+    updated = Order.objects.filter(id=order.id, status__in=from_statuses).update(
+        status=to_status, updated_at=now
+    )
+    if not updated:
+        return False
+    order.status, order.updated_at = to_status, now
+    publish_order_status(order)
+    return True
@@ -0,0 +1,334 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+
+from core.models import Food
+
+# نویسه‌های عربی که در متن فارسی زیاد دیده می‌شوند
+CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'آ': 'ا',
+    'ؤ': 'و',
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+# اعراب، تنوین، الف خنجری و کشیده
+DIACRITICS_RE = re.compile('[\u064B-\u065F\u0670\u0640]')
+# نویسه‌های جهت‌دهی و نیم‌فاصله‌های غیراستاندارد؛ همه به ZWNJ تبدیل می‌شوند
+JOINERS_RE = re.compile('[\u200d\u200e\u200f\u00ad]')
+ZWNJ = '\u200c'
+WORD_RE = re.compile(r'\w+(?:\u200c\w+)*')
+
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+PREFIX_FACTOR = 0.5
+# نسخه مشترک ایندکس در کش؛ تغییرات انبوه بدون سیگنال (مثل seed_data) آن را عوض می‌کنند
+INDEX_VERSION_KEY = 'search:version'
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    text = (text or '').translate(CHAR_MAP)
+    text = DIACRITICS_RE.sub('', text)
+    text = JOINERS_RE.sub(ZWNJ, text)
+    return text.lower()
+
+
+def tokenize(text, split_joined=False):
+    """
+    «کباب‌ها» همیشه به «کبابها» تبدیل می‌شود تا با نوشتار بدون نیم‌فاصله یکی شود.
+    با split_joined اجزای «جوجه‌کباب» هم جدا ایندکس می‌شوند.
+    """
+    tokens = []
+    for word in WORD_RE.findall(normalize(text)):
+        parts = word.split(ZWNJ)
+        tokens.append(''.join(parts))
+        if split_joined and len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def _document(food, restaurant_name):
+    return {
+        'id': food.id,
+        'name': food.name,
+        'description': food.description,
+        'price': food.price,
+        'discount_percent': food.discount_percent,
+        'discounted_price': food.discounted_price,
+        'restaurant': {'id': food.restaurant_id, 'name': restaurant_name},
+    }
+
+
+class FoodSearchIndex:
+    """
+    ایندکس معکوس درون‌حافظه‌ای روی نام و توضیحات غذا.
+    توکن‌ها مرتب نگه داشته می‌شوند تا جستجوی پیشوندی با bisect انجام شود.
+
+    در هر لحظه فقط یک بازسازی اجرا می‌شود. upsert/remove هایی که حین بازسازی می‌رسند هم روی ایندکس
+    فعلی اعمال می‌شوند و هم در یک journal ثبت می‌شوند تا پیش از جایگزینی روی ایندکس تازه تکرار شوند؛
+    وگرنه تغییری که بعد از شروع کوئری بازسازی commit شده با جایگزینی گم می‌شد.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        # food_id ← (food، نام رستوران) یا None برای حذف؛ فقط حین بازسازی مقدار دارد
+        self._journal = None
+        self._postings = {}
+        self._vocabulary = []
+        self._documents = {}
+        self._doc_tokens = {}
+        self.built_at = None
+        self.version = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    @property
+    def is_rebuilding(self):
+        return self._rebuild_lock.locked()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def rebuild(self, blocking=True):
+        """
+        ایندکس را از دیتابیس بازسازی می‌کند. اگر بازسازی دیگری در جریان باشد، با blocking=False
+        بلافاصله False برمی‌گرداند و در غیر این صورت منتظر تمام شدن آن می‌ماند و دوباره می‌سازد.
+        """
+        if not self._rebuild_lock.acquire(blocking=blocking):
+            return False
+        try:
+            self._rebuild()
+        finally:
+            self._rebuild_lock.release()
+        return True
+
+    def ensure_built(self):
+        """ساخت اولیه؛ درخواست‌های هم‌زمان منتظر همان یک ساخت می‌مانند و دوباره نمی‌سازند."""
+        with self._rebuild_lock:
+            if not self.is_built:
+                self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            self._journal = {}
+        # پیش از خواندن دیتابیس؛ اگر هم‌زمان دوباره باطل شود، بازسازی بعدی آن را می‌آورد
+        version = cache.get(INDEX_VERSION_KEY)
+        try:
+            foods = Food.objects.select_related('restaurant').only(
+                'id', 'name', 'description', 'price', 'discount_percent', 'restaurant__name'
+            )
+            # ایندکس تازه جدا ساخته و در پایان جایگزین می‌شود تا جستجوها منتظر نمانند
+            fresh = FoodSearchIndex()
+            for food in foods.iterator(chunk_size=2000):
+                fresh._add(food, food.restaurant.name)
+
+            with self._lock:
+                for food_id, change in self._journal.items():
+                    fresh._remove(food_id)
+                    if change is not None:
+                        fresh._add(*change)
+                self._postings = fresh._postings
+                self._vocabulary = sorted(fresh._postings)
+                self._documents = fresh._documents
+                self._doc_tokens = fresh._doc_tokens
+                self.built_at = time.monotonic()
+                self.version = version
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def upsert(self, food, restaurant_name):
+        with self._lock:
+            if self._journal is not None:
+                self._journal[food.id] = (food, restaurant_name)
+            self._remove(food.id)
+            for token in self._add(food, restaurant_name):
+                if len(self._postings[token]) == 1:
+                    insort(self._vocabulary, token)
+
+    def remove(self, food_id):
+        with self._lock:
+            if self._journal is not None:
+                self._journal[food_id] = None
+            self._remove(food_id)
+
+    def _add(self, food, restaurant_name):
+        weights = {}
+        for token in tokenize(food.name, split_joined=True):
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(food.description, split_joined=True):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[food.id] = weight
+        self._documents[food.id] = _document(food, restaurant_name)
+        self._doc_tokens[food.id] = tuple(weights)
+        return weights
+
+    def _remove(self, food_id):
+        for token in self._doc_tokens.pop(food_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(food_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+        self._documents.pop(food_id, None)
+
+    def _prefix_tokens(self, prefix):
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            yield self._vocabulary[position]
+            position += 1
+
+    def search(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token in self._prefix_tokens(term):
+                    factor = 1 if token == term else PREFIX_FACTOR
+                    for food_id, weight in self._postings[token].items():
+                        term_scores[food_id] = max(term_scores.get(food_id, 0), weight * factor)
+
+                # همه کلمات جستجو باید در غذا باشند
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        food_id: score + term_scores[food_id]
+                        for food_id, score in scores.items()
+                        if food_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+            ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+            return [dict(self._documents[food_id], score=score) for food_id, score in ranked]
+
+
+food_index = FoodSearchIndex()
+
+
+def _max_age():
+    # هر پروسه فقط تغییرات خودش را از سیگنال می‌بیند؛ بازسازی دوره‌ای تغییرات بقیه را هم می‌آورد
+    return getattr(settings, 'SEARCH_INDEX_MAX_AGE', 5 * 60)
+
+
+def invalidate_search_index():
+    """بعد از تغییر انبوه غذاها: ایندکس همه پروسه‌ها در جستجوی بعدی در پس‌زمینه بازسازی می‌شود."""
+    cache.set(INDEX_VERSION_KEY, time.time_ns(), None)
+
+
+def _is_stale():
+    if time.monotonic() - food_index.built_at > _max_age():
+        return True
+    return cache.get(INDEX_VERSION_KEY) != food_index.version
+
+
+def _background_rebuild():
+    try:
+        food_index.rebuild(blocking=False)
+    except Exception:
+        logger.exception('search index rebuild failed')
+    finally:
+        # اتصال‌های دیتابیس این thread را کسی دیگر نمی‌بندد
+        connections.close_all()
+
+
+def refresh_in_background():
+    """بازسازی در یک thread جدا؛ اگر بازسازی دیگری در جریان باشد کاری نمی‌کند."""
+    if food_index.is_rebuilding:
+        return False
+    threading.Thread(target=_background_rebuild, name='food-search-rebuild', daemon=True).start()
+    return True
+
+
+def search_foods(query, limit=20):
+    # فقط ساخت اولیه روی thread درخواست انجام می‌شود؛ ایندکس کهنه تا پایان بازسازی پس‌زمینه سرویس می‌دهد
+    if not food_index.is_built:
+        food_index.ensure_built()
+    elif _is_stale():
+        refresh_in_background()
+    return food_index.search(query, limit)
+
+
+def _accepts_changes():
+    # حین ساخت اولیه هم تغییرات لازم‌اند تا در journal بمانند
+    return food_index.is_built or food_index.is_rebuilding
+
+
+def _batch_limit():
+    # بیش از این تعداد تغییر در یک تراکنش: به‌جای خواندن تک‌تک، کل ایندکس (همه پروسه‌ها) بازسازی می‌شود
+    return getattr(settings, 'SEARCH_INDEX_BATCH_LIMIT', 200)
+
+
+# شناسه‌های تغییرکرده تراکنش جاری این thread؛ بعد از commit همه با یک کوئری خوانده می‌شوند
+_pending = threading.local()
+
+
+def _take_pending(name):
+    ids = getattr(_pending, name, None) or set()
+    setattr(_pending, name, set())
+    return ids
+
+
+def _queue(name, object_id):
+    ids = getattr(_pending, name, None)
+    if ids is None:
+        ids = set()
+        setattr(_pending, name, ids)
+    ids.add(object_id)
+    # هر تغییر callback خودش را ثبت می‌کند تا rollback یک تراکنش تغییرات بعدی را گم نکند؛
+    # اولین callback بعد از commit همه را برمی‌دارد و بقیه کاری ندارند
+    transaction.on_commit(_flush_pending)
+
+
+def index_food(food_id):
+    """غذا بعد از commit تراکنش جاری دوباره ایندکس (یا حذف) می‌شود."""
+    _queue('food_ids', food_id)
+
+
+def index_restaurant_foods(restaurant_id):
+    """غذاهای رستوران (مثلاً بعد از تغییر نام) بعد از commit دوباره ایندکس می‌شوند."""
+    _queue('restaurant_ids', restaurant_id)
+
+
+def _flush_pending():
+    food_ids, restaurant_ids = _take_pending('food_ids'), _take_pending('restaurant_ids')
+    if not (food_ids or restaurant_ids) or not _accepts_changes():
+        return
+    if len(food_ids) + len(restaurant_ids) > _batch_limit():
+        invalidate_search_index()
+        return
+
+    found = set()
+    foods = Food.objects.select_related('restaurant').filter(Q(id__in=food_ids) | Q(restaurant_id__in=restaurant_ids))
+    for food in foods:
+        food_index.upsert(food, food.restaurant.name)
+        found.add(food.id)
+    for food_id in food_ids - found:
+        food_index.remove(food_id)
@@ -0,0 +1,105 @@
+"""
+تولید داده آزمایشی قطعی (با seed یکسان همیشه همان داده ساخته می‌شود) برای بنچمارک‌ها و تست‌ها.
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from core.models import Restaurant, Food, Order, OrderItem
+from core.services.order_service import unit_price
+from reservation.models import Reservation
+
+PASSWORD = 'synthetic-Passw0rd!'
+
+DISHES = ['کباب', 'جوجه', 'قورمه', 'قیمه', 'زرشک‌پلو', 'باقالی‌پلو', 'فسنجان', 'کوفته', 'آش', 'سالاد']
+STYLES = ['ویژه', 'سنتی', 'خانگی', 'مخصوص', 'سلطانی', 'برگ', 'لقمه', 'تابه‌ای']
+NAMES = ['علی', 'مریم', 'رضا', 'زهرا', 'حسین', 'فاطمه', 'سارا', 'امیر', 'نرگس', 'مهدی']
+
+
+def generate(seed=0, restaurants=5, foods_per_restaurant=20, customers=20, orders_per_customer=3,
+             reservations=50, prefix='synth'):
+    """
+    داده را با bulk_create می‌سازد و رمز عبور همه کاربران یک بار هش می‌شود.
+    خروجی: دیکشنری از اشیای ساخته‌شده (vendors، restaurants، foods، customers، orders، reservations).
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    password = make_password(PASSWORD)
+
+    vendors = User.objects.bulk_create(
+        User(username=f'{prefix}-vendor-{i}', email=f'{prefix}-vendor-{i}@example.com',
+             password=password, role='vendor')
+        for i in range(restaurants)
+    )
+    customer_users = User.objects.bulk_create(
+        User(username=f'{prefix}-customer-{i}', email=f'{prefix}-customer-{i}@example.com',
+             password=password, role='customer')
+        for i in range(customers)
+    )
+
+    restaurant_rows = Restaurant.objects.bulk_create(
+        Restaurant(name=f'رستوران {i + 1}', owner=vendor, description=rng.choice(STYLES))
+        for i, vendor in enumerate(vendors)
+    )
+    foods = Food.objects.bulk_create(
+        Food(
+            restaurant=restaurant,
+            name=f'{rng.choice(DISHES)} {rng.choice(STYLES)}',
+            description=' '.join(rng.sample(DISHES, 3)),
+            price=Decimal(rng.randrange(50, 500) * 1000),
+            discount_percent=rng.choice([0, 0, 0, 5, 10, 20]),
+        )
+        for restaurant in restaurant_rows
+        for _ in range(foods_per_restaurant)
+    )
+
+    foods_by_restaurant = {}
+    for food in foods:
+        foods_by_restaurant.setdefault(food.restaurant_id, []).append(food)
+
+    order_specs = []
+    for customer in customer_users:
+        for _ in range(orders_per_customer):
+            restaurant = rng.choice(restaurant_rows)
+            picked = rng.sample(foods_by_restaurant[restaurant.id], min(3, foods_per_restaurant))
+            lines = [(food, rng.randint(1, 3)) for food in picked]
+            order_specs.append((customer, restaurant, lines))
+
+    orders = Order.objects.bulk_create(
+        Order(
+            restaurant=restaurant,
+            user=customer,
+            total_price=sum(unit_price(food) * quantity for food, quantity in lines),
+            status=rng.choice(['delivered', 'delivered', 'preparing', 'pending', 'canceled']),
+        )
+        for customer, restaurant, lines in order_specs
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, food=food, quantity=quantity, unit_price=unit_price(food))
+        for order, (_, _, lines) in zip(orders, order_specs)
+        for food, quantity in lines
+    )
+
+    start = datetime.date(2030, 1, 1)
+    reservation_rows = Reservation.objects.bulk_create(
+        Reservation(
+            date=start + datetime.timedelta(days=rng.randrange(60)),
+            time=datetime.time(rng.randrange(12, 23), rng.choice([0, 15, 30, 45])),
+            guests=rng.randint(1, 8),
+            name=rng.choice(NAMES),
+            phone=f'0912{rng.randrange(10 ** 7):07d}',
+        )
+        for _ in range(reservations)
+    )
+
+    return {
+        'vendors': vendors,
+        'restaurants': restaurant_rows,
+        'foods': foods,
+        'customers': customer_users,
+        'orders': orders,
+        'reservations': reservation_rows,
+    }
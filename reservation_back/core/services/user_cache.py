@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from core.models import Restaurant
+
+# فیلدهایی از کاربر که در کش نگه داشته می‌شوند (رمز عبور هرگز)
+PROFILE_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name',
+    'role', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+profile_cache = LRUCache(getattr(settings, 'AUTH_USER_CACHE_SIZE', 10_000))
+
+# زمان آخرین تغییر هر کاربر در کش مشترک Django. پروفایل کش‌شده یا claimهای توکنی که قبل از این
+# زمان ساخته شده‌اند در هیچ workerی پذیرفته نمی‌شوند؛ پس در production کش باید مشترک باشد
+# (Redis/Memcached) و ساعت سرورها هماهنگ. با LocMemCache این باطل‌سازی فقط در همان پروسه دیده می‌شود.
+CHANGED_KEY = 'auth:user-changed:{}'
+
+
+def _changed_ttl():
+    # بعد از این مدت هر توکنی که پیش از تغییر صادر شده (و access هایی که از آن ساخته می‌شوند) منقضی است
+    lifetime = max(jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME)
+    return int(lifetime.total_seconds()) + 60
+
+
+def invalidate_user(user_id):
+    """بعد از commit تغییر کاربر (یا رستورانش) صدا زده می‌شود."""
+    profile_cache.pop(user_id)
+    cache.set(CHANGED_KEY.format(user_id), time.time(), _changed_ttl())
+
+
+def changed_at(user_id):
+    return cache.get(CHANGED_KEY.format(user_id))
+
+
+async def achanged_at(user_id):
+    return await cache.aget(CHANGED_KEY.format(user_id))
+
+
+def is_fresh(stamp, changed):
+    """داده‌ای که در زمان stamp ساخته شده، بعد از آخرین تغییر کاربر است؟"""
+    return stamp is not None and (changed is None or stamp > changed)
+
+
+def _profile_queryset(user_id):
+    User = get_user_model()
+    return User.objects.filter(id=user_id).values(
+        *PROFILE_FIELDS, restaurant_id=F('restaurant__id'), restaurant_name=F('restaurant__name'),
+    )
+
+
+def load_profile(user_id):
+    """پروفایل کاربر و رستورانش با یک کوئری؛ در کش LRU ذخیره می‌شود."""
+    # زمان پیش از کوئری ثبت می‌شود تا تغییری که هم‌زمان commit شده پروفایل را کهنه حساب کند
+    loaded_at = time.time()
+    profile = _profile_queryset(user_id).first()
+    if profile is not None:
+        profile['loaded_at'] = loaded_at
+        profile_cache.set(user_id, profile)
+    return profile
+
+
+async def aload_profile(user_id):
+    """نسخه async load_profile برای viewهای async."""
+    loaded_at = time.time()
+    profile = await _profile_queryset(user_id).afirst()
+    if profile is not None:
+        profile['loaded_at'] = loaded_at
+        profile_cache.set(user_id, profile)
+    return profile
+
+
+def get_profile(user_id):
+    return profile_cache.get(user_id) or load_profile(user_id)
+
+
+def user_from_profile(profile):
+    """نمونه CustomUser بدون کوئری؛ فیلدهای دیگر (مثل password) به صورت deferred بارگذاری می‌شوند."""
+    User = get_user_model()
+    # from_db مقادیر را به ترتیب فیلدهای مدل می‌خواهد
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in profile]
+    user = User.from_db('default', names, [profile[name] for name in names])
+    user.restaurant_id = profile.get('restaurant_id')
+    if 'restaurant_name' in profile:
+        user.restaurant_name = profile['restaurant_name']
+    return user
+
+
+def restaurant_id_for(user):
+    if user.role != 'vendor':
+        return None
+    return Restaurant.objects.filter(owner_id=user.id).values_list('id', flat=True).first()
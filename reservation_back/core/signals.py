@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CustomUser, Restaurant, Food, Order
+from .services.catalog_service import invalidate_catalog
+from .services.search_service import index_food, index_restaurant_foods
+from .services.user_cache import invalidate_user
+from .services.order_service import publish_order_status
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_saved_reindex(sender, instance, **kwargs):
+    index_restaurant_foods(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Food)
+def food_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+    index_food(instance.id)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # ورود کاربر فقط last_login را ذخیره می‌کند؛ پروفایل و claimهای توکن عوض نمی‌شوند
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.id
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def restaurant_owner_changed(sender, instance, **kwargs):
+    owner_id = instance.owner_id
+    transaction.on_commit(lambda: invalidate_user(owner_id))
+
+
+@receiver(post_save, sender=Order)
+def order_saved_publish(sender, instance, **kwargs):
+    publish_order_status(instance)
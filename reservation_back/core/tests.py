@@ -1,3 +1,604 @@
-from django.test import TestCase
+"""
+تست‌های core و بودجه کوئری endpointهای پرترافیک.
 
-# Create your tests here.
+    python manage.py test core
+
+EndpointBenchmarkTests تعداد کوئری SQL هر endpoint را با core/benchmark_budgets.json مقایسه می‌کند؛
+زمان پاسخ (p50/بیشینه) در تست‌ها بررسی نمی‌شود و با دستور benchmark_endpoints اندازه‌گیری می‌شود.
+"""
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from core import fast_serializers
+from core.models import Order, Restaurant, Food, CartItem
+from core.renderers import ORJSONRenderer
+from core.serializers import RestaurantSerializer
+from core.services import endpoint_benchmark
+from core.services.cart_service import add_to_cart, get_cart
+from core.services.order_service import checkout_cart, create_order, encode_feed_cursor, transition_order
+from core.services import search_service
+from core.services.search_service import FoodSearchIndex, normalize, tokenize
+from core.services.synthetic_data import generate
+from core.services.user_cache import profile_cache, changed_at
+from payments.services import gateway
+from reservation.models import Reservation
+from reservation_back.auth import tokens_for_user
+from reservation_back.instrumentation import SQLInstrumentationMiddleware
+from reservation_back import realtime
+from reservation_back.realtime import RedisBackend, authorize
+
+ITERATIONS = int(os.environ.get('BENCHMARK_ITERATIONS', 10))
+
+
+@override_settings(**endpoint_benchmark.SETTINGS)
+class EndpointBenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = generate(**endpoint_benchmark.DATA_OPTIONS)
+
+    def setUp(self):
+        cache.clear()
+        profile_cache.clear()
+        # کلاینت درگاه با تنظیمات همین تست ساخته شود
+        gateway.reset_client()
+        self.addCleanup(gateway.reset_client)
+        self.benchmark = endpoint_benchmark.EndpointBenchmark(self.data)
+
+    def check(self, name):
+        _, expected_status = endpoint_benchmark.EndpointBenchmark.SCENARIOS[name]
+        responses, queries, _ = self.benchmark.measure(name, ITERATIONS)
+        for response in responses:
+            self.assertEqual(response.status_code, expected_status, response.content[:500])
+
+        budgets = endpoint_benchmark.load_budgets()
+        self.assertIn(name, budgets, f"budget for {name} missing; run benchmark_endpoints --record")
+        self.assertLessEqual(
+            max(queries), budgets[name]['queries'],
+            f"{name}: {max(queries)} queries, budget is {budgets[name]['queries']}",
+        )
+
+    def test_restaurants_public(self):
+        self.check('restaurants-public')
+
+    def test_cart_add(self):
+        self.check('cart-add')
+
+    def test_order_create(self):
+        self.check('orders-create')
+
+    def test_order_checkout(self):
+        self.check('orders-checkout')
+
+    def test_payment_verify(self):
+        self.check('payments-verify')
+
+    def test_reservation_create(self):
+        self.check('reservations-create')
+
+
+class FastSerializerTests(TestCase):
+    """مسیر سریع (values + orjson) باید همان بایت‌های سریالایزر DRF را بدهد؛ زمانش با benchmark_serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        data = generate(seed=77, restaurants=8, foods_per_restaurant=25, customers=1, orders_per_customer=0,
+                        reservations=0, prefix='fast')
+        # قیمت و درصدهایی که اعشار چهار رقمی و گرد کردن را امتحان می‌کنند
+        odd = [(Decimal('12345.67'), 33), (Decimal('0.99'), 7), (Decimal('99999999.99'), 99), (Decimal('10.05'), 100)]
+        for food, (price, percent) in zip(data['foods'][::7], odd * 10):
+            Food.objects.filter(id=food.id).update(price=price, discount_percent=percent)
+        Restaurant.objects.filter(id=data['restaurants'][0].id).update(image='restaurant_images/نمای بیرونی.jpg')
+        Restaurant.objects.filter(id=data['restaurants'][1].id).update(description='خط جدید')
+        cls.admin = get_user_model().objects.create_user('fast-admin', role='admin')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.admin).access_token)
+
+    def drf_catalog(self, request=None):
+        restaurants = Restaurant.objects.order_by('id').prefetch_related(
+            Prefetch('foods', queryset=Food.objects.order_by('id'))
+        )
+        return RestaurantSerializer(restaurants, many=True, context={'request': request}).data
+
+    def fast_catalog(self, request=None):
+        rows = fast_serializers.restaurant_values(Restaurant.objects.order_by('id'))
+        return fast_serializers.restaurants_data(rows, request)
+
+    def test_discounted_price_in_sql_matches_model(self):
+        annotated = dict(Food.objects.values_list('id', fast_serializers.DISCOUNTED_PRICE))
+        for food in Food.objects.all():
+            self.assertEqual(annotated[food.id], food.discounted_price, food.price)
+
+    def test_catalog_parity(self):
+        request = RequestFactory().get('/api/restaurants/')
+        for context_request in (None, request):
+            self.assertEqual(
+                ORJSONRenderer().render(self.fast_catalog(context_request)),
+                JSONRenderer().render(self.drf_catalog(context_request)),
+            )
+
+    def test_list_endpoint_parity(self):
+        paths = [
+            '/api/foods/',
+            '/api/foods/?page_size=100',
+            '/api/foods/?fields=id,price,discounted_price',
+            '/api/foods/?fields=name,restaurant',
+            '/api/restaurants/',
+            '/api/restaurants/?fields=id,foods',
+            '/api/restaurants/?fields=name,image',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                with override_settings(FAST_SERIALIZERS=False):
+                    slow = self.client.get(path)
+                with override_settings(FAST_SERIALIZERS=True):
+                    fast = self.client.get(path)
+                self.assertEqual(slow.status_code, 200, slow.content[:500])
+                self.assertEqual(fast.content, slow.content)
+                # صفحه دوم با cursor همان صفحه مسیر DRF است
+                next_url = json.loads(slow.content)['next']
+                if next_url:
+                    with override_settings(FAST_SERIALIZERS=True):
+                        fast_next = self.client.get(next_url)
+                    self.assertEqual(fast_next.content, self.client.get(next_url).content)
+
+    def test_catalog_snapshot_parity(self):
+        from core.services.catalog_service import rebuild_catalog
+
+        with override_settings(FAST_SERIALIZERS=False):
+            slow = rebuild_catalog()['restaurants']
+        with override_settings(FAST_SERIALIZERS=True):
+            fast = rebuild_catalog()['restaurants']
+        self.assertEqual(ORJSONRenderer().render(fast), JSONRenderer().render(slow))
+
+    def test_renderer_matches_json_renderer(self):
+        payload = {
+            'decimal': Decimal('90000.0000'),
+            'datetime': timezone.now(),
+            'date': datetime.date(2030, 1, 2),
+            'time': datetime.time(19, 30),
+            'uuid': uuid.uuid4(),
+            'lazy': gettext_lazy('رزرو'),
+            'separators': 'a\u2028b\u2029c',
+            'nested': [{'نام': 'کباب', 'n': 1, 'f': 0.1, 'none': None, 'ok': True}],
+            1: 'کلید عددی',
+        }
+        self.assertEqual(ORJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class CartPricingTests(TestCase):
+    """جمع سبد باید دقیقاً همان مبلغی باشد که checkout ثبت می‌کند."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.customer = User.objects.create_user('cart-customer', role='customer')
+        prices = [
+            (Decimal('10.00'), 15, 1),
+            (Decimal('10.05'), 15, 3),
+            (Decimal('12345.67'), 33, 2),
+            (Decimal('99.99'), 0, 1),
+            (Decimal('7.00'), 100, 2),
+            # بالای سقف int4 بعد از ضرب سنت در (100 - درصد)
+            (Decimal('180000.50'), 12, 2),
+            (Decimal('4500000.75'), 7, 1),
+        ]
+        cls.foods = []
+        for index, (price, percent, quantity) in enumerate(prices):
+            owner = User.objects.create_user(f'cart-vendor-{index}', role='vendor')
+            restaurant = Restaurant.objects.create(name=f'رستوران {index}', owner=owner)
+            food = Food.objects.create(restaurant=restaurant, name=f'غذا {index}', price=price, discount_percent=percent)
+            cls.foods.append((food, quantity))
+
+    def setUp(self):
+        for food, quantity in self.foods:
+            add_to_cart(self.customer, food.id, quantity)
+
+    def test_whole_price_discount_keeps_cents(self):
+        line = get_cart(self.customer).items.get(food=self.foods[0][0])
+        self.assertEqual(line.total_price(), Decimal('8.50'))
+
+    def test_prices_above_int4_range(self):
+        lines = {item.food_id: item.total_price() for item in get_cart(self.customer).items.all()}
+        self.assertEqual(lines[self.foods[5][0].id], Decimal('316800.88'))
+        self.assertEqual(lines[self.foods[6][0].id], Decimal('4185000.70'))
+
+    def test_line_totals_match_model(self):
+        for item in get_cart(self.customer).items.all():
+            plain = CartItem.objects.select_related('food').get(id=item.id)
+            self.assertEqual(item.total_price(), plain.total_price(), item.food.price)
+
+    def test_cart_total_equals_checkout_total(self):
+        cart_total = get_cart(self.customer).total_price()
+        _, orders = checkout_cart(self.customer, address='تهران', phone='09120000000')
+        self.assertEqual(cart_total, sum(order.total_price for order in orders))
+        stored = Order.objects.filter(id__in=[order.id for order in orders])
+        self.assertEqual(cart_total, sum(order.total_price for order in stored))
+
+
+class AuthCacheTests(TestCase):
+    """پروفایل کش‌شده و claimهای توکن بعد از تغییر کاربر (حتی با update()) نباید پذیرفته شوند."""
+
+    def setUp(self):
+        cache.clear()
+        profile_cache.clear()
+        User = get_user_model()
+        self.vendor = User.objects.create_user('auth-vendor', role='vendor')
+        Restaurant.objects.create(name='رستوران احراز هویت', owner=self.vendor)
+        self.client = Client()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.vendor).access_token)
+
+    def update_user(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.filter(id=self.vendor.id).update(**fields)
+
+    def test_realtime_access_follows_user_changes(self):
+        channel = f'restaurant-{self.vendor.restaurant.id}'
+        scope = {'headers': [(b'cookie', f"access_token={self.client.cookies['access_token'].value}".encode())]}
+        access = async_to_sync(authorize)(channel, scope)
+        self.assertIsNotNone(access)
+        self.assertIsNone(async_to_sync(authorize)('restaurant-0', scope))
+        self.assertFalse(async_to_sync(access.revoked)())
+
+        self.update_user(role='customer')
+        # اتصال باز در heartbeat بعدی بسته می‌شود و اتصال جدید پذیرفته نمی‌شود
+        self.assertTrue(async_to_sync(access.revoked)())
+        self.assertIsNone(async_to_sync(authorize)(channel, scope))
+        self.assertIsNone(async_to_sync(authorize)('daysheet', scope))
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/orders/').status_code, 200)
+        profile_cache.clear()  # فقط claimهای توکن؛ مثل workerی که این کاربر را ندیده
+        self.update_user(is_active=False)
+        self.assertEqual(self.client.get('/api/me/').status_code, 401)
+        self.assertEqual(self.client.get('/api/orders/').status_code, 401)
+
+    def test_demoted_user_loses_role_on_every_worker(self):
+        self.assertEqual(self.client.get('/api/me/').json()['role'], 'vendor')
+        stale = profile_cache.get(self.vendor.id)
+        self.update_user(role='customer')
+        # worker دیگری که هنوز پروفایل قدیمی را در LRU خودش دارد
+        profile_cache.set(self.vendor.id, stale)
+        self.assertEqual(self.client.get('/api/me/').json()['role'], 'customer')
+        self.assertEqual(self.client.get('/api/restaurants/').status_code, 403)
+
+    def test_login_does_not_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.save(update_fields=['last_login'])
+        self.assertIsNone(changed_at(self.vendor.id))
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user('export-admin', role='admin')
+        Reservation.objects.create(
+            date=datetime.date(2031, 5, 1), time=datetime.time(20, 0), guests=2,
+            name='=HYPERLINK("http://x","y")', phone='+989120000000', message='@SUM(A1)',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.admin).access_token)
+
+    def export(self, fmt):
+        response = self.client.get(f'/api/exports/reservations.{fmt}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_cells_cannot_start_a_formula(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv'))))
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['name'], '\'=HYPERLINK("http://x","y")')
+        self.assertEqual(row['phone'], "'+989120000000")
+        self.assertEqual(row['message'], "'@SUM(A1)")
+        self.assertEqual(row['guests'], '2')
+
+    def test_ndjson_keeps_raw_values(self):
+        row = json.loads(self.export('ndjson'))
+        self.assertEqual(row['name'], '=HYPERLINK("http://x","y")')
+
+
+@override_settings(RATELIMIT_ENABLE=False, OUTBOX_DISPATCH_IN_PROCESS=False)
+class CustomerTestCase(TestCase):
+    """مشتری با کوکی JWT و یک رستوران با دو غذا."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.customer = User.objects.create_user('write-customer', role='customer')
+        owner = User.objects.create_user('write-vendor', role='vendor')
+        cls.restaurant = Restaurant.objects.create(name='رستوران نوشتن', owner=owner)
+        cls.foods = [
+            Food.objects.create(restaurant=cls.restaurant, name=f'غذا {index}', price=Decimal('25000'))
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.customer).access_token)
+
+    def _post(self, path, payload, **headers):
+        return self.client.post(path, json.dumps(payload), content_type='application/json', headers=headers)
+
+
+class CartSyncTests(CustomerTestCase):
+
+    def test_cart_sync_rejects_a_stale_version(self):
+        first = self._post('/api/cart/sync/', {'version': 0, 'items': [{'food_id': self.foods[0].id, 'quantity': 2}]})
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(first.json()['version'], 1)
+
+        # تب دیگری که هنوز نسخه 0 را دارد
+        stale = self._post('/api/cart/sync/', {'version': 0, 'items': [{'food_id': self.foods[1].id, 'quantity': 1}]})
+        self.assertEqual(stale.status_code, 409)
+        cart = stale.json()['cart']
+        self.assertEqual(cart['version'], 1)
+        self.assertEqual([item['quantity'] for item in cart['items']], [2])
+        self.assertEqual(CartItem.objects.filter(cart__user=self.customer).count(), 1)
+
+
+class IdempotencyTests(CustomerTestCase):
+
+    def test_idempotency_key_replays_the_first_response(self):
+        payload = {'restaurant': self.restaurant.id, 'items': [{'food_id': self.foods[0].id, 'quantity': 1}]}
+        first = self._post('/api/orders/', payload, idempotency_key='order-1')
+        again = self._post('/api/orders/', payload, idempotency_key='order-1')
+
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(again.json()['uuid'], first.json()['uuid'])
+        self.assertEqual(Order.objects.filter(user=self.customer).count(), 1)
+
+        other = dict(payload, items=[{'food_id': self.foods[1].id, 'quantity': 1}])
+        self.assertEqual(self._post('/api/orders/', other, idempotency_key='order-1').status_code, 422)
+
+    def reserve(self, day, address='10.0.0.1', client=None):
+        payload = {'date': day, 'time': '19:30', 'guests': 2, 'name': 'مهمان', 'phone': '09120000000'}
+        return (client or Client()).post('/api/reservations/', json.dumps(payload), content_type='application/json',
+                                          headers={'Idempotency-Key': 'same-key'}, REMOTE_ADDR=address)
+
+    def test_anonymous_clients_do_not_share_keys(self):
+        self.assertEqual(self.reserve('2031-05-01').status_code, 200)
+        self.assertEqual(self.reserve('2031-05-01')['Idempotent-Replayed'], 'true')
+
+        other = self.reserve('2031-05-02', address='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+        self.assertFalse(other.has_header('Idempotent-Replayed'))
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_server_errors_are_not_stored(self):
+        client = Client(raise_request_exception=False)
+        with mock.patch('reservation.views._book_reservation', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('django.request', 'ERROR'):
+            self.assertEqual(self.reserve('2031-05-01', client=client).status_code, 500)
+        self.assertEqual(self.reserve('2031-05-01', client=client).status_code, 200)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+class OrdersFeedTests(CustomerTestCase):
+
+    def feed(self, since=None, limit=50):
+        params = {'limit': limit, **({'since': since} if since else {})}
+        response = self.client.get('/api/orders/feed/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_feed_returns_changes_after_the_cursor(self):
+        orders = [create_order(self.customer, self.restaurant, [(self.foods[0].id, 1)]) for _ in range(3)]
+        first = self.feed(limit=2)
+        self.assertEqual([o['id'] for o in first['results']], [orders[0].id, orders[1].id])
+        self.assertTrue(first['has_more'])
+        rest = self.feed(first['cursor'], limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertIn(orders[2].id, [o['id'] for o in rest['results']])
+
+        transition_order(orders[0], 'preparing')
+        changed = self.feed(rest['cursor'])
+        self.assertIn(orders[0].id, [o['id'] for o in changed['results']])
+        self.assertEqual(self.feed(changed['cursor'])['cursor'], changed['cursor'])
+
+    def test_late_commit_behind_the_cursor_is_not_skipped(self):
+        seen = create_order(self.customer, self.restaurant, [(self.foods[0].id, 1)])
+        late = create_order(self.customer, self.restaurant, [(self.foods[1].id, 1)])
+        old = create_order(self.customer, self.restaurant, [(self.foods[1].id, 1)])
+        cursor_at = timezone.now()
+        Order.objects.filter(id=seen.id).update(updated_at=cursor_at)
+        Order.objects.filter(id=late.id).update(updated_at=cursor_at + datetime.timedelta(seconds=1))
+        Order.objects.filter(id=old.id).update(updated_at=cursor_at - datetime.timedelta(minutes=5))
+        cursor = encode_feed_cursor(Order.objects.get(id=seen.id))
+
+        # late تغییری با updated_at پیش از cursor است که بعد از خواندن cursor commit شده
+        Order.objects.filter(id=late.id).update(
+            status='preparing', updated_at=cursor_at - datetime.timedelta(seconds=1),
+        )
+        ids = [o['id'] for o in self.feed(cursor)['results']]
+        self.assertIn(late.id, ids)
+        self.assertNotIn(old.id, ids)
+
+
+class OrderListTests(CustomerTestCase):
+
+    def test_pages_do_not_skip_orders_created_at_the_same_time(self):
+        orders = [create_order(self.customer, self.restaurant, [(self.foods[0].id, 1)]) for _ in range(5)]
+        Order.objects.update(created_at=timezone.now())
+
+        for path in ('/api/orders/', '/api/async/orders/'):
+            ids, url = [], f'{path}?page_size=2'
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, response.content)
+                ids += [o['id'] for o in response.json()['results']]
+                url = response.json()['next']
+            self.assertEqual(ids, [order.id for order in reversed(orders)])
+
+
+class OrderCreateTests(CustomerTestCase):
+
+    def test_order_items_must_exist_and_belong_to_the_restaurant(self):
+        owner = get_user_model().objects.create_user('other-vendor', role='vendor')
+        other = Restaurant.objects.create(name='رستوران دیگر', owner=owner)
+        foreign = Food.objects.create(restaurant=other, name='غذای دیگر', price=Decimal('1000'))
+
+        for food_id in (foreign.id, foreign.id + 1000):
+            payload = {'restaurant': self.restaurant.id, 'items': [
+                {'food_id': self.foods[0].id, 'quantity': 1}, {'food_id': food_id, 'quantity': 1},
+            ]}
+            self.assertEqual(self._post('/api/orders/', payload).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user('search-vendor', role='vendor')
+        restaurant = Restaurant.objects.create(name='رستوران جستجو', owner=owner)
+        cls.joined = Food.objects.create(restaurant=restaurant, name='جوجه‌کباب', price=Decimal('180000.50'))
+        cls.arabic = Food.objects.create(restaurant=restaurant, name='كباب كوبيده', description='با برنج ایرانی',
+                                         price=Decimal('150000'), discount_percent=10)
+
+    def setUp(self):
+        self.index = FoodSearchIndex()
+        self.index.rebuild()
+
+    def ids(self, query):
+        return [result['id'] for result in self.index.search(query)]
+
+    def test_normalize_unifies_arabic_letters_and_digits(self):
+        self.assertEqual(normalize('كيك ۱۲'), normalize('کیک 12'))
+        self.assertEqual(tokenize('کباب‌ها'), tokenize('کبابها'))
+
+    def test_search_matches_across_spellings(self):
+        self.assertCountEqual(self.ids('کباب'), [self.joined.id, self.arabic.id])
+        self.assertEqual(self.ids('كوبيده'), [self.arabic.id])
+        self.assertEqual(self.ids('جوجه'), [self.joined.id])
+        self.assertEqual(self.ids('جوجه‍کباب'), [self.joined.id])
+        self.assertEqual(self.ids('کوب برنج'), [self.arabic.id])
+        self.assertEqual(self.ids('پیتزا'), [])
+
+    def test_documents_keep_decimal_prices(self):
+        result = self.index.search('کوبیده')[0]
+        self.assertEqual(result['price'], Decimal('150000'))
+        self.assertEqual(result['discounted_price'], self.arabic.discounted_price)
+
+    def save_in_one_transaction(self):
+        with mock.patch.object(search_service, 'food_index', self.index), \
+                self.captureOnCommitCallbacks() as callbacks, transaction.atomic():
+            for food in (self.joined, self.arabic):
+                food.name += ' ویژه'
+                food.save()
+            self.joined.restaurant.save()
+            self.arabic.delete()
+        return callbacks
+
+    def test_changes_are_indexed_once_per_transaction(self):
+        callbacks = self.save_in_one_transaction()
+        with mock.patch.object(search_service, 'food_index', self.index), self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.ids('ویژه'), [self.joined.id])
+
+    @override_settings(SEARCH_INDEX_BATCH_LIMIT=2)
+    def test_large_batches_invalidate_the_index(self):
+        version = cache.get(search_service.INDEX_VERSION_KEY)
+        callbacks = self.save_in_one_transaction()
+        with mock.patch.object(search_service, 'food_index', self.index), self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+        self.assertNotEqual(cache.get(search_service.INDEX_VERSION_KEY), version)
+
+
+class InstrumentationTests(TestCase):
+
+    def test_metrics_are_closed_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    async def test_async_requests_are_measured_without_adaptation(self):
+        async def view(request):
+            await Restaurant.objects.acount()
+            return HttpResponse()
+
+        middleware = SQLInstrumentationMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/async/')
+        response = await middleware(request)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+class RedisBackendTests(TestCase):
+
+    async def test_listener_reconnects_after_connection_loss(self):
+        delivered = []
+
+        class PubSub:
+            def __init__(self, attempt):
+                self.attempt = attempt
+
+            async def psubscribe(self, pattern):
+                if self.attempt == 1:
+                    raise ConnectionError('redis is down')
+
+            async def listen(self):
+                if self.attempt == 2:
+                    raise ConnectionError('connection reset')
+                yield {'type': 'pmessage', 'channel': b'realtime:reservations', 'data': b'{"event": "x"}'}
+                await asyncio.Event().wait()
+
+        class Redis:
+            attempts = 0
+
+            @classmethod
+            def from_url(cls, url):
+                cls.attempts += 1
+                return cls()
+
+            def pubsub(self):
+                return PubSub(self.attempts)
+
+            async def aclose(self):
+                pass
+
+        backend = RedisBackend.__new__(RedisBackend)
+        backend.url, backend._async_module, backend._task = 'redis://test', mock.Mock(Redis=Redis), None
+        backend.retry_initial = 0
+        with mock.patch.object(realtime.hub, 'deliver', lambda channel, message: delivered.append(channel)), \
+                self.assertLogs('reservation_back.realtime', 'ERROR') as logs:
+            await backend.start()
+            for _ in range(50):
+                if delivered:
+                    break
+                await asyncio.sleep(0.01)
+            await backend.stop()
+
+        self.assertEqual(delivered, ['reservations'])
+        self.assertEqual(Redis.attempts, 3)
+        self.assertEqual(len(logs.output), 2)
@@ -13,7 +13,14 @@ from .views import (
     AddToCartView,
     RemoveFromCartView,
     DecrementCartItemView,
-    CheckoutView
+    CartSyncView,
+    CartCheckoutView,
+    CheckoutView,
+    FoodSearchView,
+    ExportView,
+    restaurant_list_async,
+    cart_async,
+    order_list_async,
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -23,6 +30,8 @@ router.register(r'foods', FoodViewSet, basename='food')
 router.register(r'orders', OrderViewSet, basename='order')
 
 urlpatterns = [
+    # باید قبل از روتر بیاید تا با foods/<pk>/ تداخل نکند
+    path('foods/search/', FoodSearchView.as_view(), name='food-search'),
     path('', include(router.urls)),
     path('restaurants-public/', RestaurantListWithFoodsView.as_view(), name='restaurant-list-public'),
     path('register/', RegisterView.as_view(), name='user-register'),
@@ -34,6 +43,13 @@ urlpatterns = [
     path('cart/add/', AddToCartView.as_view(), name='add-to-cart'),
     path('cart/decrement/', DecrementCartItemView.as_view(), name='decrement-cart'),
     path('cart/remove/', RemoveFromCartView.as_view(), name='remove-from-cart'),
+    path('cart/sync/', CartSyncView.as_view(), name='cart-sync'),
+    path('cart/checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
     path('orders/<uuid:uuid>/checkout/', CheckoutView.as_view(), name='order_checkout'),
+    path('exports/<slug:dataset>.<slug:fmt>', ExportView.as_view(), name='export'),
+    # نسخه‌های async برای اجرا زیر ASGI (همان خروجی JSON)
+    path('async/restaurants-public/', restaurant_list_async, name='restaurant-list-public-async'),
+    path('async/cart/', cart_async, name='cart-async'),
+    path('async/orders/', order_list_async, name='order-list-async'),
 
 ]
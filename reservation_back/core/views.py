@@ -1,8 +1,11 @@
 from rest_framework import viewsets, permissions, status, generics
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework_simplejwt.tokens import RefreshToken
+from reservation_back.auth import tokens_for_user
 from django.contrib.auth import login, logout, get_user_model
 
 from .serializers import (
@@ -13,12 +16,35 @@ from .serializers import (
     UserLoginSerializer,
     CartItemSerializer,
     CartSerializer,
+    CartSyncSerializer,
     CheckoutSerializer
 )
-from .models import Restaurant, Food, Order,Cart, CartItem
+from .models import Restaurant, Food, Order, OrderItem, Cart, CartItem
+from .pagination import IdCursorPagination
 from rest_framework.permissions import IsAuthenticated
 User = get_user_model()
 from .services.cart_service import *
+from .services.order_service import checkout_cart, orders_feed, visible_orders
+from .services.search_service import search_foods
+from .services.user_cache import get_profile
+from .services.auth_service import UserNotFound
+from .services.catalog_service import (
+    get_catalog_snapshot, aget_catalog_snapshot, catalog_etag, absolutize_catalog,
+)
+from .services.export_service import DATASETS, FORMATS, parse_range, export_queryset, stream_export
+from .services.user_cache import restaurant_id_for
+from .services.idempotency import idempotent
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from .renderers import ORJSONRenderer
+from . import fast_serializers
+from rest_framework.request import Request
+from reservation_back.auth import CustomJWTAuthentication
 
 class IsVendorOrAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -30,7 +56,94 @@ class IsVendorOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.role == 'admin':
             return True
-        return getattr(obj, 'owner', None) == request.user
+        # مقایسه با owner_id تا برای بررسی مالکیت کاربر از دیتابیس خوانده نشود
+        return getattr(obj, 'owner_id', None) == request.user.id
+
+class SparseFieldsetMixin:
+    """
+    ?fields=id,name را هم در سریالایزر و هم در only() کوئری اعمال می‌کند.
+    روابط فقط وقتی select_related/prefetch می‌شوند که فیلد مربوطه خواسته شده باشد.
+    """
+    select_related_fields = ()
+    prefetch_fields = {}
+    sparse_field_sources = {}
+
+    def get_requested_fields(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        raw = self.request.query_params.get('fields')
+        if not raw:
+            return None
+        return [name.strip() for name in raw.split(',') if name.strip()]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
+
+    def optimize_queryset(self, queryset):
+        requested = self.get_requested_fields()
+        wanted = set(requested) if requested else None
+
+        def is_wanted(name):
+            return wanted is None or name in wanted
+
+        select = [name for name in self.select_related_fields if is_wanted(name)]
+        prefetch = {lookup for name, lookup in self.prefetch_fields.items() if is_wanted(name)}
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*sorted(prefetch))
+        if wanted:
+            queryset = queryset.only(*self._only_columns(queryset.model, wanted))
+        return queryset
+
+    def _only_columns(self, model, wanted):
+        columns = {model._meta.pk.name}
+        for name in wanted:
+            for source in self.sparse_field_sources.get(name, (name,)):
+                try:
+                    field = model._meta.get_field(source)
+                except FieldDoesNotExist:
+                    continue
+                if field.concrete:
+                    columns.add(field.name)
+        return sorted(columns)
+
+
+class FastListMixin:
+    """
+    با FAST_SERIALIZERS=True عمل list به‌جای serializer_class از fast_serializers ساخته می‌شود
+    (values() و dict ساده با همان JSON). بقیه عمل‌ها و حالت خاموش همان مسیر DRF است.
+    fast_list = (تابع values، تابع ساخت داده)
+    """
+    fast_list = None
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_list is None or not fast_serializers.enabled():
+            return super().list(request, *args, **kwargs)
+
+        to_values, to_data = self.fast_list
+        fields = self.get_requested_fields()
+        queryset = to_values(self.filter_queryset(self._base_queryset()), fields)
+        page = self.paginate_queryset(queryset)
+        data = to_data(queryset if page is None else page, request, fields)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+
+def etag_matches(request, etag):
+    """If-None-Match با مقایسه ضعیف: لیست ETagهای جداشده با ویرگول یا *، نه جستجوی زیررشته."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    if tags == ['*']:
+        return True
+    return etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}
+
 
 def set_cookie(response, key, value, max_age):
     response.set_cookie(
@@ -49,7 +162,7 @@ class RegisterView(APIView):
         serializer = UserRegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
 
             login(request, user)
             response = Response(
@@ -66,32 +179,34 @@ class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        username = request.data.get("username")
-
-        if not User.objects.filter(username=username).exists():
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
+        try:
+            is_valid = serializer.is_valid()
+        except UserNotFound:
             return Response(
                 {"detail": "کاربری با این نام وجود ندارد، لطفاً ابتدا ثبت‌نام کنید."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = UserLoginSerializer(data=request.data)
-        if serializer.is_valid():
+        if is_valid:
+            # توکن‌ها همان‌هایی هستند که سریالایزر ساخته؛ دوباره ساخته نمی‌شوند
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
+            access = serializer.validated_data['access']
+            refresh = serializer.validated_data['refresh']
 
             login(request, user)
 
             response = Response(
                 {
                     "detail": "ورود موفقیت‌آمیز بود.",
-                    "access": str(refresh.access_token),
-                    "refresh": str(refresh),
+                    "access": access,
+                    "refresh": refresh,
                 },
                 status=status.HTTP_200_OK,
             )
 
-            set_cookie(response, 'access_token', str(refresh.access_token), 3600)
-            set_cookie(response, 'refresh_token', str(refresh), 7 * 24 * 3600)
+            set_cookie(response, 'access_token', access, 3600)
+            set_cookie(response, 'refresh_token', refresh, 7 * 24 * 3600)
 
             return response
 
@@ -121,36 +236,36 @@ class UserMeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user = request.user
+        # پروفایل (همراه رستوران) از کش LRU؛ در صورت نبود با یک کوئری
+        user = get_profile(request.user.id)
         data = {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "role": user.role,
+            "id": user["id"],
+            "username": user["username"],
+            "email": user["email"],
+            "role": user["role"],
         }
 
         warnings = []
 
-        if not user.first_name and not user.username:
+        if not user["first_name"] and not user["username"]:
             warnings.append("نام شما در سیستم ثبت نشده است. لطفاً پروفایل خود را تکمیل کنید.")
 
-        if user.role == "vendor":
-            restaurant = Restaurant.objects.filter(owner=user).first()
-            if not restaurant:
+        if user["role"] == "vendor":
+            if not user["restaurant_id"]:
                 warnings.append("شما هنوز هیچ رستورانی ثبت نکرده‌اید.")
             else:
                 data["restaurant"] = {
-                    "id": restaurant.id,
-                    "name": restaurant.name,
-                    "is_approved": getattr(restaurant, "is_approved", True),
+                    "id": user["restaurant_id"],
+                    "name": user["restaurant_name"],
+                    "is_approved": True,
                 }
 
-        elif user.role == "customer":
-            if not user.first_name and not user.username:
+        elif user["role"] == "customer":
+            if not user["first_name"] and not user["username"]:
                 warnings.append("لطفاً نام خود را وارد کنید تا سفارش‌های شما به درستی ثبت شوند.")
 
-        elif user.role == "admin":
-            if not user.first_name:
+        elif user["role"] == "admin":
+            if not user["first_name"]:
                 warnings.append("نام مدیر در سیستم ثبت نشده است.")
 
         if warnings:
@@ -174,11 +289,17 @@ class RefreshTokenView(APIView):
             return Response({'detail': 'توکن Refresh نامعتبر است.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = RestaurantSerializer
+    fast_list = (fast_serializers.restaurant_values, fast_serializers.restaurants_data)
     permission_classes = [IsVendorOrAdmin]
+    pagination_class = IdCursorPagination
+    prefetch_fields = {'foods': 'foods'}
 
     def get_queryset(self):
+        return self.optimize_queryset(self._base_queryset())
+
+    def _base_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return Restaurant.objects.all()
@@ -193,11 +314,18 @@ class RestaurantViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class FoodViewSet(viewsets.ModelViewSet):
+class FoodViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = FoodSerializer
+    fast_list = (fast_serializers.food_values, fast_serializers.foods_data)
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsVendorOrAdmin]
+    pagination_class = IdCursorPagination
+    select_related_fields = ('restaurant',)
+    sparse_field_sources = {'discounted_price': ('price', 'discount_percent')}
 
     def get_queryset(self):
+        return self.optimize_queryset(self._base_queryset())
+
+    def _base_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             # کاربران مهمان همه غذاها را می‌بینند
@@ -233,9 +361,7 @@ class CartView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        cart, _ = Cart.objects.get_or_create(user=self.request.user)
-
-        return cart
+        return get_cart(self.request.user)
 
 
 
@@ -276,6 +402,49 @@ class DecrementCartItemView(generics.UpdateAPIView):
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class CartSyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            cart = sync_cart(request.user, **serializer.validated_data)
+        except CartVersionConflict as e:
+            return Response(
+                {'error': str(e), 'cart': CartSerializer(get_cart(request.user)).data},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+
+class CartCheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            checkout_group, orders = checkout_cart(request.user, **serializer.validated_data)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = (
+            Order.objects.filter(id__in=[order.id for order in orders])
+            .select_related('user')
+            .prefetch_related('items__food__restaurant')
+            .order_by('id')
+        )
+        return Response({
+            'checkout_group': str(checkout_group),
+            'total_price': sum(order.total_price for order in orders),
+            'orders': OrderSerializer(orders, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -291,42 +460,197 @@ class CheckoutView(APIView):
             return Response({'detail': 'اطلاعات سفارش ثبت شد.', 'order_uuid': str(order.uuid)})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IdCursorPagination
+    select_related_fields = ('user',)
+    prefetch_fields = {'items': 'items__food__restaurant'}
 
     def get_queryset(self):
+        queryset = self._base_queryset()
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            queryset = queryset.filter(status=order_status)
+        return self.optimize_queryset(queryset)
+
+    def _base_queryset(self):
         user = self.request.user
-        if user.role == 'customer':
-            return Order.objects.filter(user=user)
-        elif user.role == 'vendor':
-            return Order.objects.filter(restaurant__owner=user)
-        elif user.role == 'admin':
-            return Order.objects.all()
-        else:
-            return Order.objects.none()
+        restaurant_id = getattr(user, 'restaurant_id', None)
+        if user.role == 'vendor' and restaurant_id is None:
+            restaurant_id = Restaurant.objects.filter(owner=user).values_list('id', flat=True).first()
+        return visible_orders(user, restaurant_id)
+
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 200)
+            orders, cursor, has_more = orders_feed(
+                self.get_queryset(), request.query_params.get('since'), limit
+            )
+        except ValueError:
+            return Response({'error': 'limit نامعتبر است.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': self.get_serializer(orders, many=True).data,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
+
+    @idempotent('orders.create')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        order = serializer.save(user=self.request.user)
+        # پاسخ با یک کوئری آیتم‌ها را همراه غذا و رستوران می‌خواند، نه یکی‌یکی
+        prefetch_related_objects(
+            [order], Prefetch('items', queryset=OrderItem.objects.select_related('food__restaurant').order_by('id'))
+        )
 
 class RestaurantListWithFoodsView(APIView):
     permission_classes = [permissions.AllowAny]
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def get(self, request):
-        queryset = Restaurant.objects.all()
-        serializer = RestaurantSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+        snapshot = get_catalog_snapshot()
+        etag = catalog_etag(snapshot)
+
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(absolutize_catalog(snapshot['restaurants'], request))
+
+        response['ETag'] = etag
+        response['X-Catalog-Version'] = str(snapshot['version'])
+        return response
+
+class FoodSearchView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            return Response({'error': 'limit نامعتبر است.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not query:
+            return Response({'query': query, 'results': []})
+        return Response({'query': query, 'results': search_foods(query, limit)})
+
+class ExportView(APIView):
+    """
+    خروجی استریم CSV/NDJSON: /exports/<dataset>.<format>?from=YYYY-MM-DD&to=YYYY-MM-DD
+    ادمین همه داده‌ها را می‌گیرد؛ فروشنده فقط سفارش‌های رستوران خودش را.
+    """
+    permission_classes = [IsVendorOrAdmin]
+
+    def get(self, request, dataset, fmt):
+        if dataset not in DATASETS or fmt not in FORMATS:
+            return Response({'error': 'خروجی نامعتبر است.'}, status=status.HTTP_404_NOT_FOUND)
+
+        restaurant_id = None
+        if request.user.role == 'vendor':
+            if dataset == 'reservations':
+                raise PermissionDenied('فقط ادمین به رزروها دسترسی دارد.')
+            restaurant_id = getattr(request.user, 'restaurant_id', None) or restaurant_id_for(request.user)
+            if restaurant_id is None:
+                raise PermissionDenied('رستورانی برای این کاربر ثبت نشده است.')
+
+        try:
+            start, end = parse_range(request.query_params.get('from'), request.query_params.get('to'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        columns, queryset = export_queryset(dataset, start, end, restaurant_id)
+        response = StreamingHttpResponse(stream_export(columns, queryset, fmt), content_type=FORMATS[fmt])
+        filename = '-'.join([dataset] + [str(d) for d in (start, end) if d])
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+        return response
 
 class MeView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        print('User:', user)
-        print('Is Authenticated:', user.is_authenticated)
         return Response({
             'id': user.id,
             'username': user.username,
             'email': user.email,
             'role': user.role,
         })
+
+
+# ---- نسخه‌های async (زیر /api/async/) ----
+# زیر ASGI درخواست فقط هنگام کار واقعی با دیتابیس نخ می‌گیرد و در انتظار کش/شبکه نخی اشغال نمی‌کند.
+# خروجی JSON همان خروجی viewهای DRF متناظر است.
+
+def render_json(data, status=200, renderer_class=JSONRenderer):
+    """همان بایت‌های رندرر DRF تا پاسخ نسخه async با نسخه همگام یکی باشد."""
+    return HttpResponse(renderer_class().render(data), status=status, content_type='application/json')
+
+
+async def authenticate_async(request):
+    """کاربر توکن کوکی یا None؛ مثل CustomJWTAuthentication ولی بدون کوئری همگام."""
+    try:
+        result = await CustomJWTAuthentication().aauthenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def not_authenticated():
+    return render_json({'detail': str(NotAuthenticated.default_detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+@require_GET
+async def restaurant_list_async(request):
+    snapshot = await aget_catalog_snapshot()
+    etag = catalog_etag(snapshot)
+
+    if etag_matches(request, etag):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = render_json(absolutize_catalog(snapshot['restaurants'], request), renderer_class=ORJSONRenderer)
+
+    response['ETag'] = etag
+    response['X-Catalog-Version'] = str(snapshot['version'])
+    return response
+
+
+@require_GET
+async def cart_async(request):
+    user = await authenticate_async(request)
+    if user is None:
+        return not_authenticated()
+    cart = await aget_cart(user)
+    return render_json(CartSerializer(cart, context={'request': request}).data)
+
+
+@require_GET
+async def order_list_async(request):
+    user = await authenticate_async(request)
+    if user is None:
+        return not_authenticated()
+
+    restaurant_id = getattr(user, 'restaurant_id', None)
+    if user.role == 'vendor' and restaurant_id is None:
+        restaurant_id = await Restaurant.objects.filter(owner=user).values_list('id', flat=True).afirst()
+    queryset = (
+        visible_orders(user, restaurant_id)
+        .select_related('user')
+        .prefetch_related('items__food__restaurant')
+    )
+    order_status = request.GET.get('status')
+    if order_status:
+        queryset = queryset.filter(status=order_status)
+
+    drf_request = Request(request)
+    paginator = IdCursorPagination()
+    # صفحه‌بندی cursor مال DRF است و کوئری را خودش اجرا می‌کند؛ مثل متدهای async خود ORM در نخ جدا
+    page = await sync_to_async(paginator.paginate_queryset)(queryset, drf_request)
+    data = OrderSerializer(page, many=True, context={'request': drf_request}).data
+    return render_json(paginator.get_paginated_response(data).data)
@@ -0,0 +1,91 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from payments.services.gateway import (
+    GatewayClient, SimulatedGateway, GatewayBusy, GatewayTimeout, GatewayError,
+)
+
+CARD_NUMBER = '6037990000001234'
+
+
+class Command(BaseCommand):
+    help = (
+        'توان عملیاتی تأیید پرداخت را بدون دیتابیس و درگاه واقعی با درگاه شبیه‌سازی‌شده '
+        'و GatewayClient اندازه می‌گیرد.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--callers', type=int, default=64, help='تعداد نخ‌های فراخواننده (مثل workerهای وب)')
+        parser.add_argument('--max-concurrency', type=int, default=32, help='سقف درخواست همزمان به درگاه')
+        parser.add_argument('--timeout', type=float, default=2.0)
+        parser.add_argument('--queue-timeout', type=float, default=1.0)
+        parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'], default='lognormal')
+        parser.add_argument('--latency-ms', type=float, default=200)
+        parser.add_argument('--jitter', type=float, default=0.5)
+        parser.add_argument('--approve-rate', type=float, default=0.9)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--hang-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        gateway = SimulatedGateway(
+            approve_rate=options['approve_rate'],
+            error_rate=options['error_rate'],
+            latency=options['latency'],
+            latency_ms=options['latency_ms'],
+            latency_jitter=options['jitter'],
+            hang_rate=options['hang_rate'],
+            # درخواست معلق کمی بیشتر از مهلت کلاینت طول می‌کشد تا دستور سریع تمام شود
+            hang_seconds=options['timeout'] + 0.5,
+            seed=options['seed'],
+        )
+        client = GatewayClient(
+            gateway,
+            max_concurrency=options['max_concurrency'],
+            timeout=options['timeout'],
+            queue_timeout=options['queue_timeout'],
+        )
+        # با seed، ref_codeها هم ثابت‌اند تا کل اجرا قابل تکرار باشد
+        if options['seed'] is not None:
+            ref_codes = [f"bench-{options['seed']}-{i}" for i in range(options['requests'])]
+        else:
+            ref_codes = [uuid.uuid4().hex[:20] for _ in range(options['requests'])]
+
+        def call(ref_code):
+            started = time.perf_counter()
+            try:
+                outcome = 'approved' if client.verify(ref_code, Decimal('100'), CARD_NUMBER).approved else 'declined'
+            except GatewayBusy:
+                outcome = 'busy'
+            except GatewayTimeout:
+                outcome = 'timeout'
+            except GatewayError:
+                outcome = 'error'
+            return outcome, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['callers']) as pool:
+            results = list(pool.map(call, ref_codes))
+        wall = time.perf_counter() - started
+        client.shutdown()
+
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        latencies = sorted(elapsed for _, elapsed in results)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(f"نتایج: {dict(sorted(outcomes.items()))}")
+        self.stdout.write(
+            f"{len(results) / wall:.1f} درخواست/ثانیه در {wall:.2f} ثانیه؛ "
+            f"p50 {statistics.median(latencies) * 1000:.1f}ms، "
+            f"p95 {percentile(0.95):.1f}ms، p99 {percentile(0.99):.1f}ms"
+        )
@@ -0,0 +1,132 @@
+import json
+import logging
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from core.models import Restaurant, Order
+from payments.models import Payment, PaymentLog
+
+VERIFY_URL = '/api/payments/verify-fake/'
+CARD = {'card_number': '6037990000001234', 'cvv2': '123', 'otp': '123456'}
+
+
+def _verify(ref_code, barrier):
+    client = Client()
+    try:
+        # همه نخ‌ها با هم شروع می‌کنند تا واقعاً روی یک پرداخت مسابقه دهند
+        barrier.wait()
+        started = time.perf_counter()
+        response = client.post(VERIFY_URL, json.dumps(dict(CARD, ref_code=ref_code)), content_type='application/json')
+        elapsed = time.perf_counter() - started
+        status = response.json().get('status') if response.status_code == 200 else None
+        return response.status_code, status, elapsed
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'درخواست‌های همزمان verify-fake روی هر پرداخت می‌فرستد و بررسی می‌کند '
+        'هر پرداخت دقیقاً یک بار تسویه شده باشد.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=20, help='تعداد پرداخت‌های آزمایشی')
+        parser.add_argument('--threads', type=int, default=16, help='درخواست همزمان برای هر پرداخت')
+        parser.add_argument('--keep', action='store_true', help='داده‌های آزمایشی پاک نشوند')
+
+    def handle(self, *args, **options):
+        threads = max(2, options['threads'])
+        vendor, customer, payments = self._fixtures(options['payments'])
+        try:
+            # کلاینت تست با host «testserver» درخواست می‌فرستد
+            with override_settings(RATELIMIT_ENABLE=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results, wall = self._hammer(payments, threads)
+            self._report(results, wall, threads)
+            self._check(payments, results)
+        finally:
+            if not options['keep']:
+                # پاک کردن کاربرها رستوران، سفارش‌ها و پرداخت‌ها را هم حذف می‌کند
+                customer.delete()
+                vendor.delete()
+
+    def _fixtures(self, count):
+        User = get_user_model()
+        suffix = uuid.uuid4().hex[:8]
+        vendor = User.objects.create_user(f'bench-vendor-{suffix}', role='vendor')
+        customer = User.objects.create_user(f'bench-customer-{suffix}', role='customer')
+        restaurant = Restaurant.objects.create(name=f'bench-{suffix}', owner=vendor)
+        orders = Order.objects.bulk_create(
+            Order(restaurant=restaurant, user=customer, total_price=100) for _ in range(count)
+        )
+        payments = Payment.objects.bulk_create(
+            Payment(order=order, amount=order.total_price, ref_code=uuid.uuid4().hex[:20]) for order in orders
+        )
+        return vendor, customer, payments
+
+    def _hammer(self, payments, threads):
+        # پاسخ 400 بازنده‌ها مورد انتظار است؛ لاگ هشدار هر کدام خروجی را شلوغ می‌کند
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        results = {}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for payment in payments:
+                barrier = threading.Barrier(threads)
+                futures = [pool.submit(_verify, payment.ref_code, barrier) for _ in range(threads)]
+                results[payment.id] = [future.result() for future in futures]
+        return results, time.perf_counter() - started
+
+    def _report(self, results, wall, threads):
+        responses = [result for attempts in results.values() for result in attempts]
+        latencies = sorted(elapsed for _, _, elapsed in responses)
+        codes = {}
+        for code, _, _ in responses:
+            codes[code] = codes.get(code, 0) + 1
+
+        self.stdout.write(f"{len(results)} پرداخت × {threads} درخواست همزمان = {len(responses)} درخواست")
+        self.stdout.write(f"کدهای پاسخ: {dict(sorted(codes.items()))}")
+        self.stdout.write(
+            f"{len(responses) / wall:.1f} درخواست/ثانیه، "
+            f"p50 {statistics.median(latencies) * 1000:.1f}ms، "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+        )
+
+    def _check(self, payments, results):
+        problems = []
+        settled = Payment.objects.filter(id__in=results).in_bulk()
+        order_status = dict(
+            Order.objects.filter(id__in=[p.order_id for p in payments]).values_list('id', 'status')
+        )
+        log_counts = {}
+        for payment_id in PaymentLog.objects.filter(
+            payment_id__in=results, event__in=('verify_success', 'verify_failed')
+        ).values_list('payment_id', flat=True):
+            log_counts[payment_id] = log_counts.get(payment_id, 0) + 1
+
+        for payment_id, attempts in results.items():
+            winners = [status for code, status, _ in attempts if code == 200]
+            payment = settled[payment_id]
+            if len(winners) != 1:
+                problems.append(f"پرداخت {payment_id}: {len(winners)} درخواست برنده")
+                continue
+            if payment.status != winners[0]:
+                problems.append(f"پرداخت {payment_id}: وضعیت {payment.status} به جای {winners[0]}")
+            expected_order = 'preparing' if winners[0] == Payment.STATUS_SUCCESS else 'pending'
+            if order_status[payment.order_id] != expected_order:
+                problems.append(f"سفارش {payment.order_id}: وضعیت {order_status[payment.order_id]}")
+            if log_counts.get(payment_id, 0) != 1:
+                problems.append(f"پرداخت {payment_id}: {log_counts.get(payment_id, 0)} لاگ نتیجه")
+
+        if problems:
+            raise CommandError('تسویه دقیقاً-یک‌بار نقض شد:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('هر پرداخت دقیقاً یک بار تسویه شد.'))
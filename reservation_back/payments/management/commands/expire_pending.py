@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from payments.services.reconciliation_service import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'پرداخت‌های pending قدیمی را منقضی و سفارش‌های pending قدیمی را لغو می‌کند '
+        '(PAYMENT_PENDING_TTL_MINUTES و ORDER_PENDING_TTL_MINUTES).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='فقط شمارش، بدون تغییر')
+        parser.add_argument('--loop', action='store_true', help='به صورت زمان‌بند دائمی اجرا شود')
+        parser.add_argument('--interval', type=float, default=300, help='فاصله اجراها در حالت --loop (ثانیه)')
+
+    def handle(self, *args, **options):
+        while True:
+            self._report(reconcile(options['chunk_size'], options['dry_run']), options['dry_run'])
+            if not options['loop']:
+                return
+            connection.close_if_unusable_or_obsolete()
+            time.sleep(options['interval'])
+
+    def _report(self, stats, dry_run):
+        changed = stats['payments_expired'] + stats['orders_canceled']
+        scanned = stats['payments_scanned'] + stats['orders_scanned']
+        rate = scanned / stats['seconds'] if stats['seconds'] else 0
+        prefix = '(dry-run) ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}پرداخت: {stats['payments_expired']}/{stats['payments_scanned']} منقضی، "
+            f"سفارش: {stats['orders_canceled']}/{stats['orders_scanned']} لغو؛ "
+            f"{changed} تغییر در {stats['seconds']:.2f} ثانیه ({rate:.0f} رکورد/ثانیه)"
+        ))
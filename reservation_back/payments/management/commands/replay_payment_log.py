@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from payments.services.audit_log import sealed_segments, replay_segment
+
+
+class Command(BaseCommand):
+    help = 'فایل‌های segment لاگ پرداخت (PAYMENT_LOG_BACKEND = segment) را در دیتابیس بارگذاری و حذف می‌کند.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', dest='directory', help='پوشه segmentها؛ پیش‌فرض PAYMENT_LOG_SEGMENT_DIR')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--include-open', action='store_true',
+            help='segmentهای باز را هم بارگذاری کن (فقط وقتی هیچ پروسه‌ای در حال نوشتن نیست)',
+        )
+
+    def handle(self, *args, **options):
+        segments = sealed_segments(options['directory'], options['include_open'])
+        total = 0
+        for path in segments:
+            count = replay_segment(path, options['batch_size'])
+            total += count
+            self.stdout.write(f"{path.name}: {count} رویداد")
+        self.stdout.write(self.style.SUCCESS(f"{len(segments)} segment و {total} رویداد بارگذاری شد."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_order_pending_idx'),
+        ('payments', '0003_paymentlog_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('payment', 'پرداخت منقضی'), ('order', 'سفارش لغوشده')], max_length=20)),
+                ('ids', models.JSONField(default=list)),
+                ('count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'در انتظار پرداخت'), ('success', 'موفق'), ('failed', 'ناموفق'), ('expired', 'منقضی')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='payment_pending_idx'),
+        ),
+    ]
@@ -8,6 +8,7 @@ class Payment(models.Model):
     STATUS_PENDING = 'pending'
     STATUS_SUCCESS = 'success'
     STATUS_FAILED = 'failed'
+    STATUS_EXPIRED = 'expired'
 
     METHOD_MANUAL = 'manual'
     METHOD_FAKE = 'fake'
@@ -16,6 +17,7 @@ class Payment(models.Model):
         (STATUS_PENDING, 'در انتظار پرداخت'),
         (STATUS_SUCCESS, 'موفق'),
         (STATUS_FAILED, 'ناموفق'),
+        (STATUS_EXPIRED, 'منقضی'),
     ]
     METHOD_CHOICES = [
         (METHOD_MANUAL, 'Manual'),
@@ -36,6 +38,11 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=['ref_code']),
             models.Index(fields=['status']),
+            # فقط پرداخت‌های باز؛ با منقضی شدن قدیمی‌ها کوچک می‌ماند
+            models.Index(
+                fields=['created_at', 'id'], name='payment_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
         ]
 
     def save(self, *args, **kwargs):
@@ -43,16 +50,56 @@ class Payment(models.Model):
             self.ref_code = uuid.uuid4().hex[:20]
         super().save(*args, **kwargs)
 
-    def mark_success(self, card_last4: str):
-        self.status = self.STATUS_SUCCESS
-        self.paid_at = timezone.now()
-        self.meta.update({'card_last4': card_last4})
-        self.save(update_fields=['status', 'paid_at', 'meta'])
+    def _settle(self, status, **fields):
+        # compare-and-set: فقط پرداختی که هنوز pending است تغییر می‌کند؛ تعداد سطرها برنده را مشخص می‌کند
+        updated = Payment.objects.filter(pk=self.pk, status=self.STATUS_PENDING).update(status=status, **fields)
+        if updated:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(updated)
 
-    def mark_failed(self):
-        self.status = self.STATUS_FAILED
-        self.save(update_fields=['status'])
+    def mark_success(self, card_last4: str) -> bool:
+        return self._settle(
+            self.STATUS_SUCCESS,
+            paid_at=timezone.now(),
+            meta={**self.meta, 'card_last4': card_last4},
+        )
+
+    def mark_failed(self) -> bool:
+        return self._settle(self.STATUS_FAILED)
 
     def __str__(self):
         return f"Payment {self.ref_code} - {self.status}"
 
+
+class PaymentLog(models.Model):
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='logs')
+    event = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    # زمان رخداد؛ auto_now_add نیست تا bulk_create و replay فایل‌های segment زمان اصلی را نگه دارند
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.payment_id}:{self.event}"
+
+
+class ReconciliationLog(models.Model):
+    """
+    لاگ فشرده دستور expire_pending: یک سطر برای هر دسته، نه برای هر سفارش یا پرداخت.
+    """
+    KIND_CHOICES = [
+        ('payment', 'پرداخت منقضی'),
+        ('order', 'سفارش لغوشده'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    ids = models.JSONField(default=list)
+    count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.kind}: {self.count} ({self.created_at:%Y-%m-%d %H:%M})"
@@ -11,6 +11,16 @@ class CreatePaymentSerializer(serializers.Serializer):
     order_id = serializers.IntegerField()
     method = serializers.ChoiceField(choices=[('fake','FakeGateway'), ('manual','Manual')], default='fake')
 
+class CreateGroupPaymentSerializer(serializers.Serializer):
+    checkout_group = serializers.UUIDField()
+    method = serializers.ChoiceField(choices=[('fake','FakeGateway'), ('manual','Manual')], default='fake')
+
+class VerifyGroupPaymentSerializer(serializers.Serializer):
+    checkout_group = serializers.UUIDField()
+    card_number = serializers.CharField(allow_blank=False)
+    cvv2 = serializers.CharField(allow_blank=False)
+    otp = serializers.CharField(allow_blank=False)
+
 class VerifyPaymentSerializer(serializers.Serializer):
     ref_code = serializers.CharField()
     card_number = serializers.CharField(allow_blank=False)
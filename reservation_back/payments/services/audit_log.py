@@ -0,0 +1,224 @@
+"""
+نوشتن لاگ‌های PaymentLog به صورت دسته‌ای.
+
+داخل `with collect():` رویدادها جمع و در پایان بلوک با یک bulk_create نوشته می‌شوند.
+با PAYMENT_LOG_BACKEND = 'segment' به جای دیتابیس، بعد از commit در فایل‌های
+append-only (یک JSON در هر خط) نوشته می‌شوند و دستور replay_payment_log آن‌ها را به دیتابیس می‌برد.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from payments.models import PaymentLog
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.log'
+
+_buffer = contextvars.ContextVar('payment_log_buffer', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _segment_mode():
+    return _setting('PAYMENT_LOG_BACKEND', 'db') == 'segment'
+
+
+def segment_dir():
+    return Path(_setting('PAYMENT_LOG_SEGMENT_DIR', Path(settings.BASE_DIR) / 'payment_log_segments'))
+
+
+@contextmanager
+def collect():
+    """رویدادهای داخل بلوک با یک نوشتن ثبت می‌شوند؛ اگر بلوک با خطا تمام شود دور ریخته می‌شوند."""
+    if _buffer.get() is not None:
+        # بلوک تو در تو: رویدادها به بافر بیرونی اضافه می‌شوند
+        yield
+        return
+
+    events = []
+    token = _buffer.set(events)
+    try:
+        yield
+    finally:
+        _buffer.reset(token)
+    flush(events)
+
+
+def log(payment, event, payload=None):
+    entry = PaymentLog(
+        payment_id=payment.pk, event=event, payload=payload or {}, created_at=timezone.now()
+    )
+    events = _buffer.get()
+    if events is not None:
+        events.append(entry)
+    else:
+        flush([entry])
+
+
+def flush(events):
+    if not events:
+        return
+    if _segment_mode():
+        records = [_to_record(entry) for entry in events]
+        # فقط رویدادهای تراکنش‌های commit‌شده به فایل می‌روند
+        transaction.on_commit(lambda: segment_writer().append(records))
+    else:
+        PaymentLog.objects.bulk_create(events)
+
+
+def _to_record(entry):
+    return {
+        'payment_id': entry.payment_id,
+        'event': entry.event,
+        'payload': entry.payload,
+        'created_at': entry.created_at.isoformat(),
+    }
+
+
+def from_record(record):
+    return PaymentLog(
+        payment_id=record['payment_id'],
+        event=record['event'],
+        payload=record['payload'],
+        created_at=parse_datetime(record['created_at']),
+    )
+
+
+class SegmentWriter:
+    """
+    نخ پس‌زمینه که رکوردها را به انتهای فایل segment جاری اضافه می‌کند.
+    segment بعد از رسیدن به حجم یا سن مشخص بسته (sealed) و فایل تازه‌ای باز می‌شود.
+    """
+
+    def __init__(self, directory, max_bytes=None, max_age=None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes or _setting('PAYMENT_LOG_SEGMENT_BYTES', 16 * 1024 * 1024)
+        self.max_age = max_age or _setting('PAYMENT_LOG_SEGMENT_SECONDS', 60)
+        self._queue = queue.Queue()
+        self._file = None
+        self._path = None
+        self._opened_at = 0
+        self._thread = None
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='payment-log-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def append(self, records):
+        self._queue.put(records)
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                records = self._queue.get(timeout=self.max_age)
+            except queue.Empty:
+                self._seal()
+                continue
+            if records is None:
+                self._seal()
+                return
+            try:
+                self._write(records)
+            except OSError:
+                logger.exception("writing payment log segment failed; %d events lost", len(records))
+
+    def _write(self, records):
+        # هر چیزی که تا این لحظه در صف است با یک write نوشته می‌شود
+        batches = [records]
+        while True:
+            try:
+                more = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if more is None:
+                self._queue.put(None)
+                break
+            batches.append(more)
+
+        if self._file is None:
+            self._open()
+        data = ''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for batch in batches for record in batch
+        ).encode()
+        self._file.write(data)
+        self._file.flush()
+
+        if self._file.tell() >= self.max_bytes or time.monotonic() - self._opened_at >= self.max_age:
+            self._seal()
+
+    def _open(self):
+        name = f"{time.time_ns()}-{os.getpid()}"
+        self._path = self.directory / (name + OPEN_SUFFIX)
+        self._file = open(self._path, 'ab')
+        self._opened_at = time.monotonic()
+
+    def _seal(self):
+        if self._file is None:
+            return
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._path.rename(self._path.with_suffix(SEALED_SUFFIX))
+        self._file = None
+        self._path = None
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def segment_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SegmentWriter(segment_dir()).start()
+            atexit.register(_writer.stop)
+    return _writer
+
+
+def sealed_segments(directory=None, include_open=False):
+    directory = Path(directory or segment_dir())
+    if not directory.exists():
+        return []
+    suffixes = {SEALED_SUFFIX, OPEN_SUFFIX} if include_open else {SEALED_SUFFIX}
+    return sorted(path for path in directory.iterdir() if path.suffix in suffixes)
+
+
+def replay_segment(path, batch_size=1000):
+    """یک segment را در یک تراکنش به دیتابیس می‌برد و بعد از commit حذفش می‌کند."""
+    entries = []
+    with open(path, 'rb') as segment:
+        for line in segment:
+            try:
+                entries.append(from_record(json.loads(line)))
+            except ValueError:
+                # خط ناقص آخر فایل وقتی پروسه وسط نوشتن از کار افتاده
+                logger.warning("skipping corrupt line in %s", path)
+
+    with transaction.atomic():
+        PaymentLog.objects.bulk_create(entries, batch_size=batch_size)
+    os.remove(path)
+    return len(entries)
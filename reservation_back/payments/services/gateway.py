@@ -0,0 +1,215 @@
+"""
+درگاه پرداخت قابل تعویض.
+
+PAYMENT_GATEWAY = {
+    'BACKEND': 'payments.services.gateway.SimulatedGateway',
+    'OPTIONS': {'approve_rate': 0.9, 'latency': 'lognormal', 'latency_ms': 300, 'seed': 42},
+}
+
+همه فراخوانی‌ها از GatewayClient می‌گذرند که تعداد درخواست‌های همزمان به درگاه را محدود
+می‌کند و برای هر درخواست مهلت (timeout) دارد؛ درگاه کند فقط همان درخواست را معطل می‌کند
+و وقتی ظرفیت پر است درخواست‌های جدید سریع رد می‌شوند.
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class GatewayError(Exception):
+    """درگاه پاسخ قطعی نداد؛ پرداخت pending می‌ماند و می‌توان دوباره تلاش کرد."""
+
+
+class GatewayTimeout(GatewayError):
+    pass
+
+
+class GatewayBusy(GatewayError):
+    pass
+
+
+class GatewayResult:
+    def __init__(self, approved, reason=''):
+        self.approved = approved
+        self.reason = reason
+
+    def __repr__(self):
+        return f"GatewayResult(approved={self.approved}, reason={self.reason!r})"
+
+
+class BaseGateway:
+    def verify(self, ref_code, amount, card_number):
+        """تراکنش را تأیید یا رد می‌کند؛ در خطای ارتباطی GatewayError می‌دهد."""
+        raise NotImplementedError
+
+
+class SimulatedGateway(BaseGateway):
+    """
+    درگاه محلی برای توسعه و تست بار.
+
+    - approve_rate: احتمال تأیید
+    - error_rate: احتمال خطای ارتباطی (GatewayError)
+    - latency: 'fixed'، 'uniform'، 'exponential' یا 'lognormal' حول latency_ms
+      (latency_jitter برای uniform دامنه نسبی و برای lognormal انحراف معیار لگاریتمی است)
+    - hang_rate: احتمال اینکه درگاه hang_seconds ثانیه جواب ندهد (تا مهلت کلاینت تمام شود)
+    - seed: با seed، نتیجه هر ref_code قطعی و مستقل از ترتیب اجرای نخ‌هاست
+    """
+
+    def __init__(self, approve_rate=0.9, error_rate=0.0, latency='fixed', latency_ms=0,
+                 latency_jitter=0.5, hang_rate=0.0, hang_seconds=30, seed=None):
+        self.approve_rate = approve_rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_jitter = latency_jitter
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.seed = seed
+
+    def _rng(self, ref_code):
+        if self.seed is None:
+            return random.Random()
+        return random.Random(f"{self.seed}:{ref_code}")
+
+    def sample_latency(self, rng):
+        base = self.latency_ms / 1000
+        if base <= 0:
+            return 0.0
+        if self.latency == 'uniform':
+            return rng.uniform(base * (1 - self.latency_jitter), base * (1 + self.latency_jitter))
+        if self.latency == 'exponential':
+            return rng.expovariate(1 / base)
+        if self.latency == 'lognormal':
+            # latency_ms میانه توزیع است
+            return rng.lognormvariate(math.log(base), self.latency_jitter)
+        return base
+
+    def verify(self, ref_code, amount, card_number):
+        rng = self._rng(ref_code)
+        delay = self.sample_latency(rng)
+        roll = rng.random()
+
+        if roll < self.hang_rate:
+            delay = max(delay, self.hang_seconds)
+        time.sleep(delay)
+        if roll < self.hang_rate + self.error_rate:
+            raise GatewayError("simulated gateway error")
+        if rng.random() < self.approve_rate:
+            return GatewayResult(True)
+        return GatewayResult(False, 'declined')
+
+
+class _Slot:
+    """یک جا از سقف همزمانی؛ آزاد کردن دوباره (پایان کار بعد از timeout) بی‌اثر است."""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self, *args):
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+        self._semaphore.release()
+
+
+class GatewayClient:
+    """
+    اجرای درخواست‌ها در thread pool با سقف همزمانی max_concurrency.
+    اگر تا queue_timeout جای خالی پیدا نشود GatewayBusy و اگر درگاه تا timeout
+    جواب ندهد GatewayTimeout داده می‌شود. درخواستی که timeout خورده همان لحظه جایش را پس می‌دهد
+    و اگر هنوز شروع نشده باشد لغو می‌شود؛ درگاه معطل فقط نخ‌های اضافه pool را نگه می‌دارد.
+    """
+
+    def __init__(self, gateway, max_concurrency=32, timeout=10.0, queue_timeout=1.0):
+        self.gateway = gateway
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # نخ‌های اضافه برای درخواست‌هایی که timeout خورده‌اند ولی هنوز در درگاه معطل‌اند
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix='gateway')
+
+    def submit(self, ref_code, amount, card_number):
+        """خروجی: (future، slot)؛ slot با پایان future یا با abandon آزاد می‌شود."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise GatewayBusy("gateway concurrency limit reached")
+        slot = _Slot(self._slots)
+        try:
+            future = self._pool.submit(self.gateway.verify, ref_code, amount, card_number)
+        except BaseException:
+            slot.release()
+            raise
+        future.add_done_callback(slot.release)
+        return future, slot
+
+    @staticmethod
+    def abandon(future, slot):
+        # نخی که درگاه را صدا زده قابل قطع نیست؛ ولی سقف همزمانی منتظر آن نمی‌ماند
+        future.cancel()
+        slot.release()
+
+    def verify(self, ref_code, amount, card_number):
+        future, slot = self.submit(ref_code, amount, card_number)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.abandon(future, slot)
+            raise GatewayTimeout(f"gateway did not answer within {self.timeout}s")
+
+    async def averify(self, ref_code, amount, card_number):
+        # سقف همزمانی با acquire مسدودکننده گرفته می‌شود؛ در حلقه رویداد از نخ جدا صدا زده می‌شود
+        future, slot = await asyncio.to_thread(self.submit, ref_code, amount, card_number)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.abandon(future, slot)
+            raise GatewayTimeout(f"gateway did not answer within {self.timeout}s")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def build_gateway(config=None):
+    config = config or getattr(settings, 'PAYMENT_GATEWAY', {})
+    backend = import_string(config.get('BACKEND', 'payments.services.gateway.SimulatedGateway'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+def build_client(gateway=None):
+    return GatewayClient(
+        gateway or build_gateway(),
+        max_concurrency=getattr(settings, 'PAYMENT_GATEWAY_MAX_CONCURRENCY', 32),
+        timeout=getattr(settings, 'PAYMENT_GATEWAY_TIMEOUT', 10.0),
+        queue_timeout=getattr(settings, 'PAYMENT_GATEWAY_QUEUE_TIMEOUT', 1.0),
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def gateway_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_client()
+    return _client
+
+
+def reset_client(client=None):
+    """
+    کلاینت فعلی را می‌بندد و client (یا None تا فراخوانی بعدی با تنظیمات فعلی ساخته شود) را جایگزین می‌کند.
+    برای تست‌ها و دستورهای بنچمارک.
+    """
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None and previous is not client:
+        previous.shutdown()
@@ -1,9 +1,18 @@
-import random
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from django.utils import timezone
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from core.models import Order
-from payments.models import Payment, PaymentLog
+from core.services.order_service import transition_order, group_orders
+from payments.models import Payment
+from payments.services import audit_log
+from payments.services.gateway import gateway_client, GatewayError
+
+ALREADY_SETTLED = "تراکنش قابل پردازش نیست (قبلاً بررسی شده)."
+
 
 def create_fake_payment(user, order_id, method):
     order = get_object_or_404(Order, id=order_id, user=user)
@@ -16,16 +25,35 @@ def create_fake_payment(user, order_id, method):
         defaults={'amount': order.total_price, 'method': method}
     )
 
-    PaymentLog.objects.create(
-        payment=payment,
-        event='payment_created',
-        payload={'user_id': user.id, 'method': method}
-    )
+    audit_log.log(payment, 'payment_created', {'user_id': user.id, 'method': method})
 
     return payment
 
 
-def verify_fake_payment(ref_code, card_number, cvv2, otp):
+def create_group_payment(user, checkout_group, method):
+    """
+    برای هر سفارش pending یک checkout گروهی یک پرداخت می‌سازد (یا پرداخت موجود را برمی‌گرداند)؛
+    verify_group_payment همه را با یک تراکنش درگاه تسویه می‌کند.
+    """
+    orders = list(group_orders(user, checkout_group).filter(status='pending').order_by('id'))
+    if not orders:
+        raise ValueError("سفارش قابل پرداختی در این گروه نیست.")
+
+    payments = []
+    with transaction.atomic(), audit_log.collect():
+        for order in orders:
+            payment, _ = Payment.objects.get_or_create(
+                order=order,
+                defaults={'amount': order.total_price, 'method': method}
+            )
+            audit_log.log(payment, 'payment_created', {
+                'user_id': user.id, 'method': method, 'checkout_group': str(checkout_group),
+            })
+            payments.append(payment)
+    return payments
+
+
+def _check_card(card_number, cvv2, otp):
     if not (card_number.isdigit() and 12 <= len(card_number) <= 19):
         raise ValueError("شماره کارت نامعتبر است.")
     if not (cvv2.isdigit() and 3 <= len(cvv2) <= 4):
@@ -33,29 +61,113 @@ def verify_fake_payment(ref_code, card_number, cvv2, otp):
     if not (otp.isdigit() and len(otp) == 6):
         raise ValueError("رمز پویا باید ۶ رقم باشد.")
 
-    payment = get_object_or_404(Payment.objects.select_related('order'), ref_code=ref_code)
 
+def _pending_payment(ref_code):
+    payment = get_object_or_404(
+        Payment.objects.select_related('order').only(
+            'id', 'status', 'meta', 'amount', 'ref_code', 'order__id', 'order__uuid', 'order__status',
+            'order__restaurant_id', 'order__updated_at',
+        ),
+        ref_code=ref_code,
+    )
+
+    # بررسی سریع؛ تصمیم نهایی با UPDATE شرطی داخل تراکنش گرفته می‌شود
     if payment.status != Payment.STATUS_PENDING:
-        raise ValueError("تراکنش قابل پردازش نیست (قبلاً بررسی شده).")
-
-    success = random.choices([True, False], weights=[90, 10], k=1)[0]
-
-    with transaction.atomic():
-        PaymentLog.objects.create(
-            payment=payment,
-            event='verify_attempt',
-            payload={'card_last4': card_number[-4:]}
-        )
-
-        if success:
-            payment.mark_success(card_number[-4:])
-            order = payment.order
-            order.status = 'preparing'
-            order.save(update_fields=['status'])
-
-            PaymentLog.objects.create(payment=payment, event='verify_success', payload={'order_id': order.id})
-            return {'status': 'success', 'order_uuid': str(order.uuid)}
-        else:
-            payment.mark_failed()
-            PaymentLog.objects.create(payment=payment, event='verify_failed', payload={})
-            return {'status': 'failed'}
+        raise ValueError(ALREADY_SETTLED)
+    return payment
+
+
+def _pending_group(checkout_group):
+    payments = list(
+        Payment.objects.select_related('order').only(
+            'id', 'status', 'meta', 'amount', 'ref_code', 'order__id', 'order__uuid', 'order__status',
+            'order__restaurant_id', 'order__updated_at',
+        ).filter(order__checkout_group=checkout_group).order_by('id')
+    )
+    if not payments:
+        raise Http404("پرداختی برای این گروه ساخته نشده است.")
+    if any(payment.status != Payment.STATUS_PENDING for payment in payments):
+        raise ValueError(ALREADY_SETTLED)
+    return payments
+
+
+def verify_fake_payment(ref_code, card_number, cvv2, otp):
+    _check_card(card_number, cvv2, otp)
+    payment = _pending_payment(ref_code)
+
+    # فراخوانی درگاه بیرون از تراکنش؛ درگاه کند قفل یا اتصال دیتابیس را نگه نمی‌دارد
+    try:
+        result = gateway_client().verify(payment.ref_code, payment.amount, card_number)
+    except GatewayError as e:
+        audit_log.log(payment, 'gateway_error', {'error': type(e).__name__})
+        raise
+    return _settle(payment, result, card_number)
+
+
+def verify_group_payment(checkout_group, card_number, cvv2, otp):
+    """
+    همه پرداخت‌های یک checkout گروهی با یک فراخوانی درگاه (جمع مبالغ) تأیید می‌شوند و در یک تراکنش
+    تسویه می‌شوند؛ اگر یکی از سفارش‌ها قابل پرداخت نباشد هیچ‌کدام تغییر نمی‌کند.
+    """
+    _check_card(card_number, cvv2, otp)
+    payments = _pending_group(checkout_group)
+    amount = sum((payment.amount for payment in payments), Decimal('0'))
+
+    try:
+        result = gateway_client().verify(checkout_group.hex, amount, card_number)
+    except GatewayError as e:
+        with audit_log.collect():
+            for payment in payments:
+                audit_log.log(payment, 'gateway_error', {'error': type(e).__name__})
+        raise
+    return _settle_all(payments, result, card_number)
+
+
+async def averify_fake_payment(ref_code, card_number, cvv2, otp):
+    """
+    نسخه async: در انتظار درگاه هیچ نخی از سرور وب اشغال نمی‌شود؛
+    فقط خواندن پرداخت و تراکنش تسویه در نخ جدا اجرا می‌شوند.
+    """
+    _check_card(card_number, cvv2, otp)
+    payment = await sync_to_async(_pending_payment)(ref_code)
+
+    try:
+        result = await gateway_client().averify(payment.ref_code, payment.amount, card_number)
+    except GatewayError as e:
+        await sync_to_async(audit_log.log)(payment, 'gateway_error', {'error': type(e).__name__})
+        raise
+    return await sync_to_async(_settle)(payment, result, card_number)
+
+
+def _settle(payment, result, card_number):
+    outcome = _settle_all([payment], result, card_number)
+    if outcome['status'] == 'success':
+        return {'status': 'success', 'order_uuid': outcome['order_uuids'][0]}
+    return outcome
+
+
+def _settle_all(payments, result, card_number):
+    success = result.approved
+    card_last4 = card_number[-4:]
+
+    # لاگ‌های این تراکنش با یک bulk_create و فقط در صورت موفقیت آن نوشته می‌شوند
+    with transaction.atomic(), audit_log.collect():
+        for payment in payments:
+            if success:
+                if not payment.mark_success(card_last4):
+                    raise ValueError(ALREADY_SETTLED)
+                if not transition_order(payment.order, 'preparing'):
+                    # سفارش در این فاصله لغو شده؛ تغییر وضعیت پرداخت‌ها هم برگردانده می‌شود
+                    raise ValueError("این سفارش قابل پرداخت نیست.")
+            elif not payment.mark_failed():
+                raise ValueError(ALREADY_SETTLED)
+
+            audit_log.log(payment, 'verify_attempt', {'card_last4': card_last4})
+            if success:
+                audit_log.log(payment, 'verify_success', {'order_id': payment.order.id})
+            else:
+                audit_log.log(payment, 'verify_failed', {'reason': result.reason})
+
+    if success:
+        return {'status': 'success', 'order_uuids': [str(payment.order.uuid) for payment in payments]}
+    return {'status': 'failed'}
@@ -0,0 +1,108 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Order
+from core.services.order_service import publish_order_status
+from payments.models import Payment, ReconciliationLog
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def payment_cutoff(now=None):
+    minutes = _setting('PAYMENT_PENDING_TTL_MINUTES', 30)
+    return (now or timezone.now()) - timedelta(minutes=minutes)
+
+
+def order_cutoff(now=None):
+    minutes = _setting('ORDER_PENDING_TTL_MINUTES', 60)
+    return (now or timezone.now()) - timedelta(minutes=minutes)
+
+
+def _stale_chunks(queryset, cutoff, chunk_size):
+    """
+    شناسه‌های رکوردهای pending قدیمی‌تر از cutoff را دسته‌دسته و با cursor (created_at, id) می‌دهد.
+    هر دسته یک کوئری کوتاه روی ایندکس جزئی pending است و چیزی در حافظه جمع نمی‌شود.
+    """
+    queryset = queryset.filter(status='pending', created_at__lt=cutoff).order_by('created_at', 'id')
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(Q(created_at__gt=last[0]) | Q(created_at=last[0], id__gt=last[1]))
+        rows = list(chunk.values_list('created_at', 'id')[:chunk_size])
+        if not rows:
+            return
+        last = rows[-1]
+        yield [row_id for _, row_id in rows]
+
+
+def _apply(queryset, kind, ids, changes):
+    """
+    UPDATE شرطی روی یک دسته؛ رکوردهایی که در این فاصله تغییر کرده‌اند یا دیگر شرایط queryset را ندارند
+    دست نمی‌خورند. خروجی: شناسه‌هایی که واقعاً تغییر کردند.
+    """
+    with transaction.atomic():
+        updated = queryset.filter(id__in=ids, status='pending').update(**changes)
+        if not updated:
+            return []
+        if updated < len(ids):
+            # بعضی‌ها همزمان تسویه شده‌اند؛ فقط شناسه‌هایی که واقعاً تغییر کردند ثبت می‌شوند
+            ids = list(queryset.model.objects.filter(id__in=ids, **changes).values_list('id', flat=True))
+        ReconciliationLog.objects.create(kind=kind, ids=ids, count=updated)
+    return ids
+
+
+def expire_payments(cutoff=None, chunk_size=None, dry_run=False):
+    chunk_size = chunk_size or _setting('RECONCILE_CHUNK_SIZE', 1000)
+    cutoff = cutoff or payment_cutoff()
+    scanned = expired = 0
+    for ids in _stale_chunks(Payment.objects.all(), cutoff, chunk_size):
+        scanned += len(ids)
+        if not dry_run:
+            expired += len(_apply(Payment.objects.all(), 'payment', ids, {'status': Payment.STATUS_EXPIRED}))
+    return scanned, expired
+
+
+def cancel_orders(cutoff=None, chunk_size=None, dry_run=False, now=None):
+    chunk_size = chunk_size or _setting('RECONCILE_CHUNK_SIZE', 1000)
+    now = now or timezone.now()
+    cutoff = cutoff or order_cutoff(now)
+    # سفارشی که پرداخت موفق دارد هرگز لغو نمی‌شود؛ سفارشی هم که پرداختش هنوز در مهلت است
+    # (کاربر شاید همین حالا در درگاه باشد) تا منقضی شدن آن پرداخت صبر می‌کند.
+    # همین شرط‌ها در UPDATE هم دوباره بررسی می‌شوند.
+    queryset = Order.objects.exclude(payment__status=Payment.STATUS_SUCCESS).exclude(
+        payment__status=Payment.STATUS_PENDING, payment__created_at__gte=payment_cutoff(now),
+    )
+    scanned = canceled = 0
+    for ids in _stale_chunks(queryset, cutoff, chunk_size):
+        scanned += len(ids)
+        if dry_run:
+            continue
+        # updated_at عوض می‌شود تا فید سفارش‌ها (orders/feed/) لغو را به داشبورد برساند
+        changed = _apply(queryset, 'order', ids, {'status': 'canceled', 'updated_at': timezone.now()})
+        canceled += len(changed)
+        # UPDATE گروهی سیگنالی نمی‌فرستد؛ لغو مثل بقیه تغییر وضعیت‌ها روی کانال‌ها push می‌شود
+        for order in Order.objects.filter(id__in=changed).only('id', 'uuid', 'status', 'restaurant_id', 'updated_at'):
+            publish_order_status(order)
+    return scanned, canceled
+
+
+def reconcile(chunk_size=None, dry_run=False):
+    """اول پرداخت‌ها منقضی و بعد سفارش‌ها لغو می‌شوند؛ خروجی برای گزارش throughput."""
+    started = time.perf_counter()
+    payments_scanned, payments_expired = expire_payments(chunk_size=chunk_size, dry_run=dry_run)
+    orders_scanned, orders_canceled = cancel_orders(chunk_size=chunk_size, dry_run=dry_run)
+    return {
+        'payments_scanned': payments_scanned,
+        'payments_expired': payments_expired,
+        'orders_scanned': orders_scanned,
+        'orders_canceled': orders_canceled,
+        'seconds': time.perf_counter() - started,
+    }
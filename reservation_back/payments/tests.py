@@ -1,3 +1,169 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+
+from core.models import Restaurant, Food, Order
+from core.services.cart_service import add_to_cart
+from core.services.order_service import checkout_cart
+from payments.models import Payment, PaymentLog
+from payments.services import gateway
+from payments.services.payment_service import ALREADY_SETTLED, _pending_payment, _settle
+from payments.services.reconciliation_service import reconcile
+from reservation_back.auth import tokens_for_user
+
+CARD = {'card_number': '6037990000001234', 'cvv2': '123', 'otp': '123456'}
+
+
+def _use_gateway(**options):
+    """کلاینت درگاه با تنظیمات تست؛ کلاینت قبلی بسته و بعد از تست دوباره ساخته می‌شود."""
+    override = override_settings(PAYMENT_GATEWAY={'OPTIONS': dict({'latency': 'fixed', 'latency_ms': 0}, **options)})
+    override.enable()
+    gateway.reset_client()
+    return override
+
+
+@override_settings(RATELIMIT_ENABLE=False, OUTBOX_DISPATCH_IN_PROCESS=False)
+class PaymentTestCase(TestCase):
+    gateway_options = {'approve_rate': 1.0}
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.customer = User.objects.create_user('payer', role='customer')
+        cls.foods = []
+        for index, price in enumerate([Decimal('120000'), Decimal('45000.50')]):
+            owner = User.objects.create_user(f'payee-{index}', role='vendor')
+            restaurant = Restaurant.objects.create(name=f'رستوران {index}', owner=owner)
+            cls.foods.append(Food.objects.create(restaurant=restaurant, name=f'غذا {index}', price=price))
+
+    def setUp(self):
+        override = _use_gateway(**self.gateway_options)
+        self.addCleanup(gateway.reset_client)
+        self.addCleanup(override.disable)
+        self.client = Client()
+        self.client.cookies['access_token'] = str(tokens_for_user(self.customer).access_token)
+
+    def _post(self, path, payload):
+        return self.client.post(path, json.dumps(payload), content_type='application/json')
+
+    def _checkout(self):
+        for food in self.foods:
+            add_to_cart(self.customer, food.id, 2)
+        return checkout_cart(self.customer, address='تهران', phone='09120000000')
+
+
+class GroupPaymentTests(PaymentTestCase):
+
+    def test_group_is_settled_in_one_go(self):
+        checkout_group, orders = self._checkout()
+        created = self._post('/api/payments/create-fake-group/', {'checkout_group': str(checkout_group)})
+        self.assertEqual(created.status_code, 201, created.content)
+        self.assertEqual(len(created.json()['ref_codes']), 2)
+        self.assertEqual(Decimal(str(created.json()['amount'])), sum(order.total_price for order in orders))
+
+        verified = self._post('/api/payments/verify-fake-group/', dict(CARD, checkout_group=str(checkout_group)))
+        self.assertEqual(verified.status_code, 200, verified.content)
+        self.assertEqual(verified.json()['status'], 'success')
+        self.assertCountEqual(verified.json()['order_uuids'], [str(order.uuid) for order in orders])
+        self.assertEqual(set(Order.objects.filter(checkout_group=checkout_group).values_list('status', flat=True)),
+                         {'preparing'})
+        self.assertEqual(set(Payment.objects.filter(order__checkout_group=checkout_group)
+                             .values_list('status', flat=True)), {'success'})
+
+        again = self._post('/api/payments/verify-fake-group/', dict(CARD, checkout_group=str(checkout_group)))
+        self.assertEqual(again.status_code, 400)
+
+    def test_canceled_order_rolls_back_the_whole_group(self):
+        checkout_group, orders = self._checkout()
+        self._post('/api/payments/create-fake-group/', {'checkout_group': str(checkout_group)})
+        Order.objects.filter(id=orders[1].id).update(status='canceled')
+
+        verified = self._post('/api/payments/verify-fake-group/', dict(CARD, checkout_group=str(checkout_group)))
+        self.assertEqual(verified.status_code, 400)
+        self.assertEqual(Order.objects.get(id=orders[0].id).status, 'pending')
+        self.assertFalse(Payment.objects.exclude(status='pending').exists())
+        self.assertFalse(PaymentLog.objects.filter(event='verify_success').exists())
+
+
+class SettlementTests(PaymentTestCase):
+    """دو درخواست تأیید هم‌زمان که هر دو پرداخت را pending دیده‌اند؛ فقط یکی تسویه می‌کند."""
+
+    def test_payment_is_settled_exactly_once(self):
+        _, orders = self._checkout()
+        payment = Payment.objects.create(order=orders[0], amount=orders[0].total_price)
+        first, second = _pending_payment(payment.ref_code), _pending_payment(payment.ref_code)
+
+        approved = gateway.GatewayResult(True)
+        self.assertEqual(_settle(first, approved, CARD['card_number'])['status'], 'success')
+        with self.assertRaisesMessage(ValueError, ALREADY_SETTLED):
+            _settle(second, approved, CARD['card_number'])
+        with self.assertRaisesMessage(ValueError, ALREADY_SETTLED):
+            _settle(second, gateway.GatewayResult(False, 'declined'), CARD['card_number'])
+
+        self.assertEqual(Payment.objects.get(id=payment.id).status, Payment.STATUS_SUCCESS)
+        self.assertEqual(Order.objects.get(id=orders[0].id).status, 'preparing')
+        self.assertEqual(PaymentLog.objects.filter(payment=payment, event='verify_success').count(), 1)
+        self.assertFalse(PaymentLog.objects.filter(payment=payment, event='verify_failed').exists())
+
+    def test_second_verify_request_is_rejected(self):
+        _, orders = self._checkout()
+        payment = Payment.objects.create(order=orders[0], amount=orders[0].total_price)
+
+        verified = self._post('/api/payments/verify-fake/', dict(CARD, ref_code=payment.ref_code))
+        self.assertEqual(verified.status_code, 200, verified.content)
+        again = self._post('/api/payments/verify-fake/', dict(CARD, ref_code=payment.ref_code))
+        self.assertEqual(again.status_code, 400)
+        self.assertEqual(PaymentLog.objects.filter(payment=payment, event='verify_success').count(), 1)
+
+
+class ReconciliationTests(PaymentTestCase):
+
+    def _stale_orders(self):
+        _, orders = self._checkout()
+        Order.objects.filter(id__in=[order.id for order in orders]).update(
+            created_at=timezone.now() - timedelta(hours=3)
+        )
+        return orders
+
+    def test_order_with_payment_in_progress_is_kept(self):
+        in_progress, unpaid = self._stale_orders()
+        Payment.objects.create(order=in_progress, amount=in_progress.total_price)
+
+        with mock.patch('core.services.order_service.publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            reconcile()
+
+        self.assertEqual(Order.objects.get(id=in_progress.id).status, 'pending')
+        self.assertEqual(Order.objects.get(id=unpaid.id).status, 'canceled')
+        published = {call.args[0]: call.args[2]['status'] for call in publish.call_args_list}
+        self.assertEqual(published, {f'order-{unpaid.uuid}': 'canceled', f'restaurant-{unpaid.restaurant_id}': 'canceled'})
+
+    def test_order_is_canceled_once_its_payment_expired(self):
+        order, _ = self._stale_orders()
+        payment = Payment.objects.create(order=order, amount=order.total_price)
+        Payment.objects.filter(id=payment.id).update(created_at=timezone.now() - timedelta(hours=2))
+
+        stats = reconcile()
+
+        self.assertEqual(stats['payments_expired'], 1)
+        self.assertEqual(Payment.objects.get(id=payment.id).status, Payment.STATUS_EXPIRED)
+        self.assertEqual(Order.objects.get(id=order.id).status, 'canceled')
+
+
+class GatewayClientTests(TestCase):
+
+    def test_timed_out_call_frees_its_slot(self):
+        hanging = gateway.SimulatedGateway(hang_rate=1.0, hang_seconds=0.5)
+        client = gateway.GatewayClient(hanging, max_concurrency=1, timeout=0.05, queue_timeout=0.05)
+        self.addCleanup(client.shutdown)
+
+        with self.assertRaises(gateway.GatewayTimeout):
+            client.verify('ref-1', Decimal('1000'), CARD['card_number'])
+        # درخواست معطل هنوز در درگاه است، ولی سقف همزمانی را اشغال نمی‌کند
+        with self.assertRaises(gateway.GatewayTimeout):
+            client.verify('ref-2', Decimal('1000'), CARD['card_number'])
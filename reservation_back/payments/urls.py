@@ -1,7 +1,13 @@
 from django.urls import path
-from .views import CreateFakePaymentView, VerifyFakePaymentView
+from .views import (
+    CreateFakePaymentView, VerifyFakePaymentView, CreateGroupPaymentView, VerifyGroupPaymentView,
+    verify_fake_payment_async,
+)
 
 urlpatterns = [
     path('payments/create-fake/', CreateFakePaymentView.as_view(), name='create_fake_payment'),
     path('payments/verify-fake/', VerifyFakePaymentView.as_view(), name='verify_fake_payment'),
+    path('payments/create-fake-group/', CreateGroupPaymentView.as_view(), name='create_group_payment'),
+    path('payments/verify-fake-group/', VerifyGroupPaymentView.as_view(), name='verify_group_payment'),
+    path('async/payments/verify-fake/', verify_fake_payment_async, name='verify_fake_payment_async'),
 ]
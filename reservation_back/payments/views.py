@@ -2,14 +2,31 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from django.utils.decorators import method_decorator
 from ratelimit.decorators import ratelimit
-from .serializers import CreatePaymentSerializer, VerifyPaymentSerializer
-from .services.payment_service import create_fake_payment, verify_fake_payment
+from ratelimit.core import is_ratelimited
+import json
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import NotFound, ParseError, PermissionDenied
+from core.views import render_json
+from .serializers import (
+    CreatePaymentSerializer, VerifyPaymentSerializer, CreateGroupPaymentSerializer, VerifyGroupPaymentSerializer,
+)
+from .services.payment_service import (
+    create_fake_payment, verify_fake_payment, averify_fake_payment, create_group_payment, verify_group_payment,
+)
+from .services.gateway import GatewayError, GatewayBusy
+from core.services.idempotency import idempotent
 
 class CreateFakePaymentView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @ratelimit(key='user_or_ip', rate='5/m', block=True)
+    # تکرار با همان Idempotency-Key پاسخ قبلی را برمی‌گرداند و از محدودیت نرخ هم کم نمی‌کند
+    @idempotent('payments.create')
+    @method_decorator(ratelimit(key='user_or_ip', rate='5/m', block=True))
     def post(self, request):
         serializer = CreatePaymentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -29,20 +46,108 @@ class CreateFakePaymentView(APIView):
         }, status=status.HTTP_201_CREATED)
 
 
+class CreateGroupPaymentView(APIView):
+    """یک پرداخت برای همه سفارش‌های pending یک checkout چندرستورانی."""
+    permission_classes = [IsAuthenticated]
+
+    @idempotent('payments.create_group')
+    @method_decorator(ratelimit(key='user_or_ip', rate='5/m', block=True))
+    def post(self, request):
+        serializer = CreateGroupPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            payments = create_group_payment(user=request.user, **serializer.validated_data)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        checkout_group = serializer.validated_data['checkout_group']
+        return Response({
+            'checkout_group': str(checkout_group),
+            'amount': sum(payment.amount for payment in payments),
+            'ref_codes': [payment.ref_code for payment in payments],
+        }, status=status.HTTP_201_CREATED)
+
+
+VERIFY_RATE = dict(group='payments.verify', key='ip', rate='10/m')
+GATEWAY_BUSY = 'درگاه پرداخت مشغول است؛ کمی بعد دوباره تلاش کنید.'
+GATEWAY_DOWN = 'درگاه پرداخت پاسخ نداد؛ دوباره تلاش کنید.'
+
+
+def _verify_body(result):
+    return {
+        'status': result['status'],
+        'message': 'پرداخت موفق بود.' if result['status'] == 'success' else 'پرداخت ناموفق بود.',
+        'order_uuid': result.get('order_uuid')
+    }
+
+
 class VerifyFakePaymentView(APIView):
     permission_classes = [AllowAny]
 
-    @ratelimit(key='ip', rate='10/m', block=True)
+    @method_decorator(ratelimit(block=True, **VERIFY_RATE))
     def post(self, request):
         serializer = VerifyPaymentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         try:
             result = verify_fake_payment(**serializer.validated_data)
-            return Response({
-                'status': result['status'],
-                'message': 'پرداخت موفق بود.' if result['status'] == 'success' else 'پرداخت ناموفق بود.',
-                'order_uuid': result.get('order_uuid')
-            })
+            return Response(_verify_body(result))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except GatewayBusy:
+            return Response({'detail': GATEWAY_BUSY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except GatewayError:
+            return Response({'detail': GATEWAY_DOWN}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+
+
+class VerifyGroupPaymentView(APIView):
+    permission_classes = [AllowAny]
+
+    @method_decorator(ratelimit(block=True, **VERIFY_RATE))
+    def post(self, request):
+        serializer = VerifyGroupPaymentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            result = verify_group_payment(**serializer.validated_data)
         except ValueError as e:
             return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except GatewayBusy:
+            return Response({'detail': GATEWAY_BUSY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except GatewayError:
+            return Response({'detail': GATEWAY_DOWN}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+
+        body = _verify_body(result)
+        body.pop('order_uuid')
+        body['order_uuids'] = result.get('order_uuids', [])
+        return Response(body)
+
+
+@csrf_exempt
+@require_POST
+async def verify_fake_payment_async(request):
+    """همان VerifyFakePaymentView با انتظار async برای درگاه؛ سهمیه نرخ با نسخه همگام مشترک است."""
+    if await sync_to_async(is_ratelimited)(request, increment=True, **VERIFY_RATE):
+        return render_json({'detail': str(PermissionDenied.default_detail)}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return render_json({'detail': str(ParseError.default_detail)}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = VerifyPaymentSerializer(data=data)
+    if not serializer.is_valid():
+        return render_json(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = await averify_fake_payment(**serializer.validated_data)
+        return render_json(_verify_body(result))
+    except Http404 as e:
+        # مثل exception handler خود DRF پیام Http404 حفظ می‌شود
+        return render_json({'detail': str(NotFound(*e.args).detail)}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as e:
+        return render_json({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except GatewayBusy:
+        return render_json({'detail': GATEWAY_BUSY}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except GatewayError:
+        return render_json({'detail': GATEWAY_DOWN}, status=status.HTTP_504_GATEWAY_TIMEOUT)
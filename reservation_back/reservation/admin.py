@@ -1,9 +1,64 @@
+import copy
+
+from django import forms
 from django.contrib import admin
-from .models import Reservation
+from django.db import transaction
+
+from .models import Reservation, CapacityRule, SlotOccupancy, OutboxEvent
+from .services.availability_service import hold, SlotUnavailable
+from .services.outbox_service import requeue_dead
+
+
+class ReservationAdminForm(forms.ModelForm):
+    class Meta:
+        model = Reservation
+        fields = '__all__'
+
+    def clean(self):
+        cleaned = super().clean()
+        if any(cleaned.get(name) is None for name in ('date', 'time', 'guests')):
+            return cleaned
+        candidate = copy.copy(self.instance)
+        candidate.date, candidate.time, candidate.guests = cleaned['date'], cleaned['time'], cleaned['guests']
+        if candidate.needs_hold():
+            # همان hold ذخیره نهایی؛ اینجا فقط برای نمایش خطای ظرفیت در فرم و در پایان برگردانده می‌شود
+            try:
+                with transaction.atomic():
+                    hold(candidate)
+                    transaction.set_rollback(True)
+            except SlotUnavailable as e:
+                raise forms.ValidationError(str(e))
+        return cleaned
+
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
+    form = ReservationAdminForm
     list_display = ('name', 'phone', 'date', 'time', 'guests', 'created_at')
     list_filter = ('date', 'created_at')
     search_fields = ('name', 'phone')
     ordering = ('-created_at',)
+
+
+@admin.register(CapacityRule)
+class CapacityRuleAdmin(admin.ModelAdmin):
+    list_display = ('weekday', 'opens_at', 'closes_at', 'slot_minutes', 'turn_minutes', 'seats')
+
+
+@admin.register(SlotOccupancy)
+class SlotOccupancyAdmin(admin.ModelAdmin):
+    list_display = ('date', 'time', 'seats_taken')
+    list_filter = ('date',)
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'event', 'attempts', 'available_at', 'sent_at', 'dead_at')
+    list_filter = ('channel', 'event', ('dead_at', admin.EmptyFieldListFilter))
+    readonly_fields = ('created_at',)
+    actions = ['requeue']
+
+    @admin.action(description='ارسال دوباره رویدادهای dead-letter')
+    def requeue(self, request, queryset):
+        count = requeue_dead(queryset)
+        self.message_user(request, f"{count} رویداد دوباره در صف قرار گرفت.")
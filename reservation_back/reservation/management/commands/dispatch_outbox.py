@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from reservation.services.outbox_service import OutboxDispatcher
+from utils.pusher_client import get_pusher_client
+
+
+class Command(BaseCommand):
+    help = 'رویدادهای outbox را به صورت دسته‌ای به Pusher می‌فرستد (با تلاش مجدد و backoff).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='فقط یک دور ارسال و خروج')
+        parser.add_argument('--interval', type=float, default=None, help='فاصله بررسی رویدادهای جدید (ثانیه)')
+        parser.add_argument('--limit', type=int, default=100, help='حداکثر رویداد در هر دور')
+
+    def handle(self, *args, **options):
+        # تنظیمات ناقص Pusher همین‌جا خطا می‌دهد، نه در هر دور حلقه
+        dispatcher = OutboxDispatcher(get_pusher_client(), interval=options['interval'], limit=options['limit'])
+        if options['once']:
+            sent = dispatcher.run_once()
+            self.stdout.write(self.style.SUCCESS(f"{sent} رویداد ارسال شد."))
+            return
+
+        self.stdout.write("dispatcher در حال اجراست (Ctrl+C برای توقف)...")
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            dispatcher.stop()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from reservation.services.availability_service import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = 'جدول اشغال اسلات‌ها را از روی رزروهای موجود دوباره می‌سازد.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='از این تاریخ (YYYY-MM-DD)؛ پیش‌فرض امروز')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        slots = rebuild_occupancy(start)
+        self.stdout.write(self.style.SUCCESS(f"{slots} اسلات بازسازی شد."))
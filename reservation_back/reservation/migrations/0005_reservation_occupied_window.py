@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:01
+
+from datetime import time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_windows(apps, schema_editor):
+    """
+    پنجره رزروهای امروز به بعد با قانون‌های فعلی ثبت و جدول اشغال همان روزها از نو ساخته می‌شود
+    (مثل rebuild_occupancy) تا آزاد کردن بعدی دقیقاً همان چیزی باشد که در جدول حساب شده.
+    """
+    Reservation = apps.get_model('reservation', 'Reservation')
+    CapacityRule = apps.get_model('reservation', 'CapacityRule')
+    SlotOccupancy = apps.get_model('reservation', 'SlotOccupancy')
+    rules = {rule.weekday: rule for rule in CapacityRule.objects.all()}
+    today = timezone.localdate()
+
+    totals = {}
+    batch = []
+    for reservation in Reservation.objects.filter(date__gte=today).iterator(chunk_size=1000):
+        rule = rules.get(reservation.date.weekday(), rules.get(None))
+        if rule is None:
+            continue
+        minutes = reservation.time.hour * 60 + reservation.time.minute
+        start = minutes - minutes % rule.slot_minutes
+        count = -(-rule.turn_minutes // rule.slot_minutes)
+        slots = [start + i * rule.slot_minutes for i in range(count) if start + i * rule.slot_minutes < 24 * 60]
+        reservation.occupied_date = reservation.date
+        reservation.occupied_slots = [f'{slot // 60:02d}:{slot % 60:02d}' for slot in slots]
+        reservation.occupied_guests = reservation.guests
+        batch.append(reservation)
+        for slot in slots:
+            key = (reservation.date, time(slot // 60, slot % 60))
+            totals[key] = totals.get(key, 0) + reservation.guests
+
+    Reservation.objects.bulk_update(batch, ['occupied_date', 'occupied_slots', 'occupied_guests'], batch_size=1000)
+    SlotOccupancy.objects.filter(date__gte=today).delete()
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(date=day, time=slot, seats_taken=seats) for (day, slot), seats in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0004_reservation_date_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='occupied_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='occupied_guests',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='occupied_slots',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_windows, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,98 @@ class Reservation(models.Model):
     phone = models.CharField(max_length=20)
     message = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-from django.db import models
+    # پنجره‌ای که این رزرو در SlotOccupancy گرفته؛ release دقیقاً همین را آزاد می‌کند
+    # حتی اگر بعداً قانون ظرفیت (slot/turn) عوض شده باشد
+    occupied_date = models.DateField(null=True, blank=True, editable=False)
+    occupied_slots = models.JSONField(default=list, blank=True, editable=False)
+    occupied_guests = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # برگه روزانه میزبان و فیلتر تاریخ در ادمین: رزروهای یک روز به ترتیب ساعت
+            models.Index(fields=['date', 'time'], name='reservation_date_time_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._held_for = (loaded.get('date'), loaded.get('time'), loaded.get('guests'))
+        # تاریخ ذخیره‌شده؛ اگر رزرو به روز دیگری برود برگه هر دو روز باید به‌روز شود
+        instance._saved_date = loaded.get('date')
+        return instance
+
+    def needs_hold(self):
+        """تاریخ، ساعت یا تعداد مهمان نسبت به آخرین اشغال ظرفیت (یا بارگذاری از دیتابیس) عوض شده؟"""
+        return getattr(self, '_held_for', None) != (self.date, self.time, self.guests)
+
+
+class CapacityRule(models.Model):
+    """
+    ظرفیت سالن برای یک روز هفته (weekday خالی = پیش‌فرض همه روزها).
+    سامانه رزرو تک‌سالنی است؛ این قانون‌ها و SlotOccupancy به رستوران خاصی وابسته نیستند.
+    هر رزرو به اندازه turn_minutes صندلی‌های اسلات‌های پشت سر هم را اشغال می‌کند.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'دوشنبه'),
+        (1, 'سه‌شنبه'),
+        (2, 'چهارشنبه'),
+        (3, 'پنج‌شنبه'),
+        (4, 'جمعه'),
+        (5, 'شنبه'),
+        (6, 'یکشنبه'),
+    ]
+
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True, unique=True)
+    opens_at = models.TimeField()
+    closes_at = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=15)
+    turn_minutes = models.PositiveSmallIntegerField(default=90)
+    seats = models.PositiveIntegerField()
+
+    def __str__(self):
+        day = self.get_weekday_display() if self.weekday is not None else 'پیش‌فرض'
+        return f"{day}: {self.opens_at}-{self.closes_at} ({self.seats} صندلی)"
+
+
+class SlotOccupancy(models.Model):
+    """صندلی‌های اشغال‌شده هر اسلات؛ با هر رزرو به صورت اتمیک به‌روز می‌شود."""
+    date = models.DateField()
+    time = models.TimeField()
+    seats_taken = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time'], name='unique_slot_occupancy'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.time}: {self.seats_taken}"
+
+
+
+class OutboxEvent(models.Model):
+    """
+    رویدادهای realtime که همراه با تراکنش اصلی ثبت می‌شوند (transactional outbox)
+    و dispatcher پس‌زمینه آن‌ها را به Pusher می‌فرستد.
+    """
+    channel = models.CharField(max_length=100)
+    event = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # dispatcherی که رویداد را برای ارسال برداشته (تا available_at، پایان اجاره)
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+    # بعد از OUTBOX_MAX_ATTEMPTS تلاش ناموفق دیگر ارسال نمی‌شود (dead letter)
+    dead_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'available_at', 'id'], name='outbox_pending_idx'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.channel}:{self.event} #{self.id}"
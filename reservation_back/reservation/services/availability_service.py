@@ -0,0 +1,178 @@
+from datetime import time as time_cls, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from reservation.models import CapacityRule, Reservation, SlotOccupancy
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _as_time(minutes):
+    return time_cls(minutes // 60, minutes % 60)
+
+
+def load_rules():
+    return {rule.weekday: rule for rule in CapacityRule.objects.all()}
+
+
+def rule_for(rules, day):
+    return rules.get(day.weekday(), rules.get(None))
+
+
+def slot_start(rule, value):
+    minutes = _minutes(value)
+    return minutes - minutes % rule.slot_minutes
+
+
+def window(rule, start_minutes):
+    """اسلات‌هایی که رزروی شروع‌شده در start_minutes اشغال می‌کند (تا پایان همان روز)."""
+    count = -(-rule.turn_minutes // rule.slot_minutes)
+    return [
+        start_minutes + i * rule.slot_minutes
+        for i in range(count)
+        if start_minutes + i * rule.slot_minutes < 24 * 60
+    ]
+
+
+def day_slots(rule):
+    return range(slot_start(rule, rule.opens_at), _minutes(rule.closes_at), rule.slot_minutes)
+
+
+def _check_open(rule, value):
+    if rule is None:
+        raise SlotUnavailable("رستوران در این روز رزرو نمی‌پذیرد.")
+    start = slot_start(rule, value)
+    if not (_minutes(rule.opens_at) <= start < _minutes(rule.closes_at)):
+        raise SlotUnavailable("این ساعت خارج از زمان کاری رستوران است.")
+    return start
+
+
+def _occupy(rule, day, start, guests):
+    """صندلی‌های پنجره را می‌گیرد و زمان اسلات‌های گرفته‌شده را برمی‌گرداند."""
+    slots = [_as_time(minutes) for minutes in window(rule, start)]
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(date=day, time=slot) for slot in slots],
+        ignore_conflicts=True,
+    )
+    # UPDATE شرطی: فقط اسلات‌هایی که هنوز جا دارند زیاد می‌شوند؛ اگر یکی جا نداشت کل تراکنش برمی‌گردد
+    updated = SlotOccupancy.objects.filter(
+        date=day, time__in=slots, seats_taken__lte=rule.seats - guests
+    ).update(seats_taken=F('seats_taken') + guests)
+    if updated != len(slots):
+        raise SlotUnavailable("ظرفیت این ساعت تکمیل است.")
+    return slots
+
+
+def _free(day, slots, guests):
+    if slots and guests:
+        SlotOccupancy.objects.filter(
+            date=day, time__in=slots, seats_taken__gte=guests
+        ).update(seats_taken=F('seats_taken') - guests)
+
+
+def _set_held(reservation, day, slots, guests):
+    reservation.occupied_date = day
+    reservation.occupied_slots = [slot.strftime('%H:%M') for slot in slots]
+    reservation.occupied_guests = guests
+
+
+def hold(reservation, rules=None):
+    """
+    ظرفیت را با تاریخ، ساعت و تعداد فعلی رزرو هماهنگ می‌کند: پنجره قبلی (occupied_*) آزاد و پنجره تازه
+    گرفته می‌شود. رزرو ذخیره نمی‌شود؛ سیگنال pre_save آن را برای هر ایجاد یا ویرایشی (ادمین، ORM)
+    صدا می‌زند که تاریخ/ساعت/تعداد را عوض کرده باشد. اگر جا نباشد SlotUnavailable.
+    """
+    rules = load_rules() if rules is None else rules
+    day, slots, guests = None, [], 0
+    # بدون تراکنش بیرونی، آزاد کردن و گرفتن با هم انجام شوند یا هیچ‌کدام
+    with transaction.atomic(savepoint=False):
+        _free(reservation.occupied_date, reservation.occupied_slots, reservation.occupied_guests)
+        # اگر هیچ قانون ظرفیتی تعریف نشده باشد، مثل قبل بدون محدودیت رزرو می‌شود
+        if rules:
+            rule = rule_for(rules, reservation.date)
+            start = _check_open(rule, reservation.time)
+            day, guests = reservation.date, reservation.guests
+            slots = _occupy(rule, day, start, guests)
+    _set_held(reservation, day, slots, guests)
+    reservation._held_for = (reservation.date, reservation.time, reservation.guests)
+
+
+@transaction.atomic
+def book(date, time, guests, name, phone, message=''):
+    reservation = Reservation(date=date, time=time, guests=guests, name=name, phone=phone, message=message)
+    hold(reservation)
+    reservation.save()
+    return reservation
+
+
+def release(reservation):
+    """دقیقاً همان پنجره‌ای را آزاد می‌کند که این رزرو گرفته است (بعد از حذف)."""
+    _free(reservation.occupied_date, reservation.occupied_slots, reservation.occupied_guests)
+    _set_held(reservation, None, [], 0)
+
+
+def availability(start, days=7, guests=1):
+    """
+    ظرفیت آزاد هر اسلات برای چند روز؛ اشغال همه روزها با یک کوئری خوانده می‌شود.
+    خروجی: [{'date': ..., 'slots': [{'time': 'HH:MM', 'free_seats': n}, ...]}, ...]
+    """
+    rules = load_rules()
+    end = start + timedelta(days=days - 1)
+
+    taken = {}
+    for day, slot, seats_taken in SlotOccupancy.objects.filter(
+        date__range=(start, end)
+    ).values_list('date', 'time', 'seats_taken'):
+        taken.setdefault(day, {})[_minutes(slot)] = seats_taken
+
+    result = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        rule = rule_for(rules, day)
+        slots = []
+        if rule is not None:
+            day_taken = taken.get(day, {})
+            for minutes in day_slots(rule):
+                busiest = max(day_taken.get(slot, 0) for slot in window(rule, minutes))
+                free = rule.seats - busiest
+                if free >= guests:
+                    slots.append({'time': _as_time(minutes).strftime('%H:%M'), 'free_seats': free})
+        result.append({'date': day.isoformat(), 'slots': slots})
+    return result
+
+
+@transaction.atomic
+def rebuild_occupancy(start=None):
+    """جدول اشغال و پنجره ثبت‌شده روی هر رزرو را از روی رزروها و قانون‌های فعلی دوباره می‌سازد."""
+    start = start or timezone.localdate()
+    rules = load_rules()
+    totals = {}
+    reservations = list(Reservation.objects.filter(date__gte=start).only('id', 'date', 'time', 'guests'))
+    for reservation in reservations:
+        day, guests = reservation.date, reservation.guests
+        rule = rule_for(rules, day)
+        if rule is None:
+            _set_held(reservation, None, [], 0)
+            continue
+        slots = [_as_time(minutes) for minutes in window(rule, slot_start(rule, reservation.time))]
+        _set_held(reservation, day, slots, guests)
+        for slot in slots:
+            totals[(day, slot)] = totals.get((day, slot), 0) + guests
+
+    Reservation.objects.bulk_update(
+        reservations, ['occupied_date', 'occupied_slots', 'occupied_guests'], batch_size=1000
+    )
+    SlotOccupancy.objects.filter(date__gte=start).delete()
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(date=day, time=slot, seats_taken=seats) for (day, slot), seats in totals.items()],
+        batch_size=1000,
+    )
+    return len(totals)
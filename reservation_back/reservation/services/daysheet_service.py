@@ -0,0 +1,106 @@
+"""
+برگه روزانه میزبان و نسخه آن برای ETag.
+
+نسخه هر روز در کش default نگه داشته می‌شود و 304 فقط تا وقتی درست است که همه workerها همان نسخه را
+ببینند؛ پس در production کش باید مشترک باشد (Redis/Memcached؛ manage.py check --deploy بررسی می‌کند).
+با LocMemCache هر پروسه نسخه خودش را دارد و تغییرات workerهای دیگر تا منقضی شدن کلید دیده نمی‌شوند.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from reservation.models import Reservation
+from reservation_back.realtime import publish
+
+CHANNEL = 'daysheet'
+PHONE_TAIL = 4
+
+
+def _cache_key(date):
+    return f'daysheet:version:{date.isoformat()}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'DAYSHEET_VERSION_TIMEOUT', 2 * 24 * 60 * 60)
+
+
+def sheet_version(date):
+    """
+    نسخه برگه یک روز بدون کوئری از کش خوانده می‌شود.
+    اگر در کش نباشد نسخه تازه ساخته می‌شود؛ در بدترین حالت یک پاسخ کامل اضافه ارسال می‌شود.
+    """
+    version = cache.get(_cache_key(date))
+    if version is None:
+        version = bump_version(date)
+    return version
+
+
+def bump_version(date, previous=0):
+    version = max(previous + 1, time.time_ns() // 1000)
+    cache.set(_cache_key(date), version, _cache_timeout())
+    return version
+
+
+def sheet_etag(date, version):
+    return f'"daysheet-{date.isoformat()}-{version}"'
+
+
+def _phone_tail(phone):
+    return (phone or '')[-PHONE_TAIL:]
+
+
+def day_sheet(date):
+    """برگه ستونی: آرایه‌های موازی به ترتیب ساعت (از ایندکس date+time خوانده می‌شود)."""
+    version = sheet_version(date)
+    rows = (
+        Reservation.objects.filter(date=date)
+        .order_by('time', 'id')
+        .values_list('id', 'time', 'guests', 'name', 'phone')
+    )
+    ids, times, guests, names, phones = [], [], [], [], []
+    for row_id, row_time, row_guests, name, phone in rows:
+        ids.append(row_id)
+        times.append(row_time.strftime('%H:%M'))
+        guests.append(row_guests)
+        names.append(name)
+        phones.append(_phone_tail(phone))
+
+    return {
+        'date': date.isoformat(),
+        'version': version,
+        'ids': ids,
+        'times': times,
+        'guests': guests,
+        'names': names,
+        'phones': phones,
+    }
+
+
+def _bump(date):
+    return bump_version(date, cache.get(_cache_key(date)) or 0)
+
+
+def reservation_changed(reservation, deleted=False, previous_date=None):
+    """
+    بعد از commit صدا زده می‌شود: نسخه روز را بالا می‌برد و فقط همان ردیف را push می‌کند.
+    اگر رزرو از previous_date به روز دیگری رفته باشد، برگه آن روز هم نسخه تازه و یک delete می‌گیرد.
+    """
+    if previous_date is not None and previous_date != reservation.date:
+        publish(CHANNEL, 'daysheet-update', {
+            'date': previous_date.isoformat(), 'version': _bump(previous_date), 'id': reservation.id, 'op': 'delete',
+        })
+
+    version = _bump(reservation.date)
+    payload = {'date': reservation.date.isoformat(), 'version': version, 'id': reservation.id}
+    if deleted:
+        payload['op'] = 'delete'
+    else:
+        payload.update({
+            'op': 'upsert',
+            'time': reservation.time.strftime('%H:%M'),
+            'guests': reservation.guests,
+            'name': reservation.name,
+            'phone': _phone_tail(reservation.phone),
+        })
+    publish(CHANNEL, 'daysheet-update', payload)
@@ -0,0 +1,173 @@
+import logging
+import random
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reservation.models import OutboxEvent
+from reservation_back.realtime import publish
+from utils.pusher_client import get_pusher_client
+
+logger = logging.getLogger(__name__)
+
+# محدودیت Pusher برای trigger_batch
+PUSHER_BATCH_LIMIT = 10
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(channel, event, payload):
+    """رویداد را در همان تراکنش جاری ثبت می‌کند؛ بعد از commit، dispatcher بیدار می‌شود."""
+    outbox_event = OutboxEvent.objects.create(
+        channel=channel, event=event, payload=payload, available_at=timezone.now()
+    )
+    transaction.on_commit(wake_dispatcher)
+    # مشترک‌های هاب داخلی (SSE/وب‌سوکت) بدون انتظار برای dispatcher باخبر می‌شوند
+    transaction.on_commit(lambda: publish(channel, event, payload))
+    return outbox_event
+
+
+def backoff(attempts):
+    base = _setting('OUTBOX_RETRY_BASE_SECONDS', 1)
+    cap = _setting('OUTBOX_RETRY_MAX_SECONDS', 300)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def _ready(now):
+    return OutboxEvent.objects.filter(sent_at__isnull=True, dead_at__isnull=True, available_at__lte=now)
+
+
+def claim(limit):
+    """
+    رویدادهای آماده را در یک تراکنش کوتاه برای این dispatcher اجاره می‌کند: available_at تا پایان اجاره
+    جلو می‌رود و claim_token ثبت می‌شود. UPDATE شرطی روی available_at تضمین می‌کند هر رویداد را فقط یک
+    dispatcher بردارد، حتی روی SQLite که skip_locked ندارد. اگر dispatcher وسط ارسال از کار بیفتد،
+    رویداد بعد از پایان اجاره دوباره برداشته می‌شود (ارسال حداقل یک‌بار).
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    with transaction.atomic():
+        queryset = _ready(now).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # چند dispatcher هم‌زمان پشت قفل ردیف‌های یکدیگر منتظر نمی‌مانند
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        lease = timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 60))
+        _ready(now).filter(id__in=ids).update(available_at=now + lease, claim_token=token)
+    return list(OutboxEvent.objects.filter(id__in=ids, claim_token=token).order_by('id'))
+
+
+def _failed(chunk, exc):
+    logger.warning("outbox dispatch failed for %s: %s", [e.id for e in chunk], exc)
+    now = timezone.now()
+    max_attempts = _setting('OUTBOX_MAX_ATTEMPTS', 10)
+    for e in chunk:
+        e.attempts += 1
+        e.last_error = str(exc)[:500]
+        if e.attempts >= max_attempts:
+            e.dead_at = now
+            logger.error("outbox event %s dead-lettered after %s attempts", e.id, e.attempts)
+        else:
+            e.available_at = now + backoff(e.attempts)
+    OutboxEvent.objects.bulk_update(chunk, ['attempts', 'available_at', 'last_error', 'dead_at'])
+
+
+def dispatch_pending(client=None, limit=100):
+    """
+    رویدادهای آماده را برمی‌دارد (claim) و بیرون از تراکنش در دسته‌های trigger_batch می‌فرستد؛
+    هیچ قفل یا تراکنشی منتظر Pusher نمی‌ماند. تعداد ارسال‌شده‌ها را برمی‌گرداند.
+    """
+    if client is None:
+        client = get_pusher_client()
+
+    sent = 0
+    events = claim(limit)
+    for start in range(0, len(events), PUSHER_BATCH_LIMIT):
+        chunk = events[start:start + PUSHER_BATCH_LIMIT]
+        batch = [{'channel': e.channel, 'name': e.event, 'data': e.payload} for e in chunk]
+        try:
+            client.trigger_batch(batch)
+        except Exception as exc:
+            _failed(chunk, exc)
+        else:
+            OutboxEvent.objects.filter(
+                id__in=[e.id for e in chunk], claim_token=chunk[0].claim_token
+            ).update(sent_at=timezone.now())
+            sent += len(chunk)
+    return sent
+
+
+def requeue_dead(queryset=None):
+    """رویدادهای dead-letter را برای ارسال دوباره به صف برمی‌گرداند."""
+    queryset = OutboxEvent.objects.all() if queryset is None else queryset
+    return queryset.filter(sent_at__isnull=True, dead_at__isnull=False).update(
+        dead_at=None, attempts=0, available_at=timezone.now(), claim_token=None
+    )
+
+
+class OutboxDispatcher:
+    """
+    حلقه ارسال رویدادها. هم در management command (پروسه جدا) و هم
+    به صورت thread پس‌زمینه در همان پروسه وب قابل اجراست.
+    """
+
+    def __init__(self, client=None, interval=None, limit=100):
+        self.client = client
+        self.interval = interval if interval is not None else _setting('OUTBOX_POLL_INTERVAL', 2.0)
+        self.limit = limit
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        return dispatch_pending(self.client, self.limit)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                while self.run_once() >= self.limit:
+                    pass
+            except Exception:
+                logger.exception("outbox dispatcher iteration failed")
+            finally:
+                connection.close_if_unusable_or_obsolete()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='outbox-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def wake_dispatcher():
+    # با OUTBOX_DISPATCH_IN_PROCESS=False ارسال فقط با دستور dispatch_outbox انجام می‌شود
+    if not _setting('OUTBOX_DISPATCH_IN_PROCESS', True):
+        return
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = OutboxDispatcher().start()
+    _dispatcher.wake()
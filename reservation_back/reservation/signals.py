@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Reservation
+from .services.availability_service import hold, release
+from .services.daysheet_service import reservation_changed
+
+
+@receiver(pre_save, sender=Reservation)
+def reservation_hold(sender, instance, raw=False, **kwargs):
+    # ایجاد و ویرایش از ادمین یا ORM هم ظرفیت می‌گیرند؛ book خودش hold کرده و اینجا کاری نمی‌ماند.
+    # fixtureها (raw) دست نمی‌خورند و بعدشان rebuild_occupancy اجرا می‌شود.
+    if not raw and instance.needs_hold():
+        hold(instance)
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    release(instance)
+    transaction.on_commit(lambda: reservation_changed(instance, deleted=True))
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    previous_date = getattr(instance, '_saved_date', None)
+    instance._saved_date = instance.date
+    transaction.on_commit(lambda: reservation_changed(instance, previous_date=previous_date))
@@ -1,3 +1,140 @@
-from django.test import TestCase
+import datetime
+import os
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from reservation.models import CapacityRule, OutboxEvent, Reservation, SlotOccupancy
+from reservation.services.availability_service import book, SlotUnavailable
+from reservation.services.daysheet_service import sheet_version
+from reservation.services.outbox_service import claim, dispatch_pending, enqueue, requeue_dead
+from utils.pusher_client import LocalPusherClient, build_pusher_client
+
+DAY = datetime.date(2031, 3, 4)
+
+
+def _time(value):
+    return datetime.time.fromisoformat(value)
+
+
+class OccupancyTests(TestCase):
+    """هر رزرو دقیقاً همان پنجره‌ای را آزاد می‌کند که گرفته است؛ ادمین و ORM هم ظرفیت می‌گیرند."""
+
+    def setUp(self):
+        self.rule = CapacityRule.objects.create(
+            opens_at=_time('12:00'), closes_at=_time('23:00'), slot_minutes=15, turn_minutes=90, seats=4,
+        )
+
+    def book(self, value, guests=4, day=DAY):
+        return book(day, _time(value), guests, 'مهمان', '09120000000')
+
+    def taken(self, day=DAY):
+        return dict(SlotOccupancy.objects.filter(date=day, seats_taken__gt=0).values_list('time', 'seats_taken'))
+
+    def test_orm_create_and_delete_cannot_oversell(self):
+        self.book('19:30')
+        with self.assertRaises(SlotUnavailable), transaction.atomic():
+            Reservation.objects.create(date=DAY, time=_time('19:30'), guests=4, name='ادمین', phone='0912')
+        # رزروی که از ORM ساخته و حذف می‌شود فقط ظرفیت خودش را آزاد می‌کند
+        other = Reservation.objects.create(date=DAY, time=_time('12:00'), guests=2, name='ادمین', phone='0912')
+        other.delete()
+        with self.assertRaises(SlotUnavailable), transaction.atomic():
+            self.book('20:00')
+
+    def test_editing_date_and_guests_moves_the_hold(self):
+        reservation = self.book('19:30', guests=2)
+        reservation = Reservation.objects.get(id=reservation.id)
+        reservation.date = DAY + datetime.timedelta(days=1)
+        reservation.guests = 3
+        reservation.save()
+        self.assertEqual(self.taken(), {})
+        self.assertEqual(set(self.taken(reservation.date).values()), {3})
+        # تغییر فیلدهای دیگر ظرفیت را دوباره نمی‌گیرد
+        reservation.name = 'تغییر نام'
+        reservation.save()
+        self.assertEqual(set(self.taken(reservation.date).values()), {3})
+
+    def test_release_uses_the_window_that_was_held(self):
+        reservation = self.book('19:30')
+        self.rule.slot_minutes, self.rule.turn_minutes = 30, 120
+        self.rule.save()
+        reservation.delete()
+        self.assertEqual(self.taken(), {})
+
+
+class DaySheetTests(TestCase):
+
+    def test_moving_a_reservation_updates_both_days(self):
+        reservation = book(DAY, _time('19:30'), 2, 'مهمان', '09120000000')
+        reservation = Reservation.objects.get(id=reservation.id)
+        next_day = DAY + datetime.timedelta(days=1)
+        before = sheet_version(DAY), sheet_version(next_day)
+
+        reservation.date = next_day
+        with mock.patch('reservation.services.daysheet_service.publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            reservation.save()
+
+        self.assertGreater(sheet_version(DAY), before[0])
+        self.assertGreater(sheet_version(next_day), before[1])
+        ops = [(call.args[2]['date'], call.args[2]['op']) for call in publish.call_args_list]
+        self.assertEqual(ops, [(DAY.isoformat(), 'delete'), (next_day.isoformat(), 'upsert')])
+
+
+@override_settings(OUTBOX_DISPATCH_IN_PROCESS=False, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    """ارسال بیرون از تراکنش: claim، تلاش مجدد با backoff و dead letter."""
+
+    def setUp(self):
+        self.client = LocalPusherClient()
+        self.event = enqueue('reservations', 'new-reservation', {'name': 'مهمان'})
+
+    def make_ready(self):
+        OutboxEvent.objects.filter(id=self.event.id).update(available_at=timezone.now())
+
+    def test_failed_send_is_retried(self):
+        self.client.fail_next = 1
+        with self.assertLogs('reservation.services.outbox_service', 'WARNING'):
+            self.assertEqual(dispatch_pending(self.client), 0)
+        event = OutboxEvent.objects.get(id=self.event.id)
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertEqual(dispatch_pending(self.client), 0)  # هنوز در backoff
+
+        self.make_ready()
+        self.assertEqual(dispatch_pending(self.client), 1)
+        self.assertIsNotNone(OutboxEvent.objects.get(id=self.event.id).sent_at)
+        self.assertEqual(len(self.client.events), 1)
+
+    def test_claimed_events_are_not_sent_twice(self):
+        claimed = claim(10)
+        self.assertEqual([e.id for e in claimed], [self.event.id])
+        # dispatcher دوم (مثلاً دستور dispatch_outbox) تا پایان اجاره چیزی برنمی‌دارد
+        self.assertEqual(dispatch_pending(self.client), 0)
+        self.assertEqual(self.client.events, [])
+
+    def test_event_is_dead_lettered_after_max_attempts(self):
+        self.client.fail_next = 3
+        with self.assertLogs('reservation.services.outbox_service', 'WARNING') as logs:
+            for _ in range(3):
+                self.make_ready()
+                dispatch_pending(self.client)
+        self.assertIn('dead-lettered', logs.output[-1])
+        event = OutboxEvent.objects.get(id=self.event.id)
+        self.assertEqual(event.attempts, 3)
+        self.assertIsNotNone(event.dead_at)
+        self.make_ready()
+        self.assertEqual(dispatch_pending(self.client), 0)
+
+        self.assertEqual(requeue_dead(), 1)
+        self.assertEqual(dispatch_pending(self.client), 1)
+
+    def test_missing_pusher_settings_are_an_error(self):
+        with mock.patch.dict(os.environ, {'PUSHER_BACKEND': '', 'PUSHER_APP_ID': ''}):
+            with self.assertRaises(ImproperlyConfigured):
+                build_pusher_client()
+        with mock.patch.dict(os.environ, {'PUSHER_BACKEND': 'local'}):
+            self.assertIsInstance(build_pusher_client(), LocalPusherClient)
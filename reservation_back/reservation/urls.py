@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('reservations/', views.create_reservation, name='create_reservation'),
+    path('reservations/availability/', views.reservation_availability, name='reservation_availability'),
+    path('reservations/day-sheet/', views.DaySheetView.as_view(), name='reservation_day_sheet'),
+    path('async/reservations/', views.create_reservation_async, name='create_reservation_async'),
 ]
@@ -1,52 +1,140 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
-from utils.pusher_client import pusher_client
-from reservation.models import Reservation
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from reservation.services.availability_service import book, availability, SlotUnavailable
+from reservation.services.outbox_service import enqueue
+from core.services.idempotency import idempotent
+from core.views import IsVendorOrAdmin, etag_matches
+from reservation.services.daysheet_service import day_sheet, sheet_version, sheet_etag
+from rest_framework.views import APIView
+from rest_framework.response import Response
 from django.utils.dateparse import parse_date, parse_time
+from django.utils import timezone
+
+
+def _reservation_data(request):
+    """داده رزرو از بدنه JSON؛ None یعنی ورودی نامعتبر است."""
+    try:
+        data = json.loads(request.body)
+        fields = {
+            "date": parse_date(data.get("date")),
+            "time": parse_time(data.get("time")),
+            "guests": int(data.get("guests")),
+            "name": data.get("name"),
+            "phone": data.get("phone"),
+            "message": data.get("message", ""),
+        }
+    except (ValueError, TypeError, AttributeError):
+        # JSON خراب، تاریخ/ساعت/عدد نامعتبر یا بدنه‌ای که شیء JSON نیست
+        return None
+    if not (fields["date"] and fields["time"] and fields["guests"] > 0 and fields["name"] and fields["phone"]):
+        return None
+    return fields
+
+
+def _book_reservation(fields):
+    with transaction.atomic():
+        reservation = book(**fields)
+        # رویداد همراه رزرو در outbox ثبت می‌شود و dispatcher پس‌زمینه آن را به Pusher می‌فرستد
+        enqueue('reservations', 'new-reservation', dict(fields, date=str(fields["date"]), time=str(fields["time"])))
+    return reservation
+
+
+INVALID_INPUT = {"error": "داده‌های ورودی نامعتبر است."}
+BOOKED = {"status": "success", "message": "رزرو ثبت شد."}
+POST_ONLY = {"error": "فقط POST مجاز است."}
+
 
 @csrf_exempt
+@idempotent('reservations.create')
 def create_reservation(request):
-    if request.method == "POST":
-        try:
-            data = json.loads(request.body)
-            date = parse_date(data.get("date"))
-            time = parse_time(data.get("time"))
-            guests = int(data.get("guests"))
-            name = data.get("name")
-            phone = data.get("phone")
-            message = data.get("message", "")
-
-            if not (date and time and guests > 0 and name and phone):
-                return JsonResponse({"error": "داده‌های ورودی نامعتبر است."}, status=400)
-
-            reservation = Reservation.objects.create(
-                date=date,
-                time=time,
-                guests=guests,
-                name=name,
-                phone=phone,
-                message=message
-            )
-
-            print("قبل از ارسال به Pusher")
-
-            # ✅ ارسال به Pusher
-            pusher_client.trigger('reservations', 'new-reservation', {
-                "date": str(date),
-                "time": str(time),
-                "guests": guests,
-                "name": name,
-                "phone": phone,
-                "message": message
-            })
-
-            print("بعد از ارسال به Pusher")
-
-            return JsonResponse({"status": "success", "message": "رزرو ثبت شد."})
-        except Exception as e:
-            import traceback
-            traceback.print_exc()  # برای بررسی خطای دقیق در ترمینال
-            return JsonResponse({"error": str(e)}, status=400)
-
-    return JsonResponse({"error": "فقط POST مجاز است."}, status=405)
+    """
+    POST /api/reservations/ با بدنه JSON {date, time, guests, name, phone, message}.
+    سامانه رزرو تک‌سالنی است: Reservation به رستوران وصل نیست و ظرفیت، برگه روزانه و کانال‌های
+    realtime بین همه رستوران‌ها مشترک‌اند؛ فیلد restaurant_id در بدنه نادیده گرفته می‌شود.
+    """
+    # فقط ورودی نامعتبر (400) و نبود ظرفیت (409) پاسخ می‌گیرند؛ خطای دیتابیس و بقیه خطاها 500 می‌شوند
+    # تا Idempotency-Key آن را ذخیره نکند و تکرار درخواست دوباره اجرا شود
+    if request.method != "POST":
+        return JsonResponse(POST_ONLY, status=405)
+
+    fields = _reservation_data(request)
+    if fields is None:
+        return JsonResponse(INVALID_INPUT, status=400)
+
+    try:
+        _book_reservation(fields)
+    except SlotUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=409)
+
+    return JsonResponse(BOOKED)
+
+
+@csrf_exempt
+@idempotent('reservations.create')
+async def create_reservation_async(request):
+    """
+    همان create_reservation برای ASGI. تراکنش رزرو (قفل اسلات‌ها و outbox) همگام است و در نخ جدا
+    اجرا می‌شود؛ ارسال به Pusher کار dispatcher است و درخواست منتظر آن نمی‌ماند.
+    """
+    if request.method != "POST":
+        return JsonResponse(POST_ONLY, status=405)
+
+    fields = _reservation_data(request)
+    if fields is None:
+        return JsonResponse(INVALID_INPUT, status=400)
+
+    try:
+        await sync_to_async(_book_reservation)(fields)
+    except SlotUnavailable as e:
+        return JsonResponse({"error": str(e)}, status=409)
+
+    return JsonResponse(BOOKED)
+
+
+def reservation_availability(request):
+    """
+    GET /api/reservations/availability/?start=&days=&guests= ؛ ظرفیت آزاد کل سالن (تک‌سالنی، بدون restaurant).
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "فقط GET مجاز است."}, status=405)
+
+    try:
+        start = parse_date(request.GET.get("start", "")) or timezone.localdate()
+        days = min(int(request.GET.get("days", 7)), 31)
+        guests = int(request.GET.get("guests", 1))
+    except ValueError:
+        return JsonResponse({"error": "داده‌های ورودی نامعتبر است."}, status=400)
+
+    if days <= 0 or guests <= 0:
+        return JsonResponse({"error": "داده‌های ورودی نامعتبر است."}, status=400)
+
+    return JsonResponse({"guests": guests, "days": availability(start, days, guests)})
+
+
+class DaySheetView(APIView):
+    """
+    برگه روزانه میزبان به صورت آرایه‌های موازی. با If-None-Match، تا وقتی رزروی تغییر نکرده
+    پاسخ 304 بدون هیچ کوئری دیتابیس برمی‌گردد؛ تغییرات تکی روی کانال realtime «daysheet» push می‌شوند.
+    """
+    permission_classes = [IsVendorOrAdmin]
+
+    def get(self, request):
+        date_param = request.query_params.get("date")
+        date = parse_date(date_param) if date_param else timezone.localdate()
+        if date is None:
+            return Response({"error": "تاریخ نامعتبر است."}, status=400)
+
+        etag = sheet_etag(date, sheet_version(date))
+        if etag_matches(request, etag):
+            response = Response(status=304)
+        else:
+            sheet = day_sheet(date)
+            etag = sheet_etag(date, sheet['version'])
+            response = Response(sheet)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
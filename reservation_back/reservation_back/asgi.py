@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reservation_back.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# مسیرهای /realtime/ (SSE و وب‌سوکت) مستقیم توسط هاب داخلی پاسخ داده می‌شوند
+from reservation_back.realtime import RealtimeRouter  # noqa: E402
+
+application = RealtimeRouter(django_application)
@@ -1,5 +1,32 @@
+import time
+
+from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.services.user_cache import (
+    profile_cache, load_profile, aload_profile, user_from_profile, restaurant_id_for,
+    changed_at, achanged_at, is_fresh,
+)
+
+
+def tokens_for_user(user):
+    """
+    توکن با claimهای پروفایل (role، restaurant_id، is_active) تا درخواست‌های بعدی به کوئری کاربر نیاز
+    نداشته باشند. profile_at زمان همین عکس از پروفایل است و به access هایی که بعداً از refresh ساخته
+    می‌شوند هم کپی می‌شود؛ اگر کاربر بعد از آن تغییر کرده باشد claimها نادیده گرفته می‌شوند.
+    """
+    profile_at = time.time()
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['role'] = user.role
+    refresh['is_active'] = user.is_active
+    refresh['restaurant_id'] = restaurant_id_for(user)
+    refresh['profile_at'] = profile_at
+    return refresh
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -13,3 +40,60 @@ class CustomJWTAuthentication(JWTAuthentication):
         except TokenError as e:
             # می‌تونی اینجا خطا رو لاگ کنی یا ignore کنی
             return None
+
+    async def aauthenticate(self, request):
+        """همان authenticate برای viewهای async؛ فقط در صورت نبودن پروفایل در کش به دیتابیس می‌رود."""
+        raw_token = request.COOKIES.get('access_token')
+        if not raw_token:
+            return None
+
+        try:
+            validated_token = self.get_validated_token(raw_token)
+            return await self.aget_user(validated_token), validated_token
+        except TokenError:
+            return None
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        profile = self._cached_profile(user_id, validated_token, changed_at(user_id))
+        if profile is None:
+            profile = load_profile(user_id)
+        return self._user_from(profile)
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        profile = self._cached_profile(user_id, validated_token, await achanged_at(user_id))
+        if profile is None:
+            profile = await aload_profile(user_id)
+        return self._user_from(profile)
+
+    def _user_id(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        # بعضی نسخه‌های simplejwt شناسه را رشته‌ای در توکن می‌گذارند؛ کلید کش باید یکسان باشد
+        return get_user_model()._meta.pk.to_python(user_id)
+
+    def _cached_profile(self, user_id, validated_token, changed):
+        # ۱) پروفایل در کش LRU  ۲) claimهای توکن  ۳) None یعنی کوئری دیتابیس
+        # هر دو فقط وقتی پذیرفته می‌شوند که بعد از آخرین تغییر کاربر (changed در کش مشترک) ساخته شده باشند
+        profile = profile_cache.get(user_id)
+        if profile is not None and is_fresh(profile['loaded_at'], changed):
+            return profile
+        if 'is_active' in validated_token and is_fresh(validated_token.get('profile_at'), changed):
+            return {
+                'id': user_id,
+                'username': validated_token.get('username', ''),
+                'role': validated_token['role'],
+                'restaurant_id': validated_token.get('restaurant_id'),
+                'is_active': validated_token['is_active'],
+            }
+        return None
+
+    def _user_from(self, profile):
+        if profile is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not profile['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user_from_profile(profile)
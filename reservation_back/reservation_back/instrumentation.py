@@ -0,0 +1,238 @@
+"""
+اندازه‌گیری هزینه SQL هر درخواست (اختیاری).
+
+برای فعال‌سازی میدل‌ور را بعد از SecurityMiddleware به MIDDLEWARE اضافه کنید:
+
+    'reservation_back.instrumentation.SQLInstrumentationMiddleware',
+
+- SQL_INSTRUMENTATION_SAMPLE_RATE: سهم درخواست‌هایی که اندازه‌گیری می‌شوند (پیش‌فرض 1.0؛ در production مثلاً 0.05)
+- SQL_N_PLUS_ONE_THRESHOLD: تکرار یک کوئری (با پارامترهای متفاوت) از این تعداد به بالا N+1 حساب می‌شود
+- METRICS_TOKEN: اگر تنظیم شود /metrics با هدر «Authorization: Bearer <token>» باز است
+- METRICS_ALLOWED_IPS: آدرس‌هایی (REMOTE_ADDR) که /metrics را بدون توکن می‌بینند؛ پشت reverse proxy
+  همه درخواست‌ها از آدرس proxy می‌آیند، پس آنجا از توکن استفاده کنید
+بدون هیچ‌کدام /metrics برای همه بسته است (403).
+
+نتیجه هر درخواست اندازه‌گیری‌شده در هدر Server-Timing می‌آید و در هیستوگرام‌های هر route
+جمع می‌شود که /metrics به فرمت متنی Prometheus برمی‌گرداند. آمار هر پروسه جداست.
+میدل‌ور هم همگام است و هم async، پس زیر ASGI viewهای async را به نخ جدا نمی‌برد.
+زمان و کوئری‌های پاسخ‌های streaming فقط تا برگرداندن پاسخ شمرده می‌شوند؛ کوئری‌هایی که هنگام
+ارسال بدنه (مثلاً export) اجرا می‌شوند در آمار نمی‌آیند.
+"""
+import hmac
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+
+
+def fingerprint(sql):
+    """کوئری بدون مقادیر؛ دو کوئری با fingerprint یکسان فقط در پارامترها فرق دارند."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    return _IN_LIST_RE.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper جنگو؛ بدون نیاز به DEBUG و بدون نگه داشتن متن همه کوئری‌ها."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+
+    def repeated(self, threshold):
+        return {sql: count for sql, count in self.fingerprints.items() if count >= threshold}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.total = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.total += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.total}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.total}'
+
+
+class MetricsRegistry:
+    METRICS = (
+        ('http_request_duration_seconds', 'Request duration of sampled requests.', DURATION_BUCKETS),
+        ('db_query_duration_seconds', 'Total SQL time per sampled request.', DURATION_BUCKETS),
+        ('db_queries_per_request', 'SQL queries per sampled request.', QUERY_COUNT_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._n_plus_one = {}
+
+    def observe(self, route, method, duration, recorder, n_plus_one):
+        key = (route, method)
+        with self._lock:
+            histograms = self._routes.get(key)
+            if histograms is None:
+                histograms = self._routes[key] = [Histogram(buckets) for _, _, buckets in self.METRICS]
+            for histogram, value in zip(histograms, (duration, recorder.duration, recorder.count)):
+                histogram.observe(value)
+            if n_plus_one:
+                self._n_plus_one[key] = self._n_plus_one.get(key, 0) + 1
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for position, (name, help_text, _) in enumerate(self.METRICS):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), histograms in sorted(self._routes.items()):
+                    lines.extend(histograms[position].lines(name, _labels(route, method)))
+            lines.append('# HELP db_n_plus_one_requests_total Sampled requests with repeated queries.')
+            lines.append('# TYPE db_n_plus_one_requests_total counter')
+            for (route, method), count in sorted(self._n_plus_one.items()):
+                lines.append(f'db_n_plus_one_requests_total{{{_labels(route, method)}}} {count}')
+            return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._n_plus_one.clear()
+
+
+def _labels(route, method):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+
+registry = MetricsRegistry()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return '/' + match.route if match.route else match.view_name
+
+
+def _install(stack, recorder):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+class SQLInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            _install(stack, recorder)
+            response = self.get_response(request)
+        return self._finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        # اتصال‌های دیتابیس مال نخ همگام این درخواست‌اند (sync_to_async با thread_sensitive)؛
+        # wrapper همان‌جا نصب و برداشته می‌شود تا کوئری‌های viewهای async هم شمرده شوند
+        stack = ExitStack()
+        await sync_to_async(_install)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, recorder, time.perf_counter() - started)
+
+    def _finish(self, request, response, recorder, duration):
+        route = _route(request)
+        repeated = recorder.repeated(self.threshold)
+        if repeated:
+            sql, count = max(repeated.items(), key=lambda item: item[1])
+            logger.warning("possible N+1 on %s %s: %d× %s", request.method, route, count, sql[:300])
+
+        registry.observe(route, request.method, duration, recorder, bool(repeated))
+        timing = [
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'app;dur={duration * 1000:.1f}',
+        ]
+        if repeated:
+            timing.append(f'nplusone;desc="{max(repeated.values())} repeated"')
+        response['Server-Timing'] = ', '.join(timing)
+        return response
+
+
+def _metrics_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(given.encode(), token.encode()):
+            return True
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', [])
+    return '*' in allowed or request.META.get('REMOTE_ADDR') in allowed
+
+
+def metrics_view(request):
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
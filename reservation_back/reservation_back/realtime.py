@@ -0,0 +1,352 @@
+"""
+هاب realtime داخلی (جایگزین Pusher) روی همان اپلیکیشن ASGI.
+
+- /realtime/sse/<channel>/  استریم Server-Sent Events
+- /realtime/ws/<channel>/   وب‌سوکت (فقط ارسال از سرور)
+
+هر کانال مجموعه‌ای از مشترک‌ها دارد و هر مشترک یک صف محدود؛ مشترکی که عقب بماند
+(صفش پر شود) قطع می‌شود تا حافظه پروسه بالا نرود. کلاینت SSE خودش دوباره وصل می‌شود.
+برای چند پروسه/سرور، REALTIME_BACKEND = 'redis' پیام‌ها را بین پروسه‌ها پخش می‌کند.
+دسترسی کانال‌های خصوصی مثل درخواست‌های HTTP با CustomJWTAuthentication بررسی می‌شود و با هر
+heartbeat دوباره؛ اگر کاربر بعد از اتصال تغییر کرده باشد (غیرفعال یا تغییر نقش) اتصال بسته می‌شود.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+PATH_RE = re.compile(r'^/realtime/(?P<transport>sse|ws)/(?P<channel>[\w.-]+)/?$')
+PUBLIC_CHANNEL_RE = re.compile(r'^(reservations|order-[0-9a-f-]{36})$')
+RESTAURANT_CHANNEL_RE = re.compile(r'^restaurant-(?P<id>\d+)$')
+# کانال‌هایی که فقط فروشنده و مدیر می‌بینند (برگه روزانه میزبان)
+STAFF_CHANNELS = {'daysheet'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Subscriber:
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.lagged = False
+
+
+class Hub:
+    """pub/sub درون‌پروسه‌ای؛ همه متدها به جز deliver_threadsafe باید روی حلقه رویداد صدا زده شوند."""
+
+    def __init__(self):
+        self.channels = {}
+        self.loop = None
+
+    def subscribe(self, channel):
+        self.loop = self.loop or asyncio.get_running_loop()
+        subscriber = Subscriber(channel, _setting('REALTIME_QUEUE_SIZE', 100))
+        self.channels.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self.channels.get(subscriber.channel)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.channels[subscriber.channel]
+
+    def deliver(self, channel, message):
+        for subscriber in list(self.channels.get(channel, ())):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # backpressure: مشترک کند قطع می‌شود؛ None در صف یعنی «اتصال را ببند»
+                subscriber.lagged = True
+                self.unsubscribe(subscriber)
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(None)
+
+    def deliver_threadsafe(self, channel, message):
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.deliver, channel, message)
+
+    def subscriber_count(self):
+        return sum(len(subscribers) for subscribers in self.channels.values())
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """پخش فقط داخل همین پروسه."""
+
+    def publish(self, channel, message):
+        hub.deliver_threadsafe(channel, message)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisBackend:
+    """
+    پخش بین پروسه‌ها با Redis pub/sub (نیازمند پکیج redis).
+    اگر اتصال گوش‌دادن قطع شود با backoff نمایی (تا retry_max ثانیه) دوباره وصل می‌شود؛
+    پیام‌هایی که در این فاصله منتشر شده‌اند به این پروسه نمی‌رسند (pub/sub بافر ندارد).
+    """
+
+    prefix = 'realtime:'
+    retry_initial = 0.5
+    retry_max = 30
+
+    def __init__(self, url):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("REALTIME_BACKEND='redis' نیازمند نصب پکیج redis است.")
+        self.url = url
+        self._sync = redis.Redis.from_url(url)
+        self._async_module = redis.asyncio
+        self._task = None
+
+    def publish(self, channel, message):
+        self._sync.publish(self.prefix + channel, json.dumps(message))
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        delay = self.retry_initial
+        while True:
+            client = self._async_module.Redis.from_url(self.url)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.psubscribe(self.prefix + '*')
+                delay = self.retry_initial
+                async for item in pubsub.listen():
+                    if item['type'] != 'pmessage':
+                        continue
+                    channel = item['channel'].decode()[len(self.prefix):]
+                    hub.deliver(channel, json.loads(item['data']))
+                logger.warning("realtime redis subscription ended; reconnecting in %.1fs", delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("realtime redis listener failed; reconnecting in %.1fs", delay)
+            finally:
+                with contextlib.suppress(Exception):
+                    await client.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if _setting('REALTIME_BACKEND', 'local') == 'redis':
+                _backend = RedisBackend(_setting('REALTIME_REDIS_URL', 'redis://localhost:6379/0'))
+            else:
+                _backend = LocalBackend()
+    return _backend
+
+
+def publish(channel, event, data):
+    """از کد sync یا async قابل فراخوانی است."""
+    try:
+        get_backend().publish(channel, {'event': event, 'data': data})
+    except Exception:
+        logger.exception("realtime publish failed on %s", channel)
+
+
+class Access:
+    """دسترسی یک اتصال؛ برای کانال خصوصی user_id دارد و با تغییر بعدی کاربر باطل می‌شود."""
+
+    def __init__(self, user_id=None, granted_at=None):
+        self.user_id = user_id
+        self.granted_at = granted_at
+
+    async def revoked(self):
+        if self.user_id is None:
+            return False
+        from core.services.user_cache import achanged_at, is_fresh
+
+        return not is_fresh(self.granted_at, await achanged_at(self.user_id))
+
+
+async def authorize(channel, scope):
+    """Access یا None (رد)."""
+    if PUBLIC_CHANNEL_RE.match(channel):
+        return Access()
+
+    match = RESTAURANT_CHANNEL_RE.match(channel)
+    if not match and channel not in STAFF_CHANNELS:
+        return None
+
+    # کانال رستوران فقط برای صاحب آن یا مدیر؛ همان بررسی تازگی پروفایل درخواست‌های HTTP (کش یا
+    # claimهای توکن اگر بعد از آخرین تغییر کاربر ساخته شده باشند، وگرنه یک کوئری)
+    from rest_framework.exceptions import AuthenticationFailed
+    from reservation_back.auth import CustomJWTAuthentication
+
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', ()):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    if 'access_token' not in cookies:
+        return None
+    authentication = CustomJWTAuthentication()
+    # زمان پیش از خواندن پروفایل؛ تغییری که هم‌زمان commit شود اتصال را در heartbeat بعدی می‌بندد
+    granted_at = time.time()
+    try:
+        user = await authentication.aget_user(authentication.get_validated_token(cookies['access_token'].value))
+    except AuthenticationFailed:  # توکن نامعتبر، کاربر حذف‌شده یا غیرفعال
+        return None
+
+    if match is None:
+        allowed = user.role in ('vendor', 'admin')
+    else:
+        allowed = user.role == 'admin' or (user.role == 'vendor' and str(user.restaurant_id) == match.group('id'))
+    return Access(user.id, granted_at) if allowed else None
+
+
+async def _next_message(subscriber, timeout):
+    try:
+        return await asyncio.wait_for(subscriber.queue.get(), timeout)
+    except asyncio.TimeoutError:
+        return 'ping'
+
+
+async def _wait_disconnect(receive, disconnect_types):
+    while True:
+        message = await receive()
+        if message['type'] in disconnect_types:
+            return
+
+
+async def serve_sse(scope, receive, send, channel, access):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    subscriber = hub.subscribe(channel)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive, {'http.disconnect'}))
+    heartbeat = _setting('REALTIME_HEARTBEAT_SECONDS', 15)
+    try:
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        while not disconnect.done():
+            message = await _next_message(subscriber, heartbeat)
+            if message is None:
+                break
+            if message == 'ping':
+                if await access.revoked():
+                    break
+                chunk = b': ping\n\n'
+            else:
+                chunk = f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n".encode()
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    except OSError:
+        pass
+    finally:
+        disconnect.cancel()
+        hub.unsubscribe(subscriber)
+
+
+async def serve_websocket(scope, receive, send, channel):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    access = await authorize(channel, scope)
+    if access is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscriber = hub.subscribe(channel)
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive, {'websocket.disconnect'}))
+    heartbeat = _setting('REALTIME_HEARTBEAT_SECONDS', 15)
+    try:
+        while not disconnect.done():
+            message = await _next_message(subscriber, heartbeat)
+            if message is None:
+                await send({'type': 'websocket.close', 'code': 4008})
+                break
+            if message == 'ping':
+                if await access.revoked():
+                    await send({'type': 'websocket.close', 'code': 4403})
+                    break
+                payload = {'event': 'ping'}
+            else:
+                payload = message
+            await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+    finally:
+        disconnect.cancel()
+        hub.unsubscribe(subscriber)
+
+
+class RealtimeRouter:
+    """مسیرهای /realtime/ را خودش پاسخ می‌دهد و بقیه را به اپلیکیشن جنگو می‌سپارد."""
+
+    def __init__(self, django_app):
+        self.django_app = django_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        match = PATH_RE.match(scope.get('path', ''))
+        if match is None:
+            if scope['type'] == 'websocket':
+                await send({'type': 'websocket.close', 'code': 4404})
+                return
+            return await self.django_app(scope, receive, send)
+
+        transport, channel = match.group('transport'), match.group('channel')
+        if transport == 'ws' and scope['type'] == 'websocket':
+            return await serve_websocket(scope, receive, send, channel)
+        if transport == 'sse' and scope['type'] == 'http':
+            access = await authorize(channel, scope)
+            if access is None:
+                await send({'type': 'http.response.start', 'status': 403, 'headers': []})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            return await serve_sse(scope, receive, send, channel, access)
+        return await self.django_app(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                hub.loop = asyncio.get_running_loop()
+                await get_backend().start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await get_backend().stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -19,10 +19,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from reservation_back.instrumentation import metrics_view
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('reservation.urls')),
     path('api/', include('core.urls')),
+    path('api/', include('payments.urls')),
+    path('metrics', metrics_view, name='metrics'),
     # سایر مسیرها
 ]
 if settings.DEBUG:
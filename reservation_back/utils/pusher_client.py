@@ -1,10 +1,70 @@
 import os
+import threading
+import time
+
 import pusher
+from django.core.exceptions import ImproperlyConfigured
+
+
+class LocalPusherClient:
+    """
+    جایگزین محلی Pusher برای توسعه و تست: رویدادها فقط در حافظه ثبت می‌شوند.
+    با fail_next می‌توان خطای سرویس را شبیه‌سازی کرد و با latency کندی شبکه را.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.fail_next = 0
+        self.batches = []
+        self._lock = threading.Lock()
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+    def trigger(self, channels, event_name, data):
+        channels = [channels] if isinstance(channels, str) else channels
+        return self.trigger_batch([{'channel': channel, 'name': event_name, 'data': data} for channel in channels])
+
+    def trigger_batch(self, batch=None, already_encoded=False):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                raise ConnectionError("local pusher: simulated failure")
+            self.batches.append(list(batch or []))
+        return {}
+
+
+def build_pusher_client():
+    # جایگزین محلی فقط با PUSHER_BACKEND=local؛ نبودن تنظیمات Pusher نباید بی‌صدا رویدادها را در حافظه نگه دارد
+    if os.getenv('PUSHER_BACKEND') == 'local':
+        return LocalPusherClient()
+
+    missing = [name for name in ('PUSHER_APP_ID', 'PUSHER_KEY', 'PUSHER_SECRET', 'PUSHER_CLUSTER') if not os.getenv(name)]
+    if missing:
+        raise ImproperlyConfigured(
+            f"Pusher settings missing: {', '.join(missing)}. Set them, or PUSHER_BACKEND=local for development."
+        )
+
+    return pusher.Pusher(
+        app_id=os.getenv('PUSHER_APP_ID'),
+        key=os.getenv('PUSHER_KEY'),
+        secret=os.getenv('PUSHER_SECRET'),
+        cluster=os.getenv('PUSHER_CLUSTER'),
+        ssl=True
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
 
-pusher_client = pusher.Pusher(
-    app_id=os.getenv('PUSHER_APP_ID'),
-    key=os.getenv('PUSHER_KEY'),
-    secret=os.getenv('PUSHER_SECRET'),
-    cluster=os.getenv('PUSHER_CLUSTER'),
-    ssl=True
-)
+def get_pusher_client():
+    """کلاینت مشترک پروسه؛ بار اول ساخته می‌شود (ImproperlyConfigured اگر تنظیمات ناقص باشد)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_pusher_client()
+    return _client
@@ -10,7 +10,7 @@ export default function FoodPanel() {
     const fetchFoods = async () => {
       try {
         const res = await api.get('/foods/')
-        setFoods(res.data)
+        setFoods(res.data.results ?? res.data)
       } catch (error) {
         console.error('خطا در دریافت منو:', error)
       }